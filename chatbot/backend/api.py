@@ -3,25 +3,65 @@ This module defines the main FastAPI application for the chatbot backend.
 It includes middleware and routers for various services such as file storage, chat, vector database, and more.
 """
 
+import os
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from chatbot.backend.services.file_storage.buckets_api import buckets_router
-from chatbot.backend.services.chat_history.sql_db_api import (
-    messages_router,
-    conversations_router,
-    users_router,
-    dashboard_router
-)
-from chatbot.backend.services.vector_db.db_api import vector_db_router
-from chatbot.backend.inference.inference_api import chat_router
-from chatbot.backend.document_parser.doc_parsing_api import document_parser_router
-from chatbot.backend.ingestion.ingestion_api import ingestion_router
-from chatbot.backend.topicmodel.topic_model_api import simple_tm_router
+from chatbot.backend.services.registry import registry
+from chatbot.backend.services.health.health_api import health_router
+
+# Import timings of each router are reported by /health/ready
+with registry.time_import("buckets"):
+    from chatbot.backend.services.file_storage.buckets_api import buckets_router
+with registry.time_import("chat_history"):
+    from chatbot.backend.services.chat_history.sql_db_api import (
+        messages_router,
+        conversations_router,
+        users_router,
+        dashboard_router
+    )
+with registry.time_import("vector_db"):
+    from chatbot.backend.services.vector_db.db_api import vector_db_router
+with registry.time_import("chat"):
+    from chatbot.backend.inference.inference_api import chat_router
+with registry.time_import("document_parser"):
+    from chatbot.backend.document_parser.doc_parsing_api import document_parser_router
+with registry.time_import("ingestion"):
+    from chatbot.backend.ingestion.ingestion_api import ingestion_router
+    from chatbot.backend.ingestion.jobs import ingestion_jobs
+with registry.time_import("topic_model"):
+    from chatbot.backend.topicmodel.topic_model_api import simple_tm_router
+
+load_dotenv(override=True)
+
+# Build models and clients in the background after startup instead of on first request
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "true").lower() == "true"
+# Comma-separated component names to warm up, e.g. "embedding_model,vector_db"; all if unset
+WARM_UP_COMPONENTS = [name for name in os.getenv("WARM_UP_COMPONENTS", "").split(",") if name] or None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts the background warm-up of lazily initialized components and resumes
+    unfinished ingestion jobs.
+    """
+    if WARM_UP_ON_STARTUP:
+        registry.warm_up_in_background(WARM_UP_COMPONENTS)
+    else:
+        # nothing to wait for, components are built on first use
+        registry.warm_up(names=[])
+    ingestion_jobs.resume()
+    yield
+    ingestion_jobs.shutdown()
+
 
 # ==========================
 # FastAPI Application
 # ==========================
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow cross-origin requests
 app.add_middleware(
@@ -32,6 +72,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Include router for liveness and readiness probes
+app.include_router(health_router)
+
 # Include routers for file storage services
 app.include_router(buckets_router)
 
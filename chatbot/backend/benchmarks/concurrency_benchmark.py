@@ -0,0 +1,109 @@
+"""
+Concurrency benchmark for the `/chat/query/` endpoint.
+
+Simulates N concurrent users, each sending a fixed number of queries back to back,
+and reports p50/p99 latency and throughput per concurrency level.
+
+Usage (with the API running locally):
+    python -m chatbot.backend.benchmarks.concurrency_benchmark --concurrency 1 8 32
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+
+from chatbot.backend.benchmarks.utils import print_table, summarize_latencies
+from chatbot.backend.evaluation.params import QUERIES
+
+CHAT_QUERY_URL = "http://localhost:8000/chat/query/"
+CHAT_METRICS_URL = "http://localhost:8000/chat/metrics/"
+
+
+async def _simulate_user(
+    client: httpx.AsyncClient,
+    url: str,
+    user_index: int,
+    requests_per_user: int,
+    latencies: List[float],
+    errors: List[str],
+):
+    for i in range(requests_per_user):
+        query = QUERIES[(user_index + i) % len(QUERIES)]
+        start = time.perf_counter()
+        try:
+            response = await client.post(url, json={"user_query": query})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError as e:
+            errors.append(str(e))
+
+
+async def run_level(url: str, concurrency: int, requests_per_user: int, timeout: float) -> Dict:
+    """
+    Runs one concurrency level against the endpoint.
+
+    Args:
+        url (str): The chat query endpoint.
+        concurrency (int): Number of simulated concurrent users.
+        requests_per_user (int): Number of sequential requests per user.
+        timeout (float): Per-request timeout in seconds.
+
+    Returns:
+        dict: Latency summary, throughput and error count for this level.
+    """
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                _simulate_user(client, url, user, requests_per_user, latencies, errors)
+                for user in range(concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+    summary = summarize_latencies(latencies)
+    summary.update(
+        {
+            "users": concurrency,
+            "errors": len(errors),
+            "req_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        }
+    )
+    return summary
+
+
+async def main(args):
+    results = []
+    for concurrency in args.concurrency:
+        print(f"Running {concurrency} concurrent user(s)...")
+        results.append(
+            await run_level(args.url, concurrency, args.requests_per_user, args.timeout)
+        )
+    print_table(results, ["users", "count", "errors", "p50_ms", "p99_ms", "mean_ms", "req_per_s"])
+
+    # Server-side per-stage timings, e.g. to compare SPECULATIVE_RETRIEVAL on and off
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        response = await client.get(args.metrics_url)
+    if response.is_success:
+        metrics = response.json()
+        print(f"\nServer stage latencies (speculative={metrics['speculative']}):")
+        stages = [
+            {"stage": stage, **summary}
+            for stage, summary in metrics["stage_latencies"].items()
+        ]
+        print_table(stages, ["stage", "count", "p50_ms", "p99_ms", "mean_ms"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /chat/query/ under concurrent load")
+    parser.add_argument("--url", default=CHAT_QUERY_URL)
+    parser.add_argument("--metrics-url", default=CHAT_METRICS_URL)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests-per-user", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,116 @@
+"""
+Parity check and throughput benchmark of the embedding backends.
+
+Every backend encodes the same fixed corpus (the evaluation queries and ground truth
+answers). Parity is measured against the PyTorch backend: the cosine similarity of
+each dense vector to its PyTorch counterpart, the deviation of query-document sparse
+inner products, and whether each query retrieves the same top document. Throughput
+is measured with the embedding cache disabled.
+
+Usage:
+    python -m chatbot.backend.benchmarks.embedding_backend_benchmark --backends torch onnx onnx-int8
+"""
+
+import argparse
+import time
+from typing import Dict
+
+import numpy as np
+
+from chatbot.backend.benchmarks.utils import print_table
+from chatbot.backend.evaluation.params import GROUND_TRUTH, QUERIES
+from chatbot.backend.services.models.embedding_model import EmbeddingModel
+
+
+def encode_corpus(model: EmbeddingModel, repeats: int) -> Dict:
+    """
+    Encodes the corpus `repeats` times, timing the dense and sparse models separately.
+
+    Returns:
+        dict: The dense matrix, sparse matrix and texts per second of each model.
+    """
+    texts = QUERIES + GROUND_TRUTH
+    results = {}
+    for name, encode in [("dense", model.batch_encode_dense), ("sparse", model.batch_encode_sparse)]:
+        encode(texts[:2])  # warm up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            encoded = encode(texts)
+        results[f"{name}_texts_per_s"] = round(repeats * len(texts) / (time.perf_counter() - start), 2)
+        results[name] = encoded
+    results["dense"] = np.asarray(results["dense"], dtype=np.float32)
+    results["sparse"] = results["sparse"].tocsr()
+    return results
+
+
+def parity(reference: Dict, candidate: Dict) -> Dict:
+    """
+    Compares the embeddings of a backend to the PyTorch reference.
+
+    Returns:
+        dict: Dense cosine similarity (min/mean), sparse inner-product relative
+        deviation (mean/max) and top-1 agreement of query-to-document retrieval.
+    """
+    n_queries = len(QUERIES)
+    cosines = np.sum(reference["dense"] * candidate["dense"], axis=1) / (
+        np.linalg.norm(reference["dense"], axis=1) * np.linalg.norm(candidate["dense"], axis=1)
+    )
+
+    def scores(embeddings, kind):
+        matrix = embeddings[kind]
+        product = matrix[:n_queries] @ matrix[n_queries:].T
+        return product.toarray() if kind == "sparse" else product
+
+    ref_sparse, cand_sparse = scores(reference, "sparse"), scores(candidate, "sparse")
+    deviation = np.abs(cand_sparse - ref_sparse) / np.maximum(np.abs(ref_sparse), 1e-6)
+
+    def top1_agreement(kind):
+        ref, cand = scores(reference, kind), scores(candidate, kind)
+        return round(float(np.mean(ref.argmax(axis=1) == cand.argmax(axis=1))), 4)
+
+    return {
+        "dense_cos_min": round(float(cosines.min()), 5),
+        "dense_cos_mean": round(float(cosines.mean()), 5),
+        "sparse_ip_dev_mean": round(float(deviation.mean()), 5),
+        "sparse_ip_dev_max": round(float(deviation.max()), 5),
+        "dense_top1": top1_agreement("dense"),
+        "sparse_top1": top1_agreement("sparse"),
+    }
+
+
+def main(args):
+    results = {}
+    rows = []
+    for backend in args.backends:
+        print(f"Encoding {len(QUERIES) + len(GROUND_TRUTH)} texts with the `{backend}` backend...")
+        model = EmbeddingModel(cache_max_bytes=0, backend=backend)
+        results[backend] = encode_corpus(model, args.repeats)
+        rows.append({
+            "backend": backend,
+            "dense_texts_per_s": results[backend]["dense_texts_per_s"],
+            "sparse_texts_per_s": results[backend]["sparse_texts_per_s"],
+        })
+        del model
+
+    print_table(rows, ["backend", "dense_texts_per_s", "sparse_texts_per_s"])
+
+    if "torch" not in results:
+        print("\nSkipping the parity check, which needs the `torch` backend as reference.")
+        return
+
+    parity_rows = [
+        {"backend": backend, **parity(results["torch"], result)}
+        for backend, result in results.items()
+        if backend != "torch"
+    ]
+    if parity_rows:
+        print()
+        print_table(parity_rows, list(parity_rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare embedding backends for parity and throughput")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"],
+                        choices=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--repeats", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+"""
+Throughput benchmark of per-request query encoding versus the embedding micro-batcher.
+
+Each simulated client thread encodes one query at a time, as concurrent API requests
+do. Queries are made unique so the embedding cache never answers them.
+
+Usage:
+    python -m chatbot.backend.benchmarks.embedding_batching_benchmark --concurrency 1 8 32
+"""
+
+import argparse
+import threading
+import time
+from typing import Dict
+
+from chatbot.backend.benchmarks.utils import print_table, summarize_latencies
+from chatbot.backend.evaluation.params import QUERIES
+from chatbot.backend.services.models.embedding_batcher import EmbeddingBatcher
+from chatbot.backend.services.models.embedding_model import embedding_model
+
+
+def run_level(encoder, concurrency: int, queries_per_client: int, run_id: str) -> Dict:
+    """
+    Encodes queries from `concurrency` client threads through `encoder`.
+
+    Args:
+        encoder: Object exposing `encode_texts`.
+        concurrency (int): Number of concurrent client threads.
+        queries_per_client (int): Number of sequential queries per client.
+        run_id (str): Suffix that keeps the queries of each run unique.
+
+    Returns:
+        dict: Latency summary and throughput in queries per second.
+    """
+    latencies = []
+    lock = threading.Lock()
+
+    def client(index: int):
+        for i in range(queries_per_client):
+            query = f"{QUERIES[(index + i) % len(QUERIES)]} [{run_id}-{index}-{i}]"
+            start = time.perf_counter()
+            encoder.encode_texts([query])
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    summary = summarize_latencies(latencies)
+    summary["queries_per_s"] = round(len(latencies) / elapsed, 2)
+    return summary
+
+
+def main(args):
+    batcher = EmbeddingBatcher(
+        embedding_model, window_ms=args.window_ms, max_batch_size=args.max_batch_size
+    )
+    # warm up both models so the first level does not pay for lazy initialisation
+    embedding_model.encode_texts(["warm up"])
+
+    results = []
+    for concurrency in args.concurrency:
+        for name, encoder in [("per-request", embedding_model), ("batched", batcher)]:
+            print(f"Running {name} with {concurrency} client(s)...")
+            summary = run_level(encoder, concurrency, args.queries_per_client, f"{name}-{concurrency}")
+            summary.update({"path": name, "clients": concurrency})
+            results.append(summary)
+
+    print_table(results, ["path", "clients", "count", "queries_per_s", "p50_ms", "p99_ms"])
+    print(f"\nBatcher stats: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark query encoding with and without micro-batching")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--queries-per-client", type=int, default=10)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    main(parser.parse_args())
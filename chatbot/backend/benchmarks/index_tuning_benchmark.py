@@ -0,0 +1,335 @@
+"""
+Recall/latency tuning harness for the dense HNSW and sparse inverted indexes.
+
+Copies the corpus vectors of the live collection (or a synthetic corpus) into a
+scratch collection, then rebuilds each vector index over a grid of build parameters
+and searches it over a grid of search parameters. For every combination it reports:
+- recall@k against exact brute-force search computed locally with numpy
+- single-query QPS and p99 latency
+- index build time
+- memory, both as Milvus' loaded segment size and as an estimate of the index alone
+
+Dense and sparse indexes are tuned independently, since each only serves its own
+field. `--write-config` writes the fastest combination per field that reaches
+`--min-recall` to a config usable as `VECTOR_INDEX_CONFIG`.
+
+Usage:
+    python -m chatbot.backend.benchmarks.index_tuning_benchmark --M 5 16 32 --ef 16 64 128 \
+        --drop-ratio-build 0 0.2 --drop-ratio-search 0 0.2 --report index_tuning.json
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+import yaml
+from pymilvus import Collection, utility
+from scipy.sparse import csr_array
+
+from chatbot.backend.benchmarks.sparse_conversion_benchmark import SPLADE_VOCAB_SIZE, random_batch
+from chatbot.backend.benchmarks.utils import print_table, summarize_latencies
+from chatbot.backend.services.models.sparse import csr_to_dicts
+from chatbot.backend.services.vector_db.connection import MilvusConnectionManager
+from chatbot.backend.services.vector_db.index import create_index, load_index_config, search_params
+from chatbot.backend.services.vector_db.schema import SCHEMA, TEXT_DENSE_EMBEDDING
+
+DENSE_DIM = TEXT_DENSE_EMBEDDING.params["dim"]
+INSERT_BATCH_SIZE = 500
+
+
+def load_corpus(connection: MilvusConnectionManager, collection_name: str, limit: int):
+    """
+    Reads the dense and sparse vectors of up to `limit` rows of a collection.
+    """
+    collection = connection.collection(collection_name)
+    iterator = collection.query_iterator(
+        batch_size=1000,
+        output_fields=["text_dense_embedding", "text_sparse_embedding"],
+        limit=limit if limit else -1,
+    )
+    dense, sparse = [], []
+    while True:
+        batch = iterator.next()
+        if not batch:
+            break
+        dense.extend(row["text_dense_embedding"] for row in batch)
+        sparse.extend({int(i): float(w) for i, w in row["text_sparse_embedding"].items()} for row in batch)
+    iterator.close()
+    return np.asarray(dense, dtype=np.float32), sparse
+
+
+def synthetic_corpus(rows: int, nnz: int, seed: int = 0):
+    """
+    Builds random unit dense vectors and SPLADE-shaped sparse dictionaries.
+    """
+    rng = np.random.default_rng(seed)
+    dense = rng.standard_normal((rows, DENSE_DIM)).astype(np.float32)
+    dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+    return dense, csr_to_dicts(random_batch(rows, nnz, seed))
+
+
+def encode_queries(count: int):
+    """
+    Encodes the evaluation queries with the embedding model.
+    """
+    from chatbot.backend.evaluation.params import QUERIES
+    from chatbot.backend.services.models.embedding_model import embedding_model
+
+    queries = QUERIES[:count] if count else QUERIES
+    dense, sparse = embedding_model.encode_texts(queries)
+    return np.asarray(dense, dtype=np.float32), csr_to_dicts(sparse)
+
+
+def sample_queries(dense: np.ndarray, sparse: List[Dict], count: int, noise: float):
+    """
+    Samples corpus rows as queries, adding Gaussian noise to the dense vectors.
+    """
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(dense), min(count, len(dense)), replace=False)
+    query_dense = dense[rows] + noise * rng.standard_normal((len(rows), dense.shape[1])).astype(np.float32)
+    return query_dense, [sparse[row] for row in rows]
+
+
+def to_csr(vectors: List[Dict], n_terms: int) -> csr_array:
+    """
+    Stacks sparse dictionaries into a CSR matrix, dropping terms beyond `n_terms`.
+    """
+    indptr, indices, data = [0], [], []
+    for vector in vectors:
+        terms = [(i, w) for i, w in vector.items() if i < n_terms]
+        indices.extend(i for i, _ in terms)
+        data.extend(w for _, w in terms)
+        indptr.append(len(indices))
+    return csr_array((np.asarray(data, dtype=np.float32), indices, indptr), shape=(len(vectors), n_terms))
+
+
+def exact_top_k(scores: np.ndarray, k: int, positive_only: bool = False) -> List[set]:
+    """
+    Returns the row indices of the `k` highest scores of each query column.
+
+    With `positive_only`, rows scoring 0 or less are left out, as a sparse inner
+    product search never returns documents sharing no term with the query.
+    """
+    k = min(k, scores.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=0)[:k]
+    return [
+        {row for row in top[:, q].tolist() if not positive_only or scores[row, q] > 0}
+        for q in range(scores.shape[1])
+    ]
+
+
+def ground_truth(dense, sparse, query_dense, query_sparse, k: int) -> Dict[str, List[set]]:
+    """
+    Computes the exact top-k corpus rows of each query by cosine (dense) and inner product (sparse).
+    """
+    normalized = dense / np.linalg.norm(dense, axis=1, keepdims=True)
+    queries = query_dense / np.linalg.norm(query_dense, axis=1, keepdims=True)
+    n_terms = max(SPLADE_VOCAB_SIZE, max((max(v, default=0) for v in sparse), default=0) + 1)
+    sparse_scores = (to_csr(sparse, n_terms) @ to_csr(query_sparse, n_terms).T).toarray()
+    return {
+        "dense": exact_top_k(normalized @ queries.T, k),
+        "sparse": exact_top_k(sparse_scores, k, positive_only=True),
+    }
+
+
+def estimate_index_mb(field: str, params: dict, rows: int, nnz: int) -> float:
+    """
+    Estimates the size of an index: HNSW stores the vectors plus 2*M level-0 links
+    per node, and the inverted index stores a (row, weight) pair per kept posting.
+    """
+    if field == "dense":
+        return round(rows * (4 * DENSE_DIM + 2 * params["M"] * 4) / 2 ** 20, 2)
+    return round(nnz * (1 - params.get("drop_ratio_build", 0)) * 8 / 2 ** 20, 2)
+
+
+def loaded_mb(collection_name: str, alias: str):
+    """
+    Returns the memory of the loaded segments as reported by Milvus, if available.
+    """
+    try:
+        segments = utility.get_query_segment_info(collection_name, using=alias)
+        return round(sum(segment.mem_size for segment in segments) / 2 ** 20, 2)
+    except Exception:
+        return None
+
+
+def rebuild_index(collection: Collection, field_config: dict, alias: str) -> float:
+    """
+    Replaces the index of one field and reloads the collection.
+
+    Returns:
+        float: Seconds spent building the index and loading the collection.
+    """
+    collection.release()
+    if collection.has_index(index_name=field_config["index_name"]):
+        collection.drop_index(index_name=field_config["index_name"])
+    start = time.perf_counter()
+    create_index(collection, field_config)
+    utility.wait_for_index_building_complete(collection.name, index_name=field_config["index_name"], using=alias)
+    collection.load()
+    return time.perf_counter() - start
+
+
+def measure_search(collection, field_config, query_vectors, row_of_id, truth, k: int) -> Dict:
+    """
+    Runs one search per query and compares the hits to the exact top-k.
+    """
+    param = search_params(field_config, k)
+    latencies, recalls = [], []
+    for vector, expected in zip(query_vectors, truth):
+        if not expected:
+            continue
+        start = time.perf_counter()
+        result = collection.search(data=[vector], anns_field=field_config["field"], param=param, limit=k)
+        latencies.append(time.perf_counter() - start)
+        found = {row_of_id[pk] for pk in result[0].ids}
+        recalls.append(len(found & expected) / len(expected))
+    summary = summarize_latencies(latencies)
+    return {
+        f"recall@{k}": round(float(np.mean(recalls)), 4),
+        "qps": round(len(latencies) / sum(latencies), 1),
+        "p99_ms": summary["p99_ms"],
+    }
+
+
+def grid(values: Dict[str, list]) -> List[dict]:
+    """
+    Expands `{name: [values]}` into every combination of parameters.
+    """
+    names = list(values)
+    return [dict(zip(names, combo)) for combo in itertools.product(*values.values())]
+
+
+def describe(params: dict) -> str:
+    return ",".join(f"{name}={value}" for name, value in params.items()) or "default"
+
+
+def best_params(rows: List[Dict], field: str, k: int, min_recall: float) -> Dict:
+    """
+    Picks the fastest row of a field reaching `min_recall`, or the most accurate one.
+    """
+    rows = [row for row in rows if row["field"] == field]
+    passing = [row for row in rows if row[f"recall@{k}"] >= min_recall]
+    if passing:
+        return max(passing, key=lambda row: row["qps"])
+    return max(rows, key=lambda row: (row[f"recall@{k}"], row["qps"]))
+
+
+def main(args):
+    connection = MilvusConnectionManager()
+    connection.ensure_connected()
+    alias = connection.alias
+
+    if args.synthetic:
+        dense, sparse = synthetic_corpus(args.synthetic, args.nnz)
+        query_dense, query_sparse = sample_queries(dense, sparse, args.queries or 200, args.noise)
+    else:
+        print(f"Reading vectors from '{args.collection}'...")
+        dense, sparse = load_corpus(connection, args.collection, args.corpus_limit)
+        query_dense, query_sparse = encode_queries(args.queries)
+    nnz = sum(len(vector) for vector in sparse)
+    print(f"Corpus: {len(dense)} rows, {nnz} sparse postings; {len(query_dense)} queries")
+    truth = ground_truth(dense, sparse, query_dense, query_sparse, args.k)
+
+    base_config = load_index_config(args.config)
+    scratch_name = f"{args.collection}_index_tuning"
+    if utility.has_collection(scratch_name, using=alias):
+        utility.drop_collection(scratch_name, using=alias)
+    collection = Collection(name=scratch_name, schema=SCHEMA, using=alias)
+
+    rows = []
+    try:
+        print(f"Copying the corpus into '{scratch_name}'...")
+        row_of_id = {}
+        for start in range(0, len(dense), INSERT_BATCH_SIZE):
+            end = start + INSERT_BATCH_SIZE
+            count = len(dense[start:end])
+            result = collection.insert([
+                ["IndexTuning"] * count,
+                ["NA"] * count,
+                [""] * count,
+                dense[start:end].tolist(),
+                sparse[start:end],
+            ])
+            row_of_id.update({pk: start + i for i, pk in enumerate(result.primary_keys)})
+        collection.flush()
+        # both fields need an index before the collection can be loaded
+        for field_config in base_config.values():
+            create_index(collection, field_config)
+
+        searches = {
+            "dense": (query_dense.tolist(), {"M": args.M, "efConstruction": args.ef_construction}, {"ef": args.ef}),
+            "sparse": (query_sparse, {"drop_ratio_build": args.drop_ratio_build},
+                       {"drop_ratio_search": args.drop_ratio_search}),
+        }
+        for field, (query_vectors, build_grid, search_grid) in searches.items():
+            for build in grid(build_grid):
+                field_config = copy.deepcopy(base_config[field])
+                field_config["params"].update(build)
+                print(f"Building {field} index with {describe(build)}...")
+                build_s = rebuild_index(collection, field_config, alias)
+                memory = loaded_mb(scratch_name, alias)
+                for search in grid(search_grid):
+                    field_config["search_params"] = search
+                    row = {"field": field, "build": describe(build), "search": describe(search)}
+                    row.update(measure_search(collection, field_config, query_vectors, row_of_id,
+                                              truth[field], args.k))
+                    row.update({
+                        "build_s": round(build_s, 2),
+                        "loaded_mb": memory,
+                        "est_index_mb": estimate_index_mb(field, field_config["params"], len(dense), nnz),
+                        "params": dict(field_config["params"]),
+                        "search_params": dict(search),
+                    })
+                    rows.append(row)
+    finally:
+        if not args.keep:
+            collection.release()
+            utility.drop_collection(scratch_name, using=alias)
+
+    print_table(rows, ["field", "build", "search", f"recall@{args.k}", "qps", "p99_ms",
+                       "build_s", "loaded_mb", "est_index_mb"])
+
+    if args.report:
+        with open(args.report, "w") as file:
+            json.dump({"corpus_rows": len(dense), "queries": len(query_dense), "k": args.k, "results": rows},
+                      file, indent=2)
+        print(f"Report written to {args.report}")
+
+    if args.write_config:
+        config = copy.deepcopy(base_config)
+        for field in ("dense", "sparse"):
+            best = best_params(rows, field, args.k, args.min_recall)
+            config[field]["params"] = best["params"]
+            config[field]["search_params"] = best["search_params"]
+            print(f"Chose {field}: {best['build']} / {best['search']} "
+                  f"(recall@{args.k}={best[f'recall@{args.k}']}, qps={best['qps']})")
+        with open(args.write_config, "w") as file:
+            yaml.safe_dump(config, file, sort_keys=False)
+        print(f"Config written to {args.write_config}; set VECTOR_INDEX_CONFIG to use it")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune vector index build and search parameters")
+    parser.add_argument("--collection", default="odprt_index", help="collection whose vectors are copied")
+    parser.add_argument("--corpus-limit", type=int, default=0, help="only copy the first N rows")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic rows instead of the collection")
+    parser.add_argument("--nnz", type=int, default=200, help="sparse terms per synthetic row")
+    parser.add_argument("--queries", type=int, default=0, help="number of queries, 0 for all evaluation queries (200 with --synthetic)")
+    parser.add_argument("--noise", type=float, default=0.05, help="noise added to synthetic queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--M", type=int, nargs="+", default=[5, 16, 32])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[256, 512])
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--drop-ratio-build", type=float, nargs="+", default=[0.0, 0.2])
+    parser.add_argument("--drop-ratio-search", type=float, nargs="+", default=[0.0, 0.2])
+    parser.add_argument("--config", default="chatbot/backend/configs/vector_index.yml", help="base index config")
+    parser.add_argument("--report", help="write all results as JSON to this path")
+    parser.add_argument("--write-config", help="write the chosen parameters as an index config to this path")
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch collection")
+    main(parser.parse_args())
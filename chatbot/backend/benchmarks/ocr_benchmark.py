@@ -0,0 +1,138 @@
+"""
+Benchmark of PDF OCR: pages per second and peak memory.
+
+Compares the previous approach (rasterize the whole PDF, then OCR page by page in
+one thread) with windowed rasterization and OCR across a process pool, over a grid
+of DPI, worker count and page window size. The hybrid mode reads the native text
+layer and only OCRs the pages without one, as ingestion does. Each configuration
+runs in a fresh subprocess so that its peak RSS is measured in isolation.
+
+The separate and shared modes also rasterize every page for figure extraction, as
+`separate_text_and_images` does. Separate rasterizes the figure pages after hybrid
+extraction. Shared passes one `PageImageProvider` to both, so each page is
+rasterized once: with several workers, the OCR workers save the pages they
+rasterize for the figure pass to read back.
+
+Peak RSS is reported for the main process and for the largest OCR worker; with
+N workers, the total is roughly main + N * worker.
+
+Usage:
+    python -m chatbot.backend.benchmarks.ocr_benchmark --pdf contract.pdf --dpi 200 300 --workers 1 2 4 --windows 2 4 8
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from chatbot.backend.benchmarks.utils import print_table
+
+
+def peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def run_child(args):
+    """
+    Runs one configuration in this process and prints its result as JSON.
+    """
+    from chatbot.backend.document_parser import ocr
+
+    start = time.perf_counter()
+    if args.mode == "legacy":
+        import pytesseract
+        from pdf2image import convert_from_path
+
+        pages = [pytesseract.image_to_string(image) for image in convert_from_path(args.pdf, dpi=args.child_dpi)]
+    elif args.mode == "windowed":
+        ocr.OCR_WORKERS = args.child_workers
+        pages = ocr.ocr_pdf(args.pdf, dpi=args.child_dpi, window=args.child_window)
+    else:
+        from chatbot.backend.document_parser.page_images import PageImageProvider
+        from chatbot.backend.document_parser.pdf_text import extract_pdf_pages
+
+        ocr.OCR_WORKERS = args.child_workers
+        if args.mode == "shared":
+            with PageImageProvider(args.pdf, dpi=args.child_dpi, window=args.child_window) as images:
+                pages = [page.text for page in extract_pdf_pages(
+                    args.pdf, dpi=args.child_dpi, window=args.child_window, page_images=images
+                )]
+                for _ in images.pages():  # the figure extraction pass
+                    pass
+        else:
+            pages = [page.text for page in extract_pdf_pages(args.pdf, dpi=args.child_dpi, window=args.child_window)]
+            if args.mode == "separate":
+                with PageImageProvider(args.pdf, dpi=args.child_dpi, window=args.child_window) as images:
+                    for _ in images.pages():
+                        pass
+    seconds = time.perf_counter() - start
+    if args.mode != "legacy" and args.child_workers > 1:
+        # wait for the workers to exit so that their peak RSS is accounted
+        ocr.ocr_executor().shutdown(wait=True)
+
+    print(json.dumps({
+        "pages": len(pages),
+        "chars": sum(len(text) for text in pages),
+        "seconds": round(seconds, 2),
+        "pages_per_sec": round(len(pages) / seconds, 2) if seconds else 0.0,
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+        "peak_worker_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }))
+
+
+def run_config(pdf: str, mode: str, dpi: int, workers: int = 1, window: int = 0) -> dict:
+    command = [
+        sys.executable, "-m", "chatbot.backend.benchmarks.ocr_benchmark", "--pdf", pdf,
+        "--mode", mode, "--child-dpi", str(dpi), "--child-workers", str(workers), "--child-window", str(window),
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return {"mode": mode, "dpi": dpi, "workers": workers, "window": window or "all", **result}
+
+
+def main(args):
+    rows = []
+    for dpi in args.dpi:
+        print(f"Running legacy OCR at {dpi} DPI...")
+        rows.append(run_config(args.pdf, "legacy", dpi))
+        for workers in args.workers:
+            for window in args.windows:
+                print(f"Running windowed OCR at {dpi} DPI, {workers} workers, {window}-page windows...")
+                rows.append(run_config(args.pdf, "windowed", dpi, workers, window))
+        print(f"Running hybrid text layer + OCR extraction at {dpi} DPI...")
+        rows.append(run_config(args.pdf, "hybrid", dpi, max(args.workers), args.windows[0]))
+        for workers in sorted({1, max(args.workers)}):
+            for mode in ("separate", "shared"):
+                print(f"Running {mode} text and figure rasterization at {dpi} DPI, {workers} workers...")
+                rows.append(run_config(args.pdf, mode, dpi, workers, args.windows[0]))
+
+    print()
+    print_table(rows, [
+        "mode", "dpi", "workers", "window", "pages", "seconds", "pages_per_sec", "peak_rss_mb", "peak_worker_rss_mb",
+    ])
+    legacy = {row["dpi"]: row for row in rows if row["mode"] == "legacy"}
+    for row in rows:
+        if row["mode"] == "windowed" and row["chars"] != legacy[row["dpi"]]["chars"]:
+            print(f"Note: {row['workers']} workers / {row['window']}-page windows extracted "
+                  f"{row['chars']} characters vs {legacy[row['dpi']]['chars']} for legacy at {row['dpi']} DPI")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PDF OCR throughput and peak memory")
+    parser.add_argument("--pdf", required=True, help="PDF to OCR, ideally a long scanned contract")
+    parser.add_argument("--dpi", type=int, nargs="+", default=[200])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--windows", type=int, nargs="+", default=[4])
+    # internal: run a single configuration in a subprocess
+    parser.add_argument("--mode", choices=["legacy", "windowed", "hybrid", "separate", "shared"], help=argparse.SUPPRESS)
+    parser.add_argument("--child-dpi", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--child-workers", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--child-window", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        run_child(args)
+    else:
+        main(args)
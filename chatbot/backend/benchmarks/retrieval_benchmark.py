@@ -0,0 +1,114 @@
+"""
+Latency and quality benchmark of the multi-stage retrieval pipeline.
+
+Each configuration (candidate count, final k, reranking on/off) retrieves context
+for every evaluation query against the live collection. Quality is the cosine
+similarity between the dense embedding of the query's ground truth answer and its
+closest retrieved chunk, reported as a mean and as the share of queries above
+`--match-threshold`. Queries are encoded once up front, so latencies cover the
+search and rerank stages only.
+
+Usage:
+    python -m chatbot.backend.benchmarks.retrieval_benchmark --configs 3:3:off 20:5:off 20:5:on 50:5:on
+"""
+
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from chatbot.backend.benchmarks.utils import print_table, summarize_latencies
+from chatbot.backend.evaluation.params import GROUND_TRUTH, QUERIES
+from chatbot.backend.services.models.embedding_model import embedding_model
+from chatbot.backend.services.vector_db.retrieval import RetrievalParams, retrieval_pipeline
+
+
+def parse_config(config: str, rerank_batch_size: int, max_context_tokens: int) -> RetrievalParams:
+    """
+    Parses a `candidate_k:final_k:on|off` configuration string.
+    """
+    candidate_k, final_k, rerank = config.split(":")
+    return RetrievalParams(
+        candidate_k=int(candidate_k),
+        final_k=int(final_k),
+        rerank=rerank == "on",
+        rerank_batch_size=rerank_batch_size,
+        max_context_tokens=max_context_tokens,
+    )
+
+
+def run_config(params: RetrievalParams, encoded_queries: List, truth_embeddings: np.ndarray,
+               match_threshold: float) -> Dict:
+    """
+    Retrieves context for every query with `params`.
+
+    Returns:
+        dict: Search/rerank/total latencies, context tokens and answer-similarity metrics.
+    """
+    search_latencies, rerank_latencies, total_latencies = [], [], []
+    similarities, context_tokens = [], []
+    for (query, dense, sparse), truth in zip(encoded_queries, truth_embeddings):
+        start = time.perf_counter()
+        hits = retrieval_pipeline.search(dense, sparse, params)
+        searched = time.perf_counter()
+        hits = retrieval_pipeline.rerank(query, hits, params)
+        reranked = time.perf_counter()
+        context, context_list = retrieval_pipeline.build_context(hits, params)
+        total_latencies.append(time.perf_counter() - start)
+        search_latencies.append(searched - start)
+        rerank_latencies.append(reranked - searched)
+
+        context_tokens.append(retrieval_pipeline.count_tokens(context))
+        if context_list:
+            chunk_embeddings = np.asarray(embedding_model.batch_encode_dense(context_list))
+            similarities.append(float((chunk_embeddings @ truth).max()))
+        else:
+            similarities.append(0.0)
+
+    return {
+        "search_p50_ms": summarize_latencies(search_latencies)["p50_ms"],
+        "rerank_p50_ms": summarize_latencies(rerank_latencies)["p50_ms"],
+        "total_p50_ms": summarize_latencies(total_latencies)["p50_ms"],
+        "total_p99_ms": summarize_latencies(total_latencies)["p99_ms"],
+        "mean_tokens": round(float(np.mean(context_tokens)), 1),
+        "answer_sim": round(float(np.mean(similarities)), 4),
+        "match_rate": round(float(np.mean(np.asarray(similarities) >= match_threshold)), 4),
+    }
+
+
+def main(args):
+    queries = QUERIES[:args.limit] if args.limit else QUERIES
+    truths = GROUND_TRUTH[:len(queries)]
+    print(f"Encoding {len(queries)} queries and ground truth answers...")
+    dense_embeddings, sparse_embeddings = embedding_model.encode_texts(queries)
+    sparse_embeddings = sparse_embeddings.tocsr()
+    encoded_queries = [
+        (query, [dense_embeddings[i]], sparse_embeddings[i:i + 1])
+        for i, query in enumerate(queries)
+    ]
+    truth_embeddings = np.asarray(embedding_model.batch_encode_dense(truths))
+
+    rows = []
+    for config in args.configs:
+        params = parse_config(config, args.rerank_batch_size, args.max_context_tokens)
+        print(f"Running {config}...")
+        # warm up the search path and the reranker outside the measurements
+        query, dense, sparse = encoded_queries[0]
+        retrieval_pipeline.rerank(query, retrieval_pipeline.search(dense, sparse, params), params)
+        row = {"config": config}
+        row.update(run_config(params, encoded_queries, truth_embeddings, args.match_threshold))
+        rows.append(row)
+
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark retrieval latency and quality per configuration")
+    parser.add_argument("--configs", nargs="+", default=["3:3:off", "20:5:off", "20:5:on", "50:5:on"],
+                        help="candidate_k:final_k:on|off (rerank)")
+    parser.add_argument("--rerank-batch-size", type=int, default=16)
+    parser.add_argument("--max-context-tokens", type=int, default=3000)
+    parser.add_argument("--match-threshold", type=float, default=0.8)
+    parser.add_argument("--limit", type=int, default=0, help="only use the first N queries")
+    main(parser.parse_args())
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark of sparse embedding conversion into Milvus dictionaries.
+
+Compares the previous per-element conversion with `csr_to_dicts` on random CSR
+batches shaped like SPLADE output (30522-term vocabulary, a few hundred nonzeros
+per row) and checks that both produce the same dictionaries. No models are loaded.
+
+Usage:
+    python -m chatbot.backend.benchmarks.sparse_conversion_benchmark --rows 10000 --nnz 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+from scipy.sparse import csr_array
+
+from chatbot.backend.benchmarks.utils import print_table
+from chatbot.backend.services.models.sparse import csr_to_dicts
+
+SPLADE_VOCAB_SIZE = 30522
+
+
+def legacy_convert(sparse_embeddings):
+    """The per-element conversion previously used by `EmbeddingModel`."""
+    return [
+        {j: float(sparse_embeddings[i, j]) for j in sparse_embeddings[[i], :].nonzero()[1].tolist()}
+        for i in range(sparse_embeddings.shape[0])
+    ]
+
+
+def random_batch(rows: int, nnz: int, seed: int = 0) -> csr_array:
+    """
+    Builds a random float32 CSR batch with `nnz` distinct positive terms per row.
+    """
+    rng = np.random.default_rng(seed)
+    indices = np.sort(
+        np.stack([rng.choice(SPLADE_VOCAB_SIZE, nnz, replace=False) for _ in range(rows)]), axis=1
+    ).ravel()
+    data = rng.uniform(0.01, 3.0, rows * nnz).astype(np.float32)
+    indptr = np.arange(0, rows * nnz + 1, nnz)
+    return csr_array((data, indices, indptr), shape=(rows, SPLADE_VOCAB_SIZE))
+
+
+def time_conversion(convert, batch, repeats: int):
+    """
+    Returns the result of the last run and the mean time per run in seconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = convert(batch)
+    return result, (time.perf_counter() - start) / repeats
+
+
+def main(args):
+    batch = random_batch(args.rows, args.nnz)
+    print(f"Converting {args.rows} rows with {args.nnz} nonzeros each...")
+
+    rows = []
+    vectorized, vectorized_s = time_conversion(csr_to_dicts, batch, args.repeats)
+    rows.append({"path": "vectorized", "ms": round(1000 * vectorized_s, 2),
+                 "rows_per_s": round(args.rows / vectorized_s, 1)})
+
+    if not args.skip_legacy:
+        # the legacy path is slow enough that a single run is representative
+        legacy, legacy_s = time_conversion(legacy_convert, batch, 1)
+        rows.append({"path": "legacy", "ms": round(1000 * legacy_s, 2),
+                     "rows_per_s": round(args.rows / legacy_s, 1)})
+        assert legacy == vectorized, "vectorized conversion does not match the legacy output"
+        print(f"Outputs match, speedup {legacy_s / vectorized_s:.1f}x")
+
+    print_table(rows, ["path", "ms", "rows_per_s"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sparse embedding conversion")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--nnz", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--skip-legacy", action="store_true", help="only time the vectorized conversion")
+    main(parser.parse_args())
@@ -0,0 +1,46 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+
+from typing import Dict, List
+
+from chatbot.backend.services.metrics import percentile
+
+
+def summarize_latencies(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarizes latency samples (in seconds) into milliseconds.
+
+    Args:
+        samples (List[float]): Latencies in seconds.
+
+    Returns:
+        Dict[str, float]: Count, mean, p50, p99 and max latencies in milliseconds.
+    """
+    if not samples:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    return {
+        "count": len(samples),
+        "mean_ms": round(1000 * sum(samples) / len(samples), 2),
+        "p50_ms": round(1000 * percentile(samples, 50), 2),
+        "p99_ms": round(1000 * percentile(samples, 99), 2),
+        "max_ms": round(1000 * max(samples), 2),
+    }
+
+
+def print_table(rows: List[Dict], columns: List[str]):
+    """
+    Prints rows of results as a fixed-width table.
+
+    Args:
+        rows (List[Dict]): The rows to print.
+        columns (List[str]): The keys to print, in order.
+    """
+    widths = {
+        col: max(len(col), *(len(str(row.get(col, ""))) for row in rows)) if rows else len(col)
+        for col in columns
+    }
+    print("  ".join(col.ljust(widths[col]) for col in columns))
+    print("  ".join("-" * widths[col] for col in columns))
+    for row in rows:
+        print("  ".join(str(row.get(col, "")).ljust(widths[col]) for col in columns))
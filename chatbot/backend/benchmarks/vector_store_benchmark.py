@@ -0,0 +1,92 @@
+"""
+Offline benchmark of the local vector store backend.
+
+Ingests a synthetic corpus of random unit dense vectors and SPLADE-shaped sparse
+vectors into a temporary `LocalBackend`, then times hybrid searches at each limit.
+Queries are noisy copies of stored rows, and the share of queries whose source row
+is the top fused hit is reported as a sanity check. No network access or models are
+needed, so results are reproducible across runs and machines.
+
+Usage:
+    python -m chatbot.backend.benchmarks.vector_store_benchmark --rows 20000 --limits 3 20 50
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from chatbot.backend.benchmarks.sparse_conversion_benchmark import random_batch
+from chatbot.backend.benchmarks.utils import print_table, summarize_latencies
+from chatbot.backend.services.models.sparse import csr_to_dicts
+from chatbot.backend.services.vector_db.backends.local import DENSE_DIM, LocalBackend
+
+
+def synthetic_corpus(rows: int, nnz: int, seed: int = 0):
+    """
+    Builds random unit dense vectors and sparse dictionaries for `rows` documents.
+    """
+    rng = np.random.default_rng(seed)
+    dense = rng.standard_normal((rows, DENSE_DIM)).astype(np.float32)
+    dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+    sparse = csr_to_dicts(random_batch(rows, nnz, seed))
+    return dense, sparse
+
+
+def main(args):
+    dense, sparse = synthetic_corpus(args.rows, args.nnz)
+    rng = np.random.default_rng(1)
+    targets = rng.choice(args.rows, args.queries, replace=False)
+    query_dense = dense[targets] + args.noise * rng.standard_normal((args.queries, DENSE_DIM)).astype(np.float32)
+    query_sparse = [sparse[target] for target in targets]
+
+    with tempfile.TemporaryDirectory() as directory:
+        backend = LocalBackend("benchmark", directory=directory)
+        print(f"Inserting {args.rows} rows...")
+        start = time.perf_counter()
+        # inserts are persisted once at the end, as in `VectorDB.batch_ingestion`
+        with backend.batch_writes():
+            for offset in range(0, args.rows, args.batch_size):
+                end = offset + args.batch_size
+                backend.insert([
+                    ["Benchmark"] * len(dense[offset:end]),
+                    [f"doc-{row}" for row in range(offset, min(end, args.rows))],
+                    [""] * len(dense[offset:end]),
+                    dense[offset:end],
+                    sparse[offset:end],
+                ])
+        insert_s = time.perf_counter() - start
+        print(f"Inserted {args.rows / insert_s:.1f} rows/s")
+
+        rows = []
+        for limit in args.limits:
+            # build the inverted index outside the measurements
+            backend.search(query_dense[:1], query_sparse[:1], limit)
+            latencies, correct = [], 0
+            for i, target in enumerate(targets):
+                start = time.perf_counter()
+                result = backend.search(query_dense[i:i + 1], query_sparse[i:i + 1], limit)[0]
+                latencies.append(time.perf_counter() - start)
+                correct += result[0].auto_id == target
+            summary = summarize_latencies(latencies)
+            rows.append({
+                "limit": limit,
+                "p50_ms": summary["p50_ms"],
+                "p99_ms": summary["p99_ms"],
+                "qps": round(len(latencies) / sum(latencies), 1),
+                "top1_source": round(correct / len(targets), 4),
+            })
+
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the local vector store backend offline")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--nnz", type=int, default=200, help="nonzero sparse terms per row")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per insert")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.02, help="std of the noise added to query vectors")
+    parser.add_argument("--limits", type=int, nargs="+", default=[3, 20, 50])
+    main(parser.parse_args())
@@ -9,11 +9,10 @@ from typing import List
 import os
 import pickle
 import shutil
-from chatbot.backend.document_parser.document_parser import DocumentParser
+from chatbot.backend.document_parser.document_parser import document_parser
 
-# Initialize FastAPI application and DocumentParser instance
+# Initialize FastAPI application
 app = FastAPI()
-document_parser = DocumentParser()
 
 document_parser_router = APIRouter(prefix="/document-parser")
 
@@ -8,18 +8,20 @@ import os
 import pdfplumber
 import requests
 import shutil
+from contextlib import nullcontext
 from docx import Document
 from docx2pdf import convert
 from fpdf import FPDF
 import pickle
-import pytesseract
 from langchain_experimental.text_splitter import SemanticChunker
-from pdf2image import convert_from_path
 from PIL import Image
 from typing import List
+from chatbot.backend.document_parser.page_images import PageImageProvider
+from chatbot.backend.document_parser.pdf_text import extract_pdf_pages
 from chatbot.backend.services.logger import logger
 from chatbot.backend.services.models.embedding_model import embedding_model
 from chatbot.backend.services.models.models import vlm
+from chatbot.backend.services.registry import registry
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -231,13 +233,14 @@ class DocumentParser:
         if output_folder is None:
             output_folder = os.path.join(os.path.dirname(os.path.dirname(pdf_path)), "temp_images")
         os.makedirs(output_folder, exist_ok=True)
-        images = convert_from_path(pdf_path, dpi=dpi)
         image_paths = []
 
-        for i, image in enumerate(images):
-            image_path = os.path.join(output_folder, f"page_{i+1}.png")
-            image.save(image_path, "PNG")
-            image_paths.append(image_path)
+        # pages are rasterized window by window instead of all at once
+        with PageImageProvider(pdf_path, dpi=dpi) as pages:
+            for page_number, image in pages.pages():
+                image_path = os.path.join(output_folder, f"page_{page_number}.png")
+                image.save(image_path, "PNG")
+                image_paths.append(image_path)
 
         return image_paths
 
@@ -432,46 +435,40 @@ class DocumentParser:
 
         return image_paths
 
-    def extract_text_from_pdf(self, file_path: str):
+    def extract_text_from_pdf(self, file_path: str, page_images: PageImageProvider = None):
         """
         Extracts text from a PDF file.
 
         Args:
             file_path (str): Path to the PDF file.
+            page_images (PageImageProvider, optional): Rasterized pages shared with figure
+                extraction, used for the pages that need OCR.
 
         Returns:
             str: Extracted text from the PDF.
         """
-        """Extracts text from a PDF file."""
         extracted_text = ""
 
-        # Convert PDF pages to images
-        images = convert_from_path(file_path)
+        # Pages with a usable text layer are read directly, only the others are OCRed
+        pages = extract_pdf_pages(file_path, page_images=page_images)
 
-        for i, image in enumerate(images):
-            text = pytesseract.image_to_string(image)
-            extracted_text += f"\nPage {i+1}\n{text.strip()}\n\n"
-            print(f"Extracted OCR Text from Page {i+1}:\n{text}")
-        print(extracted_text)
+        for page in pages:
+            extracted_text += f"\nPage {page.page}\n{page.text.strip()}\n\n"
+        ocr_pages = [page.page for page in pages if page.method == "ocr"]
+        self.logger.info(
+            f"Extracted {len(pages)} pages of {file_path}: {len(pages) - len(ocr_pages)} from the text layer, "
+            f"{len(ocr_pages)} OCRed {ocr_pages}"
+        )
         return extracted_text
 
-    def extract_images_from_pdf(self, file_path: str, min_contour_area=5000):
-        """
-        Extracts images from a PDF file.
-
-        Args:
-            file_path (str): Path to the PDF file.
-            min_contour_area (int): Minimum contour area to consider an object as a figure.
-
-        Returns:
-            dict: A dictionary containing extracted figures.
-        """
+    def extract_images_from_pdf(self, file_path: str, min_contour_area=5000, page_images: PageImageProvider = None):
         """
         Extracts images from a PDF file.
 
         Args:
             file_path (str): Path to the PDF file.
             min_contour_area (int): Minimum contour area to consider an object as a figure.
+            page_images (PageImageProvider, optional): Rasterized pages shared with text extraction.
 
         Returns:
             dict: A dictionary containing extracted figures.
@@ -482,11 +479,35 @@ class DocumentParser:
                 os.remove(os.path.join(save_directory, file))  # Clear the directory before saving new images
         os.makedirs(save_directory, exist_ok=True)
 
-        images = convert_from_path(file_path)
-        extracted_figures = {}
+        with PageImageProvider(file_path) if page_images is None else nullcontext(page_images) as pages:
+            all_extracted_images = self._extract_figures(file_path, pages, save_directory, min_contour_area)
+
+        # Filter images after extraction
+        useful_figures = vlm.filter_images(all_extracted_images)
+
+        # Remove non-useful images and retain only useful ones
+        for file_path in all_extracted_images:
+            if file_path not in useful_figures:
+                os.remove(file_path)
+
+        extracted_figures = {os.path.basename(img_path).split("_figure_")[0].replace("page_", "Page "): [] for img_path in useful_figures}
+        for img_path in useful_figures:
+            page_info = os.path.basename(img_path).split("_figure_")[0].replace("page_", "Page ")
+            extracted_figures[page_info].append(img_path)
+
+        return extracted_figures
+
+    def _extract_figures(self, file_path: str, pages: PageImageProvider, save_directory: str, min_contour_area: int) -> List[str]:
+        """
+        Crops figures found by contour detection out of each page image and saves them.
+
+        Returns:
+            List[str]: Paths of the saved figures.
+        """
         all_extracted_images = []
 
-        for page_num, image in enumerate(images):
+        for page_number, image in pages.pages():
+            page_num = page_number - 1
             try:
                 if image is None:
                     self.logger.warning(f"Skipping page {page_num+1} in {file_path} (No image content).")
@@ -525,20 +546,7 @@ class DocumentParser:
             except Exception as e:
                 self.logger.error(f"Error processing page {page_num+1} of {file_path}: {e}")
 
-        # Filter images after extraction
-        useful_figures = vlm.filter_images(all_extracted_images)
-
-        # Remove non-useful images and retain only useful ones
-        for file_path in all_extracted_images:
-            if file_path not in useful_figures:
-                os.remove(file_path)
-
-        extracted_figures = {os.path.basename(img_path).split("_figure_")[0].replace("page_", "Page "): [] for img_path in useful_figures}
-        for img_path in useful_figures:
-            page_info = os.path.basename(img_path).split("_figure_")[0].replace("page_", "Page ")
-            extracted_figures[page_info].append(img_path)
-
-        return extracted_figures
+        return all_extracted_images
 
     def extract_text_from_docx(self, file_path: str):
         """
@@ -583,8 +591,10 @@ class DocumentParser:
         images = []
 
         if mime_type and "pdf" in mime_type:
-            text = self.extract_text_from_pdf(file_path)
-            images = self.extract_images_from_pdf(file_path)
+            # OCR and figure extraction share one rasterization of each page
+            with PageImageProvider(file_path) as page_images:
+                text = self.extract_text_from_pdf(file_path, page_images=page_images)
+                images = self.extract_images_from_pdf(file_path, page_images=page_images)
         elif mime_type and "word" in mime_type or file_path.endswith(".docx"):
             text = self.extract_text_from_docx(file_path)
             images = self.extract_images_from_docx(file_path)
@@ -761,3 +771,7 @@ class DocumentParser:
         extracted_text = self.extract_text_from_user_uploads(file_path)
         text_chunks = self.chunk_text(extracted_text)
         return text_chunks
+
+
+# Shared parser instance, created on first use
+document_parser = registry.register("document_parser", DocumentParser)
@@ -0,0 +1,207 @@
+"""
+Parallel, page-streamed OCR of PDFs.
+
+Pages are rasterized in windows of `OCR_PAGE_WINDOW` pages with pdf2image's
+`first_page`/`last_page`, never the whole document at once. Each window is
+rasterized and OCRed by a worker of a process pool, so a worker holds at most
+one window of page images. The text of each page is reassembled in page order.
+Workers can also save the pages they rasterize as PNG files, so that a
+`PageImageProvider` reuses them for figure extraction instead of rasterizing again.
+
+The module only imports pdf2image and pytesseract, so spawned workers start quickly.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pytesseract
+from dotenv import load_dotenv
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
+
+load_dotenv(override=True)
+
+# Rasterization resolution; Tesseract works best at 200-300 DPI
+OCR_DPI = int(os.getenv("OCR_DPI", 200))
+# Processes that rasterize and OCR pages; 1 runs OCR in the calling process
+OCR_WORKERS = int(os.getenv("OCR_WORKERS") or max(1, (os.cpu_count() or 2) // 2))
+# Pages rasterized per call to poppler; bounds the page images a worker holds at once
+OCR_PAGE_WINDOW = int(os.getenv("OCR_PAGE_WINDOW", 4))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = Lock()
+
+
+def ocr_executor() -> ProcessPoolExecutor:
+    """
+    Returns the shared OCR process pool, started on first use.
+
+    Workers are spawned rather than forked, since the server process holds threads
+    and model state that must not be copied into them.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=get_context("spawn"))
+        return _executor
+
+
+def shutdown_ocr_executor():
+    """
+    Stops the OCR process pool, if it was started, without waiting for running pages.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def pdf_page_count(path: str) -> int:
+    """
+    Returns the number of pages of a PDF without rasterizing it.
+    """
+    return int(pdfinfo_from_path(path)["Pages"])
+
+
+def page_windows(pages: Iterable[int], window: int = OCR_PAGE_WINDOW) -> List[Tuple[int, int]]:
+    """
+    Groups page numbers into (first_page, last_page) windows of consecutive pages.
+
+    Each run of consecutive pages is split into windows of at most `window` pages.
+    """
+    window = max(1, window)
+    windows = []
+    for page in sorted(set(pages)):
+        if windows and windows[-1][1] == page - 1 and page - windows[-1][0] < window:
+            windows[-1] = (windows[-1][0], page)
+        else:
+            windows.append((page, page))
+    return windows
+
+
+def page_image_path(directory: str, number: int) -> str:
+    """
+    Returns the path a page image is saved to in a directory of page images.
+    """
+    return os.path.join(directory, f"page_{number}.png")
+
+
+def save_page_image(image: Image.Image, path: str):
+    """
+    Saves a page image as PNG, favouring speed over size since the file is temporary.
+    """
+    image.save(path, "PNG", compress_level=1)
+
+
+def ocr_window(
+    path: str, first_page: int, last_page: int, dpi: int = OCR_DPI, save_dir: Optional[str] = None
+) -> List[str]:
+    """
+    Rasterizes and OCRs pages `first_page` to `last_page` of a PDF.
+
+    Args:
+        save_dir (str, optional): Directory to also save the page images to, see `page_image_path`.
+
+    Returns:
+        List[str]: The text of each page, in page order.
+    """
+    images = convert_from_path(path, dpi=dpi, first_page=first_page, last_page=last_page)
+    texts = []
+    for number, image in enumerate(images, start=first_page):
+        texts.append(pytesseract.image_to_string(image))
+        if save_dir is not None:
+            save_page_image(image, page_image_path(save_dir, number))
+        image.close()
+    return texts
+
+
+def ocr_files(paths: List[str]) -> List[str]:
+    """
+    OCRs page images saved to files.
+
+    Returns:
+        List[str]: The text of each image, in order.
+    """
+    texts = []
+    for path in paths:
+        with Image.open(path) as image:
+            texts.append(pytesseract.image_to_string(image))
+    return texts
+
+
+def ocr_image(image: Image.Image) -> str:
+    """
+    OCRs an already rasterized page, e.g. one shared by `PageImageProvider`.
+    """
+    return pytesseract.image_to_string(image)
+
+
+def ocr_pages(
+    path: str,
+    pages: Iterable[int],
+    dpi: int = OCR_DPI,
+    window: int = OCR_PAGE_WINDOW,
+    save_dir: Optional[str] = None,
+) -> Dict[int, str]:
+    """
+    OCRs some pages of a PDF, window by window, across the OCR process pool.
+
+    Args:
+        path (str): Path to the PDF.
+        pages (Iterable[int]): 1-based numbers of the pages to OCR.
+        dpi (int): Rasterization resolution.
+        window (int): Pages rasterized at once per task.
+        save_dir (str, optional): Directory to also save the page images to, see `page_image_path`.
+
+    Returns:
+        Dict[int, str]: The text of each page by page number, in page order.
+    """
+    windows = page_windows(pages, window)
+    if OCR_WORKERS <= 1 or len(windows) <= 1:
+        results = [ocr_window(path, first, last, dpi, save_dir) for first, last in windows]
+    else:
+        executor = ocr_executor()
+        futures = [executor.submit(ocr_window, path, first, last, dpi, save_dir) for first, last in windows]
+        # results are collected in submission order, which reassembles the pages in order
+        results = [future.result() for future in futures]
+    return {
+        page: text
+        for (first, _), texts in zip(windows, results)
+        for page, text in enumerate(texts, start=first)
+    }
+
+
+def ocr_page_files(paths: Dict[int, str], window: int = OCR_PAGE_WINDOW) -> Dict[int, str]:
+    """
+    OCRs already rasterized pages from their image files, `window` files per task of the OCR process pool.
+
+    Args:
+        paths (Dict[int, str]): Image file of each page by page number.
+        window (int): Files OCRed per task.
+
+    Returns:
+        Dict[int, str]: The text of each page by page number.
+    """
+    numbers = list(paths)
+    batches = [numbers[start:start + max(1, window)] for start in range(0, len(numbers), max(1, window))]
+    if OCR_WORKERS <= 1 or len(batches) <= 1:
+        results = [ocr_files([paths[number] for number in batch]) for batch in batches]
+    else:
+        executor = ocr_executor()
+        futures = [executor.submit(ocr_files, [paths[number] for number in batch]) for batch in batches]
+        results = [future.result() for future in futures]
+    return {number: text for batch, texts in zip(batches, results) for number, text in zip(batch, texts)}
+
+
+def ocr_pdf(path: str, dpi: int = OCR_DPI, window: int = OCR_PAGE_WINDOW) -> List[str]:
+    """
+    OCRs every page of a PDF.
+
+    Returns:
+        List[str]: The text of each page, in page order.
+    """
+    return list(ocr_pages(path, range(1, pdf_page_count(path) + 1), dpi, window).values())
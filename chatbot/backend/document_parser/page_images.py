@@ -0,0 +1,243 @@
+"""
+Page images of a PDF, rasterized once and shared by OCR and figure extraction.
+
+Pages are rasterized in windows of `OCR_PAGE_WINDOW` pages, the first time any
+consumer asks for them. Rasterized pages stay in memory up to
+`PAGE_IMAGE_CACHE_MAX_BYTES`. Beyond that, the least recently used pages are
+spilled to PNG files and read back from disk when needed again. Consumers that
+need a file get the spilled PNG of a page.
+
+`ocr` keeps OCR parallel: with several OCR workers and windows, the workers
+rasterize and OCR the pages not rasterized yet, saving them to the spill directory
+where the provider picks them up as spilled pages. Pages already on disk are OCRed
+from their files by the workers; with one worker or window, OCR runs on the pages
+in this process.
+"""
+
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pdf2image import convert_from_path
+from PIL import Image
+
+from chatbot.backend.document_parser import ocr
+from chatbot.backend.document_parser.ocr import (
+    OCR_DPI,
+    OCR_PAGE_WINDOW,
+    ocr_image,
+    ocr_page_files,
+    ocr_pages,
+    page_image_path,
+    page_windows,
+    pdf_page_count,
+    save_page_image,
+)
+from chatbot.backend.services.metrics import Counters
+
+load_dotenv(override=True)
+
+# Memory budget of the rasterized pages of one PDF
+PAGE_IMAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Parent directory of spilled page images; the system temp directory if unset
+PAGE_IMAGE_SPILL_DIR = os.getenv("PAGE_IMAGE_SPILL_DIR") or None
+
+
+def _image_nbytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+class PageImageProvider:
+    """
+    Rasterizes each page of a PDF at most once, keeping pages in memory under a byte cap
+    and spilling the rest to disk.
+
+    Not thread-safe; use one provider per document and consumer thread. Use it as a
+    context manager so that spilled files are removed.
+    """
+
+    def __init__(
+        self,
+        pdf_path: str,
+        dpi: int = OCR_DPI,
+        max_bytes: int = PAGE_IMAGE_CACHE_MAX_BYTES,
+        window: int = OCR_PAGE_WINDOW,
+        spill_dir: Optional[str] = PAGE_IMAGE_SPILL_DIR,
+    ):
+        self.pdf_path = pdf_path
+        self.dpi = dpi
+        self.max_bytes = max_bytes
+        self.window = max(1, window)
+        self.counters = Counters()
+        self._spill_parent = spill_dir
+        self._spill_dir: Optional[str] = None
+        self._page_count: Optional[int] = None
+        self._memory: "OrderedDict[int, Image.Image]" = OrderedDict()
+        self._memory_bytes = 0
+        self._spilled: Dict[int, str] = {}
+
+    @property
+    def page_count(self) -> int:
+        if self._page_count is None:
+            self._page_count = pdf_page_count(self.pdf_path)
+        return self._page_count
+
+    def page(self, number: int) -> Image.Image:
+        """
+        Returns the image of a page, rasterizing its window if no consumer asked for it yet.
+
+        Args:
+            number (int): 1-based page number.
+
+        Returns:
+            Image.Image: The page image. Do not close it, it may be shared.
+        """
+        if not 1 <= number <= self.page_count:
+            raise IndexError(f"Page {number} out of range for {self.pdf_path} with {self.page_count} pages")
+        image = self._memory.get(number)
+        if image is not None:
+            self._memory.move_to_end(number)
+            self.counters.increment("memory_hits")
+            return image
+        if number in self._spilled:
+            self.counters.increment("disk_hits")
+            image = Image.open(self._spilled[number])
+            image.load()
+        else:
+            self._rasterize(number)
+            # a tiny memory cap may already have spilled the page again
+            return self._memory[number] if number in self._memory else self.page(number)
+        self._remember(number, image)
+        return image
+
+    def page_path(self, number: int) -> str:
+        """
+        Returns the path of a PNG file of a page, spilling the page to disk if needed.
+        """
+        if number not in self._spilled:
+            self._spill(number, self.page(number))
+        return self._spilled[number]
+
+    def pages(self, numbers: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, Image.Image]]:
+        """
+        Yields (page number, image) pairs, all pages in order by default.
+        """
+        for number in numbers if numbers is not None else range(1, self.page_count + 1):
+            yield number, self.page(number)
+
+    def page_paths(self, numbers: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Yields (page number, PNG path) pairs, all pages in order by default.
+        """
+        for number in numbers if numbers is not None else range(1, self.page_count + 1):
+            yield number, self.page_path(number)
+
+    def ocr(self, numbers: Iterable[int]) -> Dict[int, str]:
+        """
+        OCRs pages, rasterizing each of them at most once for all consumers of the provider.
+
+        Args:
+            numbers (Iterable[int]): 1-based numbers of the pages to OCR.
+
+        Returns:
+            Dict[int, str]: The text of each page by page number, in page order.
+        """
+        numbers = sorted(set(numbers))
+        texts: Dict[int, str] = {}
+        missing = [number for number in numbers if number not in self._memory and number not in self._spilled]
+        if self._parallel(missing):
+            texts.update(ocr_pages(self.pdf_path, missing, self.dpi, self.window, save_dir=self._spill_directory()))
+            for number in missing:
+                self._spilled[number] = page_image_path(self._spill_directory(), number)
+            self.counters.increment("rasterized_pages", len(missing))
+        on_disk = [number for number in numbers if number not in texts and number not in self._memory
+                   and number in self._spilled]
+        if self._parallel(on_disk):
+            texts.update(ocr_page_files({number: self._spilled[number] for number in on_disk}, self.window))
+        for number in numbers:
+            if number not in texts:
+                texts[number] = ocr_image(self.page(number))
+        return {number: texts[number] for number in numbers}
+
+    def _parallel(self, numbers: List[int]) -> bool:
+        """
+        Checks whether OCRing these pages would use more than one OCR worker.
+        """
+        return ocr.OCR_WORKERS > 1 and len(page_windows(numbers, self.window)) > 1
+
+    def _rasterize(self, number: int):
+        """
+        Rasterizes the window of pages starting at `number`, skipping pages already rasterized.
+        """
+        last = number
+        while (
+            last < min(number + self.window - 1, self.page_count)
+            and last + 1 not in self._memory
+            and last + 1 not in self._spilled
+        ):
+            last += 1
+        images = convert_from_path(self.pdf_path, dpi=self.dpi, first_page=number, last_page=last)
+        self.counters.increment("rasterized_pages", len(images))
+        for page_number, image in enumerate(images, start=number):
+            self._remember(page_number, image)
+
+    def _remember(self, number: int, image: Image.Image):
+        """
+        Keeps a page in memory, spilling the least recently used pages beyond the byte cap.
+
+        The page just added is kept even if it alone exceeds the cap.
+        """
+        self._memory[number] = image
+        self._memory_bytes += _image_nbytes(image)
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            evicted, evicted_image = self._memory.popitem(last=False)
+            self._memory_bytes -= _image_nbytes(evicted_image)
+            if evicted not in self._spilled:
+                self._spill(evicted, evicted_image)
+            self.counters.increment("evictions")
+
+    def _spill_directory(self) -> str:
+        if self._spill_dir is None:
+            if self._spill_parent:
+                os.makedirs(self._spill_parent, exist_ok=True)
+            self._spill_dir = tempfile.mkdtemp(prefix="page_images_", dir=self._spill_parent)
+        return self._spill_dir
+
+    def _spill(self, number: int, image: Image.Image):
+        path = page_image_path(self._spill_directory(), number)
+        save_page_image(image, path)
+        self._spilled[number] = path
+        self.counters.increment("spilled_pages")
+
+    def stats(self) -> dict:
+        """
+        Returns rasterized, spilled and evicted page counts and the memory in use.
+        """
+        return {
+            "pages_in_memory": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "pages_on_disk": len(self._spilled),
+            **self.counters.snapshot(),
+        }
+
+    def close(self):
+        """
+        Releases the page images and removes the spilled files.
+        """
+        for image in self._memory.values():
+            image.close()
+        self._memory.clear()
+        self._memory_bytes = 0
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+        self._spilled.clear()
+
+    def __enter__(self) -> "PageImageProvider":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
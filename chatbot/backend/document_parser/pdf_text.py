@@ -0,0 +1,126 @@
+"""
+Hybrid PDF text extraction: the native text layer where a page has one, OCR elsewhere.
+
+Born-digital pages are read with pdfplumber, which takes milliseconds per page.
+Only scanned or image-only pages, whose text layer is missing, too short or
+unreadable, are rasterized and OCRed.
+
+Usage:
+    python -m chatbot.backend.document_parser.pdf_text contract.pdf
+"""
+
+import argparse
+import os
+import re
+import time
+from typing import List, Optional
+
+import pdfplumber
+from dotenv import load_dotenv
+
+from chatbot.backend.document_parser.ocr import OCR_DPI, OCR_PAGE_WINDOW, ocr_pages
+from chatbot.backend.document_parser.page_images import PageImageProvider
+
+load_dotenv(override=True)
+
+# A page needs at least this many non-whitespace characters in its text layer to skip OCR
+PDF_TEXT_LAYER_MIN_CHARS = int(os.getenv("PDF_TEXT_LAYER_MIN_CHARS", 50))
+# Pages whose text layer is mostly unmapped glyphs, e.g. "(cid:42)", are OCRed instead
+PDF_TEXT_LAYER_MAX_CID_RATIO = 0.1
+
+_CID_PATTERN = re.compile(r"\(cid:\d+\)")
+
+
+class PageText:
+    """
+    The extracted text of one PDF page.
+
+    Attributes:
+        page (int): 1-based page number.
+        text (str): The page text.
+        method (str): "text_layer" or "ocr".
+    """
+
+    __slots__ = ("page", "text", "method")
+
+    def __init__(self, page: int, text: str, method: str):
+        self.page = page
+        self.text = text
+        self.method = method
+
+    def to_dict(self) -> dict:
+        return {"page": self.page, "method": self.method, "chars": len(self.text.strip())}
+
+    def __repr__(self) -> str:
+        return f"PageText(page={self.page}, method={self.method!r}, chars={len(self.text.strip())})"
+
+
+def has_text_layer(text: str, min_chars: int = PDF_TEXT_LAYER_MIN_CHARS) -> bool:
+    """
+    Checks whether a page's native text is usable instead of OCR.
+    """
+    visible = len("".join(text.split()))
+    if visible < min_chars:
+        return False
+    cid_chars = sum(len(match) for match in _CID_PATTERN.findall(text))
+    return cid_chars / visible <= PDF_TEXT_LAYER_MAX_CID_RATIO
+
+
+def extract_pdf_pages(
+    path: str,
+    min_chars: int = PDF_TEXT_LAYER_MIN_CHARS,
+    dpi: int = OCR_DPI,
+    window: int = OCR_PAGE_WINDOW,
+    page_images: Optional[PageImageProvider] = None,
+) -> List[PageText]:
+    """
+    Extracts the text of every page of a PDF, OCRing only the pages without a usable text layer.
+
+    Args:
+        path (str): Path to the PDF.
+        min_chars (int): Minimum non-whitespace characters of a usable text layer.
+        dpi (int): Rasterization resolution of OCRed pages.
+        window (int): Pages rasterized at once per OCR task.
+        page_images (PageImageProvider, optional): Page images shared with other consumers,
+            e.g. figure extraction. Scanned pages are OCRed through it, so that each page
+            is rasterized once, still in parallel across the OCR workers. Its own DPI and
+            window are used.
+
+    Returns:
+        List[PageText]: The text and extraction method of each page, in page order.
+    """
+    pages = []
+    with pdfplumber.open(path) as pdf:
+        for number, page in enumerate(pdf.pages, start=1):
+            text = page.extract_text() or ""
+            pages.append(PageText(number, text, "text_layer" if has_text_layer(text, min_chars) else "ocr"))
+            # drop pdfminer's parsed layout of the page, which is kept for the lifetime of the document
+            page.flush_cache()
+
+    scanned = [page.page for page in pages if page.method == "ocr"]
+    if scanned:
+        if page_images is not None:
+            ocr_texts = page_images.ocr(scanned)
+        else:
+            ocr_texts = ocr_pages(path, scanned, dpi, window)
+        for page in pages:
+            if page.method == "ocr":
+                page.text = ocr_texts[page.page]
+    return pages
+
+
+def main(args):
+    start = time.perf_counter()
+    pages = extract_pdf_pages(args.pdf, args.min_chars)
+    seconds = time.perf_counter() - start
+    for page in pages:
+        print(f"Page {page.page:>4}  {page.method:<10}  {len(page.text.strip()):>6} chars")
+    ocr_count = sum(page.method == "ocr" for page in pages)
+    print(f"{len(pages)} pages in {seconds:.2f}s: {len(pages) - ocr_count} from the text layer, {ocr_count} OCRed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report how each page of a PDF is extracted")
+    parser.add_argument("pdf")
+    parser.add_argument("--min-chars", type=int, default=PDF_TEXT_LAYER_MIN_CHARS)
+    main(parser.parse_args())
@@ -0,0 +1,11 @@
+from chatbot.backend.document_parser.ocr import page_windows
+
+
+def test_page_windows_group_consecutive_pages():
+    assert page_windows([1, 2, 3, 7, 8, 10], window=4) == [(1, 3), (7, 8), (10, 10)]
+
+
+def test_page_windows_split_long_runs():
+    assert page_windows(range(1, 10), window=4) == [(1, 4), (5, 8), (9, 9)]
+    assert page_windows([3, 1, 2, 2], window=1) == [(1, 1), (2, 2), (3, 3)]
+    assert page_windows([], window=4) == []
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+from PIL import Image
+
+from chatbot.backend.document_parser import ocr, page_images
+from chatbot.backend.document_parser.page_images import PageImageProvider
+
+PAGE_BYTES = 10 * 10 * 3
+
+
+@pytest.fixture
+def rasterized(monkeypatch):
+    """Fakes a 6-page PDF whose page images are filled with their page number."""
+    calls = []
+
+    def convert_from_path(path, dpi, first_page, last_page):
+        calls.append((first_page, last_page))
+        return [Image.new("RGB", (10, 10), (number, 0, 0)) for number in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(page_images, "convert_from_path", convert_from_path)
+    monkeypatch.setattr(page_images, "pdf_page_count", lambda path: 6)
+    return calls
+
+
+def test_pages_are_rasterized_once_per_window(rasterized, tmp_path):
+    with PageImageProvider("doc.pdf", window=4, spill_dir=str(tmp_path)) as provider:
+        assert [image.getpixel((0, 0))[0] for _, image in provider.pages()] == [1, 2, 3, 4, 5, 6]
+        hits = provider.stats()["memory_hits"]
+        provider.page(2)
+
+        assert rasterized == [(1, 4), (5, 6)]
+        assert provider.stats()["memory_hits"] == hits + 1
+
+
+def test_window_stops_before_pages_already_rasterized(rasterized, tmp_path):
+    with PageImageProvider("doc.pdf", window=4, spill_dir=str(tmp_path)) as provider:
+        provider.page(3)
+        provider.page(1)
+
+        assert rasterized == [(3, 6), (1, 2)]
+        with pytest.raises(IndexError):
+            provider.page(7)
+
+
+def test_least_recently_used_pages_are_spilled_and_read_back(rasterized, tmp_path):
+    with PageImageProvider("doc.pdf", max_bytes=2 * PAGE_BYTES, window=1, spill_dir=str(tmp_path)) as provider:
+        provider.page(1)
+        provider.page(2)
+        provider.page(1)  # page 2 is now the least recently used
+        provider.page(3)
+
+        assert provider.stats()["pages_in_memory"] == 2
+        assert provider.stats()["pages_on_disk"] == 1
+        assert provider.page(2).getpixel((0, 0))[0] == 2
+        assert provider.stats()["disk_hits"] == 1
+        assert rasterized == [(1, 1), (2, 2), (3, 3)]
+
+
+def test_page_path_spills_the_page_and_close_removes_it(rasterized, tmp_path):
+    provider = PageImageProvider("doc.pdf", window=1, spill_dir=str(tmp_path))
+    path = provider.page_path(5)
+
+    assert Image.open(path).getpixel((0, 0))[0] == 5
+    assert provider.page_path(5) == path
+    provider.close()
+    assert not os.path.exists(path)
+
+
+def test_ocr_in_process_reuses_rasterized_pages(rasterized, tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, "OCR_WORKERS", 1)
+    monkeypatch.setattr(page_images, "ocr_image", lambda image: f"page {image.getpixel((0, 0))[0]}")
+
+    with PageImageProvider("doc.pdf", window=2, spill_dir=str(tmp_path)) as provider:
+        provider.page(1)
+
+        assert provider.ocr([3, 1, 2]) == {1: "page 1", 2: "page 2", 3: "page 3"}
+        assert rasterized == [(1, 2), (3, 4)]
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from deepeval import evaluate
 from deepeval.metrics import GEval
 from deepeval.test_case import LLMTestCaseParams, LLMTestCase
@@ -6,6 +8,7 @@ from deepeval.dataset import EvaluationDataset
 from chatbot.backend.evaluation.params import AGREEMENT_TYPE_QUERIES, AGREEMENT_TYPE_GROUND_TRUTH, GENERAL_QUERIES, GENERAL_GROUND_TRUTH, IEP_CONRACTING_HUB_QUERIES, IEP_CONTRACTING_HUB_GROUND_TRUTH, REDIRECT_TTI_QUERIES, REDIRECT_TTI_GROUND_TRUTH, REDIRECT_OLA_QUERIES, REDIRECT_OLA_GROUND_TRUTH, REDIRECT_IRB_QUERIES, REDIRECT_IRB_GROUND_TRUTH, PRE_AWARD_QUERIES, PRE_AWARD_GROUND_TRUTH, POST_AWARD_QUERIES, POST_AWARD_GROUND_TRUTH
 from chatbot.backend.inference.response_generator import ResponseGenerator
 from chatbot.backend.services.vector_db.db import vector_db
+from chatbot.backend.services.vector_db.retrieval import RetrievalParams, retrieval_pipeline
 from chatbot.backend.services.logger import logger
 
 
@@ -16,6 +19,7 @@ class Evaluator:
     ):
         self.response_generator = ResponseGenerator()
         self.vector_db = vector_db
+        self.retrieval = retrieval_pipeline
         self.logger = logger
 
     def _get_metrics(self):
@@ -63,12 +67,24 @@ class Evaluator:
             "faithfulness": faithfulness_metric,
         }
 
-    def _get_test_cases(self, query, truth):
+    def _get_test_cases(self, query, truth, retrieval_params: Optional[RetrievalParams] = None):
+        retrieval_params = retrieval_params or RetrievalParams()
         test_cases = []
+        self.logger.info("[VectorDB] retrieving contexts")
+        # one batched encode and candidate search for all queries, then the same rerank,
+        # thresholds and token budget as the chat API
+        candidates = self.retrieval.batch_search(query, retrieval_params)
         self.logger.info("[ResponseGenerator] generating responses")
-        for q, ground_truth in zip(query, truth):
-            _, context_list = self.vector_db.hybrid_search(query=q)
-            response = self.response_generator._generate_answer(user_query=q)
+        for q, ground_truth, hits in zip(query, truth, candidates):
+            result = self.retrieval.rerank(q, hits, retrieval_params)
+            if result:
+                context, context_list = self.retrieval.build_context(result, retrieval_params)
+                response = self.response_generator._generate_answer(
+                    user_query=q, context=context, retrieval_params=retrieval_params
+                )
+            else:
+                context_list = []
+                response = self.response_generator._low_confidence()
             test_case = LLMTestCase(
                 input=q,
                 actual_output=response,
@@ -3,17 +3,30 @@ This module defines the API endpoints for handling chat queries and email escala
 It uses FastAPI for routing and Pydantic for request validation.
 """
 
+import json
+
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel  # Import Pydantic's BaseModel
-from chatbot.backend.inference.response_generator import ResponseGenerator
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field  # Import Pydantic's BaseModel
+from typing import List, Optional
+from chatbot.backend.inference.response_generator import AsyncResponseGenerator
+from chatbot.backend.services.metrics import stage_latencies
+from chatbot.backend.services.registry import registry
+from chatbot.backend.services.models.embedding_batcher import (
+    EMBEDDING_BATCHING_ENABLED,
+    embedding_batcher,
+)
 from chatbot.backend.services.vector_db.db import vector_db
+from chatbot.backend.services.vector_db.partitions import PartitionName
+from chatbot.backend.services.vector_db.retrieval import RetrievalParams
 import requests
 import httpx
 
 # URL for hybrid search in the vector database
 HYBRID_SEARCH_URL = "http://localhost:8000/vector-db/hybrid-search/"
-# Instance of the ResponseGenerator class for generating responses and emails
-response_generator = ResponseGenerator()
+# Instance of the AsyncResponseGenerator class for generating responses and emails
+# without blocking the event loop, created on first use
+response_generator = registry.register("response_generator", AsyncResponseGenerator)
 
 # ==========================
 # FastAPI Router for Chat Queries
@@ -31,10 +44,35 @@ class ChatQueryRequest(BaseModel):  # Pydantic model for chat query requests
         user_query (str): The user's query.
         uploaded_content (str): Optional content uploaded by the user.
         chat_history (str): Optional chat history.
+        candidate_k (int): Optional number of first-stage retrieval candidates.
+        final_k (int): Optional number of documents passed to the answer model.
+        rerank (bool): Optionally enable or disable cross-encoder reranking.
+        rerank_batch_size (int): Optional cross-encoder batch size.
+        max_context_tokens (int): Optional token budget of the retrieved context, 0 for no limit.
+        partitions (List[str]): Optional document types to search, e.g. ["faq", "emails"].
     """
     user_query: str
     uploaded_content: str = ""
     chat_history: str = ""
+    candidate_k: Optional[int] = Field(None, ge=1, le=200)
+    final_k: Optional[int] = Field(None, ge=1, le=50)
+    rerank: Optional[bool] = None
+    rerank_batch_size: Optional[int] = Field(None, ge=1, le=256)
+    max_context_tokens: Optional[int] = Field(None, ge=0)
+    partitions: Optional[List[PartitionName]] = Field(None, min_length=1)
+
+    def retrieval_params(self) -> RetrievalParams:
+        """
+        Returns the retrieval settings of the request, falling back to the configured defaults.
+        """
+        return RetrievalParams.with_overrides(
+            candidate_k=self.candidate_k,
+            final_k=self.final_k,
+            rerank=self.rerank,
+            rerank_batch_size=self.rerank_batch_size,
+            max_context_tokens=self.max_context_tokens,
+            partitions=self.partitions,
+        )
 
 class EmailEscalationRequest(BaseModel):  # Pydantic model for email escalation requests
     """
@@ -57,16 +95,66 @@ async def chat_query(request: ChatQueryRequest) -> dict:  # Use the Pydantic mod
         dict: A dictionary containing the generated answer.
     """
     try:  # Attempt to process the query
-        answer = response_generator.query_workflow(
+        answer = await response_generator.aquery_workflow(
             user_query=request.user_query,
             uploaded_content=request.uploaded_content,
             chat_history=request.chat_history,
+            retrieval_params=request.retrieval_params(),
         )
 
         return {"answer": answer}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))  # Handle errors gracefully
     
+@chat_router.post("/query/stream")  # Endpoint for streaming chat answers as Server-Sent Events
+async def chat_query_stream(request: ChatQueryRequest) -> StreamingResponse:
+    """
+    Streams the response to a chat query as Server-Sent Events.
+
+    Events are emitted in order: `route` with the routing decision, `clarifying_question`
+    for vague queries, `sources` with the retrieved document metadata, `token` for each
+    answer token, and finally `done` with the complete answer. Failures are reported as
+    an `error` event since the response status has already been sent.
+
+    Args:
+        request (ChatQueryRequest): The request body containing user query, uploaded content, and chat history.
+
+    Returns:
+        StreamingResponse: A `text/event-stream` response.
+    """
+    async def event_stream():
+        try:
+            async for event, data in response_generator.astream_query_workflow(
+                user_query=request.user_query,
+                uploaded_content=request.uploaded_content,
+                chat_history=request.chat_history,
+                retrieval_params=request.retrieval_params(),
+            ):
+                yield format_sse(event, data)
+        except Exception as e:
+            yield format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def format_sse(event: str, data: dict) -> str:
+    """
+    Formats a single Server-Sent Event.
+
+    Args:
+        event (str): The event type.
+        data (dict): The JSON-serialisable event payload.
+
+    Returns:
+        str: The encoded event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @chat_router.post("/email-escalation/")  # Endpoint for handling email escalations
 async def email_escalation(request: EmailEscalationRequest) -> dict:  # Use the Pydantic model
     """
@@ -80,7 +168,7 @@ async def email_escalation(request: EmailEscalationRequest) -> dict:  # Use the
     """
     try:  # Attempt to generate the email
         # Get the email subject, body, and recipients
-        email_subject, email_body, _ = response_generator.generate_email(
+        email_subject, email_body, _ = await response_generator.agenerate_email(
             chat_history=request.chat_history
         )
         
@@ -91,3 +179,26 @@ async def email_escalation(request: EmailEscalationRequest) -> dict:  # Use the
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@chat_router.get("/metrics/")  # Endpoint for inspecting chat workflow latencies
+async def chat_metrics() -> dict:
+    """
+    Returns per-stage latency statistics of the chat query workflow.
+
+    Returns:
+        dict: Whether speculative retrieval is enabled, p50/p99 latencies per stage and
+        semantic/routing/embedding cache and embedding batching statistics, and how often
+        retrieval fell below the score thresholds.
+    """
+    semantic_cache = response_generator.semantic_cache
+    routing_cache = response_generator.routing_cache
+    return {
+        "speculative": response_generator.speculative,
+        "stage_latencies": stage_latencies.summary(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "routing_cache": routing_cache.stats() if routing_cache else None,
+        "embedding_cache": vector_db.embedding_model.cache_stats(),
+        "embedding_batcher": embedding_batcher.stats() if EMBEDDING_BATCHING_ENABLED else None,
+        "retrieval_thresholds": response_generator.retrieval.stats(),
+    }
@@ -1,35 +1,108 @@
-from typing import List, Tuple
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
 
 from chatbot.backend.chains.query_chains import (
     routing_chain,
     answer_chain,
     generate_email_chain,
 )
+from chatbot.backend.services.cache.routing_cache import (
+    ROUTING_CACHE_ENABLED,
+    RoutingCache,
+)
+from chatbot.backend.services.cache.semantic_cache import (
+    SEMANTIC_CACHE_ENABLED,
+    SemanticCache,
+)
+from chatbot.backend.services.executors import (
+    embedding_executor,
+    milvus_executor,
+    run_in_executor,
+)
 from chatbot.backend.services.logger import logger
+from chatbot.backend.services.metrics import format_timings, stage_latencies
 from chatbot.backend.services.vector_db.db import vector_db
+from chatbot.backend.services.vector_db.results import RetrievalResult
+from chatbot.backend.services.vector_db.retrieval import RetrievalParams, retrieval_pipeline
+
+load_dotenv(override=True)
+
+# start retrieval alongside the routing LLM call instead of after it
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+# response when retrieval finds nothing relevant: "fallback" asks the user to rephrase,
+# "escalate" points them to email escalation
+LOW_CONFIDENCE_ACTION = os.getenv("LOW_CONFIDENCE_ACTION", "escalate").lower()
+
+LOW_CONFIDENCE_RESPONSES = {
+    "fallback": (
+        "I could not find information about this in the IEP knowledge base. "
+        "Could you rephrase your question or add more details?"
+    ),
+    "escalate": (
+        "I could not find information about this in the IEP knowledge base. "
+        "You can escalate your question to the IEP team by email and they will get back to you."
+    ),
+}
 
 
 class ResponseGenerator:
     """class to generate response to user queries"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        speculative: bool = SPECULATIVE_RETRIEVAL,
+        use_semantic_cache: bool = SEMANTIC_CACHE_ENABLED,
+        use_routing_cache: bool = ROUTING_CACHE_ENABLED,
+    ):
         self.unrelated_response = "I am sorry, but I am unable to provide a response to your query at the moment."
+        # returned without calling the answer LLM when no retrieved document clears the score thresholds
+        self.low_confidence_response = LOW_CONFIDENCE_RESPONSES.get(
+            LOW_CONFIDENCE_ACTION, LOW_CONFIDENCE_RESPONSES["escalate"]
+        )
         self.vector_db = vector_db
+        self.retrieval = retrieval_pipeline
         self.logger = logger
+        self.speculative = speculative
+
+        self.semantic_cache = None
+        if use_semantic_cache:
+            self.semantic_cache = SemanticCache()
+            # cached answers are stale once the corpus changes
+            self.vector_db.add_corpus_listener(self.semantic_cache.invalidate)
+
+        self.routing_cache = RoutingCache() if use_routing_cache else None
 
     def _router(
         self,
         user_query: str,
         uploaded_content: str = "",
         chat_history: str = "",
+        query_embedding: Optional[np.ndarray] = None,
     ) -> Tuple[str, str]:
         """
         routes user queries to the appropriate response generation
 
+        Repeated requests are answered from the routing cache without an LLM call.
+
+        Args:
+            query_embedding (np.ndarray, optional): normalized query embedding for the routing fast path
+
         Returns:
             classification (Literal["related", "vague", "unrelated"]): classification of user query
             clarifying_question (str): clarifying question if classification is vague
         """
+        if self.routing_cache is not None:
+            routing = self.routing_cache.lookup(
+                user_query, uploaded_content, chat_history, query_embedding
+            )
+            if routing is not None:
+                return routing
+
         result = routing_chain.invoke(
             {
                 "user_query": user_query,
@@ -44,29 +117,84 @@ class ResponseGenerator:
             result.clarifying_question,
         )
 
+        if self.routing_cache is not None:
+            self.routing_cache.store(
+                user_query,
+                (classification, reasoning, clarifying_question),
+                uploaded_content,
+                chat_history,
+                query_embedding,
+            )
+
         return classification, reasoning, clarifying_question
 
+    def _retrieve(
+        self,
+        user_query: str,
+        timings: Optional[Dict[str, float]] = None,
+        retrieval_params: Optional[RetrievalParams] = None,
+    ) -> RetrievalResult:
+        """
+        encodes the query, searches the vector db and reranks the candidates, timing each stage
+
+        Args:
+            retrieval_params (RetrievalParams, optional): candidate count, rerank and threshold settings
+
+        Returns:
+            result: final hits, empty if nothing cleared the score thresholds
+        """
+        with stage_latencies.time("embed", timings):
+            dense_embedding, sparse_embedding = self.vector_db.query_encoder.encode_texts(
+                [user_query]
+            )
+        with stage_latencies.time("search", timings):
+            hits = self.retrieval.search(dense_embedding, sparse_embedding, retrieval_params)
+        with stage_latencies.time("rerank", timings):
+            return self.retrieval.rerank(user_query, hits, retrieval_params)
+
+    def _low_confidence(self) -> str:
+        """
+        logs and returns the templated response for queries without relevant documents
+
+        Returns:
+            response: the configured fallback or escalation message
+        """
+        self.logger.info(f"no relevant documents, responding with `{LOW_CONFIDENCE_ACTION}` template")
+        return self.low_confidence_response
+
     def _generate_answer(
         self,
         user_query: str,
         uploaded_content: str = "",
         chat_history: str = "",
+        context: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None,
+        retrieval_params: Optional[RetrievalParams] = None,
     ) -> str:
         """
         generates response to user queries
 
+        Args:
+            context (str, optional): pre-fetched retrieval context, searched for if not given
+            retrieval_params (RetrievalParams, optional): settings for retrieving the context
+
         Returns:
-            answer: response to user query
+            answer: response to user query, or the low-confidence template if nothing relevant was retrieved
         """
-        context, _ = self.vector_db.hybrid_search(query=user_query)
-        response = answer_chain.invoke(
-            {
-                "user_query": user_query,
-                "uploaded_content": uploaded_content,
-                "context": context,
-                "chat_history": chat_history,
-            }
-        )
+        if context is None:
+            result = self._retrieve(user_query, timings, retrieval_params)
+            if not result:
+                return self._low_confidence()
+            context, _ = self.retrieval.build_context(result, retrieval_params)
+        with stage_latencies.time("answer", timings):
+            response = answer_chain.invoke(
+                {
+                    "user_query": user_query,
+                    "uploaded_content": uploaded_content,
+                    "context": context,
+                    "chat_history": chat_history,
+                }
+            )
         return response
 
     def query_workflow(
@@ -74,19 +202,133 @@ class ResponseGenerator:
         user_query: str,
         uploaded_content: str = "",
         chat_history: str = "",
+        retrieval_params: Optional[RetrievalParams] = None,
     ) -> str:
         """
         complete workflow to generate response to user queries
 
+        Standalone queries are first looked up in the semantic cache. In speculative
+        mode, retrieval starts at the same time as the routing call and its result is
+        discarded if the query is not `related`.
+
+        Args:
+            retrieval_params (RetrievalParams, optional): per-request retrieval settings
+
         Returns:
             answer: response to user query
         """
-        classification, reasoning, clarifying_question = self._router(
+        timings = {}
+        with stage_latencies.time("total", timings):
+            response, query_embedding = None, None
+            use_cache = self._use_semantic_cache(uploaded_content, chat_history, retrieval_params)
+            if use_cache:
+                with stage_latencies.time("cache_lookup", timings):
+                    response, query_embedding = self.semantic_cache.lookup(user_query)
+
+            if response is None:
+                response = self._answer_query(
+                    user_query=user_query,
+                    uploaded_content=uploaded_content,
+                    chat_history=chat_history,
+                    query_embedding=query_embedding,
+                    timings=timings,
+                    retrieval_params=retrieval_params,
+                )
+                # fallbacks are not cached so that they stop as soon as the corpus can answer
+                if use_cache and response != self.low_confidence_response:
+                    self.semantic_cache.store(user_query, response, query_embedding)
+
+        self.logger.info(f"stage timings: {format_timings(timings)}")
+        return response
+
+    def _answer_query(
+        self,
+        user_query: str,
+        uploaded_content: str = "",
+        chat_history: str = "",
+        query_embedding: Optional[np.ndarray] = None,
+        timings: Optional[Dict[str, float]] = None,
+        retrieval_params: Optional[RetrievalParams] = None,
+    ) -> str:
+        """
+        routes the query and generates the response, bypassing the semantic cache
+
+        Returns:
+            answer: response to user query
+        """
+        retrieval = None
+        if self.speculative:
+            retrieval = milvus_executor.submit(self._retrieve, user_query, timings, retrieval_params)
+
+        with stage_latencies.time("route", timings):
+            classification, reasoning, clarifying_question = self._router(
+                user_query=user_query,
+                uploaded_content=uploaded_content,
+                chat_history=chat_history,
+                query_embedding=query_embedding,
+            )
+
+        routed_response = self._routed_response(
+            classification, reasoning, clarifying_question
+        )
+        if routed_response is not None:
+            if retrieval is not None:
+                retrieval.cancel()
+            return routed_response
+
+        context = None
+        if retrieval is not None:
+            # only the part of retrieval that outlasted routing is on the critical path
+            with stage_latencies.time("retrieve_wait", timings):
+                result = retrieval.result()
+            if not result:
+                return self._low_confidence()
+            context, _ = self.retrieval.build_context(result, retrieval_params)
+        return self._generate_answer(
             user_query=user_query,
             uploaded_content=uploaded_content,
             chat_history=chat_history,
+            context=context,
+            timings=timings,
+            retrieval_params=retrieval_params,
         )
 
+    def _use_semantic_cache(
+        self,
+        uploaded_content: str,
+        chat_history: str,
+        retrieval_params: Optional[RetrievalParams] = None,
+    ) -> bool:
+        """
+        checks whether the semantic cache applies to a request
+
+        Answers that depend on uploaded content or chat history are not reusable
+        across users, and cached answers were produced with the default retrieval
+        settings, so such requests bypass the cache.
+
+        Returns:
+            use_cache: whether to look up and store the response in the cache
+        """
+        if self.semantic_cache is None:
+            return False
+        custom_retrieval = retrieval_params is not None and retrieval_params != RetrievalParams()
+        if uploaded_content or chat_history or custom_retrieval:
+            self.semantic_cache.record_bypass()
+            return False
+        return True
+
+    def _routed_response(
+        self,
+        classification: str,
+        reasoning: str,
+        clarifying_question: str,
+    ) -> Optional[str]:
+        """
+        resolves the response for routes that do not need retrieval
+
+        Returns:
+            response: canned response or clarifying question, None if the query is `related`
+        """
         if classification == "unrelated":
             self.logger.info(f"route to `unrelated`")
             self.logger.info(f"reasoning: {reasoning}")
@@ -98,11 +340,7 @@ class ResponseGenerator:
             return clarifying_question
 
         self.logger.info(f"route to `related`")
-        return self._generate_answer(
-            user_query=user_query,
-            uploaded_content=uploaded_content,
-            chat_history=chat_history,
-        )
+        return None
 
     def generate_email(
         self,
@@ -123,3 +361,391 @@ class ResponseGenerator:
             result.recipients,
         )
         return email_subject, email_body, email_recipients
+
+
+def _discard_task(task: asyncio.Task):
+    """retrieves the outcome of a discarded task so its errors are not reported as unhandled"""
+    if not task.cancelled():
+        task.exception()
+
+
+def _cancel_task(task: Optional[asyncio.Task]):
+    """cancels an in-flight task whose result is no longer needed"""
+    if task is not None and not task.done():
+        task.cancel()
+        task.add_done_callback(_discard_task)
+
+
+class AsyncResponseGenerator(ResponseGenerator):
+    """async variant of ResponseGenerator that keeps the event loop free
+
+    LLM calls go through `ainvoke`, while query encoding and the Milvus search are
+    offloaded to the bounded embedding and Milvus executors.
+    """
+
+    async def _arouter(
+        self,
+        user_query: str,
+        uploaded_content: str = "",
+        chat_history: str = "",
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> Tuple[str, str, str]:
+        """
+        async version of `_router`
+
+        Returns:
+            classification (Literal["related", "vague", "unrelated"]): classification of user query
+            reasoning (str): reasoning behind the classification
+            clarifying_question (str): clarifying question if classification is vague
+        """
+        if self.routing_cache is not None:
+            # the fast path may need to encode the query
+            routing = await run_in_executor(
+                embedding_executor,
+                self.routing_cache.lookup,
+                user_query,
+                uploaded_content,
+                chat_history,
+                query_embedding,
+            )
+            if routing is not None:
+                return routing
+
+        result = await routing_chain.ainvoke(
+            {
+                "user_query": user_query,
+                "uploaded_content": uploaded_content,
+                "chat_history": chat_history,
+            }
+        )
+        routing = (result.classification, result.reasoning, result.clarifying_question)
+
+        if self.routing_cache is not None:
+            await run_in_executor(
+                embedding_executor,
+                self.routing_cache.store,
+                user_query,
+                routing,
+                uploaded_content,
+                chat_history,
+                query_embedding,
+            )
+
+        return routing
+
+    async def _aretrieve(
+        self,
+        user_query: str,
+        timings: Optional[Dict[str, float]] = None,
+        retrieval_params: Optional[RetrievalParams] = None,
+    ):
+        """
+        encodes the query, searches the vector db and reranks the candidates without
+        blocking the event loop
+
+        Returns:
+            hits: final search hits for the query, most relevant first
+        """
+        retrieval_params = retrieval_params or RetrievalParams()
+        with stage_latencies.time("embed", timings):
+            dense_embedding, sparse_embedding = await self.vector_db.query_encoder.aencode_texts(
+                [user_query]
+            )
+        with stage_latencies.time("search", timings):
+            hits = await run_in_executor(
+                milvus_executor,
+                self.retrieval.search,
+                dense_embedding,
+                sparse_embedding,
+                retrieval_params,
+            )
+        if not retrieval_params.rerank:
+            return self.retrieval.rerank(user_query, hits, retrieval_params)
+        # the cross-encoder shares the model executor with query encoding
+        with stage_latencies.time("rerank", timings):
+            return await run_in_executor(
+                embedding_executor,
+                self.retrieval.rerank,
+                user_query,
+                hits,
+                retrieval_params,
+            )
+
+    async def _aroute(
+        self,
+        user_query: str,
+        uploaded_content: str = "",
+        chat_history: str = "",
+        query_embedding: Optional[np.ndarray] = None,
+        timings: Optional[Dict[str, float]] = None,
+        retrieval_params: Optional[RetrievalParams] = None,
+    ) -> Tuple[str, str, str, Optional[asyncio.Task]]:
+        """
+        routes the query, speculatively starting retrieval alongside it if enabled
+
+        Returns:
+            classification (Literal["related", "vague", "unrelated"]): classification of user query
+            reasoning (str): reasoning behind the classification
+            clarifying_question (str): clarifying question if classification is vague
+            retrieval (asyncio.Task): in-flight retrieval for `related` queries, None otherwise
+        """
+        retrieval = None
+        if self.speculative:
+            retrieval = asyncio.create_task(
+                self._aretrieve(user_query, timings, retrieval_params)
+            )
+
+        try:
+            with stage_latencies.time("route", timings):
+                classification, reasoning, clarifying_question = await self._arouter(
+                    user_query=user_query,
+                    uploaded_content=uploaded_content,
+                    chat_history=chat_history,
+                    query_embedding=query_embedding,
+                )
+        except BaseException:
+            # also covers the request being cancelled while routing is in flight
+            _cancel_task(retrieval)
+            raise
+
+        if classification != "related":
+            _cancel_task(retrieval)
+            retrieval = None
+
+        return classification, reasoning, clarifying_question, retrieval
+
+    async def _await_hits(
+        self,
+        user_query: str,
+        retrieval: Optional[asyncio.Task],
+        timings: Optional[Dict[str, float]] = None,
+        retrieval_params: Optional[RetrievalParams] = None,
+    ):
+        """
+        returns the speculative retrieval result, or retrieves now if there is none
+
+        Returns:
+            hits: final search hits for the query
+        """
+        if retrieval is None:
+            return await self._aretrieve(user_query, timings, retrieval_params)
+        # only the part of retrieval that outlasted routing is on the critical path
+        with stage_latencies.time("retrieve_wait", timings):
+            return await retrieval
+
+    async def _agenerate_answer(
+        self,
+        user_query: str,
+        uploaded_content: str = "",
+        chat_history: str = "",
+        context: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None,
+        retrieval_params: Optional[RetrievalParams] = None,
+    ) -> str:
+        """
+        async version of `_generate_answer`
+
+        Returns:
+            answer: response to user query
+        """
+        if context is None:
+            result = await self._aretrieve(user_query, timings, retrieval_params)
+            if not result:
+                return self._low_confidence()
+            context, _ = self.retrieval.build_context(result, retrieval_params)
+        with stage_latencies.time("answer", timings):
+            return await answer_chain.ainvoke(
+                {
+                    "user_query": user_query,
+                    "uploaded_content": uploaded_content,
+                    "context": context,
+                    "chat_history": chat_history,
+                }
+            )
+
+    async def aquery_workflow(
+        self,
+        user_query: str,
+        uploaded_content: str = "",
+        chat_history: str = "",
+        retrieval_params: Optional[RetrievalParams] = None,
+    ) -> str:
+        """
+        async version of `query_workflow`
+
+        Returns:
+            answer: response to user query
+        """
+        timings = {}
+        with stage_latencies.time("total", timings):
+            response, query_embedding = None, None
+            use_cache = self._use_semantic_cache(uploaded_content, chat_history, retrieval_params)
+            if use_cache:
+                with stage_latencies.time("cache_lookup", timings):
+                    response, query_embedding = await run_in_executor(
+                        embedding_executor, self.semantic_cache.lookup, user_query
+                    )
+
+            if response is None:
+                response = await self._aanswer_query(
+                    user_query=user_query,
+                    uploaded_content=uploaded_content,
+                    chat_history=chat_history,
+                    query_embedding=query_embedding,
+                    timings=timings,
+                    retrieval_params=retrieval_params,
+                )
+                # fallbacks are not cached so that they stop as soon as the corpus can answer
+                if use_cache and response != self.low_confidence_response:
+                    self.semantic_cache.store(user_query, response, query_embedding)
+
+        self.logger.info(f"stage timings: {format_timings(timings)}")
+        return response
+
+    async def _aanswer_query(
+        self,
+        user_query: str,
+        uploaded_content: str = "",
+        chat_history: str = "",
+        query_embedding: Optional[np.ndarray] = None,
+        timings: Optional[Dict[str, float]] = None,
+        retrieval_params: Optional[RetrievalParams] = None,
+    ) -> str:
+        """
+        async version of `_answer_query`
+
+        Returns:
+            answer: response to user query
+        """
+        classification, reasoning, clarifying_question, retrieval = await self._aroute(
+            user_query=user_query,
+            uploaded_content=uploaded_content,
+            chat_history=chat_history,
+            query_embedding=query_embedding,
+            timings=timings,
+            retrieval_params=retrieval_params,
+        )
+
+        routed_response = self._routed_response(
+            classification, reasoning, clarifying_question
+        )
+        if routed_response is not None:
+            return routed_response
+
+        hits = await self._await_hits(user_query, retrieval, timings, retrieval_params)
+        if not hits:
+            return self._low_confidence()
+        context, _ = self.retrieval.build_context(hits, retrieval_params)
+        return await self._agenerate_answer(
+            user_query=user_query,
+            uploaded_content=uploaded_content,
+            chat_history=chat_history,
+            context=context,
+            timings=timings,
+        )
+
+    async def astream_query_workflow(
+        self,
+        user_query: str,
+        uploaded_content: str = "",
+        chat_history: str = "",
+        retrieval_params: Optional[RetrievalParams] = None,
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        streaming version of `query_workflow`
+
+        Yields typed events in order:
+            ("route", {"classification"}): routing decision
+            ("clarifying_question", {"text"}): only for `vague` queries
+            ("sources", {"sources"}): metadata of the retrieved documents, before any tokens
+            ("token", {"text"}): answer tokens as they are generated
+            ("done", {"answer", "cached", "low_confidence"}): the complete answer
+
+        A semantic cache hit skips straight to the `done` event. When nothing relevant
+        is retrieved, the low-confidence template is sent as a single token.
+        """
+        timings = {}
+        with stage_latencies.time("total", timings):
+            query_embedding = None
+            use_cache = self._use_semantic_cache(uploaded_content, chat_history, retrieval_params)
+            if use_cache:
+                with stage_latencies.time("cache_lookup", timings):
+                    cached_response, query_embedding = await run_in_executor(
+                        embedding_executor, self.semantic_cache.lookup, user_query
+                    )
+                if cached_response is not None:
+                    yield "done", {"answer": cached_response, "cached": True, "low_confidence": False}
+                    return
+
+            classification, reasoning, clarifying_question, retrieval = await self._aroute(
+                user_query=user_query,
+                uploaded_content=uploaded_content,
+                chat_history=chat_history,
+                query_embedding=query_embedding,
+                timings=timings,
+                retrieval_params=retrieval_params,
+            )
+            # the client may disconnect (GeneratorExit) or the request be cancelled
+            # between events, so the speculative retrieval must not outlive the stream
+            try:
+                yield "route", {"classification": classification}
+
+                routed_response = self._routed_response(
+                    classification, reasoning, clarifying_question
+                )
+                low_confidence = False
+                if routed_response is not None:
+                    if classification == "vague":
+                        yield "clarifying_question", {"text": clarifying_question}
+                    response = routed_response
+                else:
+                    hits = await self._await_hits(user_query, retrieval, timings, retrieval_params)
+                    yield "sources", {"sources": [hit.to_dict(include_text=False) for hit in hits]}
+
+                    low_confidence = not hits
+                    if low_confidence:
+                        response = self._low_confidence()
+                        yield "token", {"text": response}
+                    else:
+                        context, _ = self.retrieval.build_context(hits, retrieval_params)
+                        tokens = []
+                        start = time.perf_counter()
+                        with stage_latencies.time("answer", timings):
+                            async for token in answer_chain.astream(
+                                {
+                                    "user_query": user_query,
+                                    "uploaded_content": uploaded_content,
+                                    "context": context,
+                                    "chat_history": chat_history,
+                                }
+                            ):
+                                if not tokens:
+                                    first_token = time.perf_counter() - start
+                                    stage_latencies.record("first_token", first_token)
+                                    timings["first_token"] = first_token
+                                tokens.append(token)
+                                yield "token", {"text": token}
+                        response = "".join(tokens)
+
+                if use_cache and not low_confidence:
+                    self.semantic_cache.store(user_query, response, query_embedding)
+                yield "done", {"answer": response, "cached": False, "low_confidence": low_confidence}
+            finally:
+                _cancel_task(retrieval)
+
+        self.logger.info(f"stage timings: {format_timings(timings)}")
+
+    async def agenerate_email(
+        self,
+        chat_history: str,
+    ) -> Tuple[str, str, List[str]]:
+        """
+        async version of `generate_email`
+
+        Returns:
+            email_subject: email subject
+            email_body: email body
+            recipients: list of email recipients
+        """
+        result = await generate_email_chain.ainvoke({"chat_history": chat_history})
+        return result.subject, result.body, result.recipients
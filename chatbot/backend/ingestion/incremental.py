@@ -0,0 +1,408 @@
+"""
+Idempotent ingestion of chunked sources.
+
+Chunks are identified by their content hash within a source. Re-ingesting a source
+embeds and inserts only the chunks that are new or were embedded with another model
+version, and deletes the chunks that vanished, so repeated runs never duplicate
+entries. A dry run reports the delta without embedding or writing anything.
+
+Entries ingested before the manifest existed are unknown to it, and would be
+duplicated by the first run. `adopt_existing` records them in the manifest once
+and deletes their duplicates:
+    python -m chatbot.backend.ingestion.incremental bootstrap --dry-run
+Until then, ingesting a document type that the collection holds but the manifest
+does not know fails instead of duplicating it.
+"""
+
+import argparse
+import json
+import threading
+from typing import Callable, Dict, List, Optional
+
+from chatbot.backend.services.logger import logger
+from chatbot.backend.services.models.embedding_model import (
+    EMBEDDING_BACKEND,
+    embedding_model,
+    embedding_model_version,
+)
+from chatbot.backend.services.vector_db.db import vector_db
+from chatbot.backend.services.vector_db.manifest import chunk_hash
+from chatbot.backend.services.vector_db.partitions import DOC_TYPE_PARTITIONS
+
+
+class IngestionDelta:
+    """
+    The changes re-ingesting a source makes to the collection.
+
+    Attributes:
+        source_key (str): Key of the source in the manifest.
+        added (List[str]): Hashes of the chunks to embed and insert.
+        removed (List[str]): Hashes of the chunks to delete.
+        unchanged (int): Number of chunks already ingested with the current model version.
+        dry_run (bool): Whether the delta was only computed, not applied.
+    """
+
+    def __init__(self, source_key: str, added: List[str], removed: List[str], unchanged: int, dry_run: bool):
+        self.source_key = source_key
+        self.added = added
+        self.removed = removed
+        self.unchanged = unchanged
+        self.dry_run = dry_run
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed)
+
+    def to_dict(self) -> dict:
+        return {
+            "source": self.source_key,
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "unchanged": self.unchanged,
+            "dry_run": self.dry_run,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"IngestionDelta({self.source_key!r}, added={len(self.added)}, "
+            f"removed={len(self.removed)}, unchanged={self.unchanged}, dry_run={self.dry_run})"
+        )
+
+
+class PreparedSource:
+    """
+    A source on its way through `IncrementalIngestor.prepare`, `embed` and `apply`.
+
+    Attributes:
+        source_key (str): Key of the source in the manifest.
+        doc_source (str): Source document name stored with the chunks.
+        doc_id (str): Document type of the chunks.
+        delta (IngestionDelta): The planned delta.
+        texts (Dict[str, str]): Chunk text by chunk hash.
+        dry_run (bool): Only compute the delta.
+        rows (List[dict]): Embedded rows of the added chunks, set by `embed`.
+    """
+
+    def __init__(
+        self, source_key: str, doc_source: str, doc_id: str, delta: IngestionDelta, texts: Dict[str, str], dry_run: bool
+    ):
+        self.source_key = source_key
+        self.doc_source = doc_source
+        self.doc_id = doc_id
+        self.delta = delta
+        self.texts = texts
+        self.dry_run = dry_run
+        self.rows: Optional[List[dict]] = None
+
+
+class IncrementalIngestor:
+    """Syncs sources into the vector DB through its ingestion manifest."""
+
+    def __init__(self, vector_db=vector_db, embedding_model=embedding_model):
+        self.vector_db = vector_db
+        self.embedding_model = embedding_model
+        self.logger = logger
+        # serializes applying deltas per source; striped so that the number of locks stays bounded
+        self._source_locks = [threading.Lock() for _ in range(64)]
+        # document types whose existing entries are known to be recorded in the manifest
+        self._bootstrapped = set()
+
+    def plan(self, source_key: str, chunk_hashes: List[str]) -> IngestionDelta:
+        """
+        Computes the delta between a source's current chunks and the manifest.
+
+        Chunks ingested with another embedding model version count as both removed and added.
+
+        Args:
+            source_key (str): Key of the source.
+            chunk_hashes (List[str]): Hashes of the source's current chunks.
+
+        Returns:
+            IngestionDelta: The delta, marked as a dry run.
+        """
+        return self._delta(source_key, chunk_hashes, self.vector_db.manifest.source_chunks(source_key))
+
+    def _delta(self, source_key: str, chunk_hashes: List[str], existing) -> IngestionDelta:
+        """
+        Computes the delta between a source's current chunks and its recorded ones.
+        """
+        version = embedding_model_version()
+        current = list(dict.fromkeys(chunk_hashes))
+        added = [h for h in current if h not in existing or existing[h][1] != version]
+        removed = [h for h in existing if h not in current or existing[h][1] != version]
+        return IngestionDelta(source_key, added, removed, len(current) - len(added), dry_run=True)
+
+    def check_bootstrapped(self, doc_id: str) -> bool:
+        """
+        Checks that existing entries of a document type are recorded in the manifest.
+
+        An empty manifest over a collection that already holds entries of the type means
+        they were ingested before the manifest existed, and ingesting would duplicate them.
+
+        Returns:
+            bool: False if the entries still have to be adopted with `adopt_existing`.
+        """
+        if doc_id in self._bootstrapped:
+            return True
+        if not self.vector_db.manifest.has_chunks(doc_id) and self.vector_db.has_entries([doc_id]):
+            return False
+        self._bootstrapped.add(doc_id)
+        return True
+
+    def is_current(self, source_key: str, chunk_hashes: List[str]) -> bool:
+        """
+        Checks whether re-ingesting a source with these chunks would change nothing.
+        """
+        return not self.plan(source_key, chunk_hashes).changed
+
+    def prepare(
+        self,
+        source_key: str,
+        doc_source: str,
+        doc_id: str,
+        chunks: List[str],
+        chunk_hashes: Optional[List[str]] = None,
+        dry_run: bool = False,
+    ) -> PreparedSource:
+        """
+        Plans the ingestion of a source's chunks, the first step of `ingest_chunks`.
+
+        Args:
+            source_key (str): Key of the source in the manifest, e.g. its file path.
+            doc_source (str): Source document name stored with the chunks.
+            doc_id (str): Document type of the chunks, e.g. "FAQ".
+            chunks (List[str]): Texts of the source's current chunks.
+            chunk_hashes (List[str], optional): Hashes identifying the chunks, defaulting to
+                the hashes of their texts. Images pass the hash of the image file instead.
+            dry_run (bool): Only compute the delta.
+
+        Returns:
+            PreparedSource: The planned delta and the texts of the added chunks.
+
+        Raises:
+            RuntimeError: If the collection holds entries of `doc_id` that are missing from
+                the manifest, which would be duplicated.
+        """
+        if not self.check_bootstrapped(doc_id):
+            message = (
+                f"The collection holds '{doc_id}' entries that are not in the ingestion manifest; "
+                "run `python -m chatbot.backend.ingestion.incremental bootstrap` (or "
+                "`text_ingestion_local --bootstrap` for emails and FAQs) before ingesting"
+            )
+            if not dry_run:
+                raise RuntimeError(message)
+            self.logger.warning(message)
+        if chunk_hashes is None:
+            chunk_hashes = [chunk_hash(chunk) for chunk in chunks]
+        texts: Dict[str, str] = {}
+        for hash_, chunk in zip(chunk_hashes, chunks):
+            texts.setdefault(hash_, chunk)
+        delta = self.plan(source_key, chunk_hashes)
+        return PreparedSource(source_key, doc_source, doc_id, delta, texts, dry_run)
+
+    def embed(self, prepared: PreparedSource) -> PreparedSource:
+        """
+        Embeds the added chunks of a prepared source into insertable rows.
+        """
+        if prepared.dry_run or not prepared.delta.added:
+            return prepared
+        prepared.rows = self._embed_rows(prepared, prepared.delta.added)
+        return prepared
+
+    def _embed_rows(self, prepared: PreparedSource, hashes: List[str]) -> List[dict]:
+        """
+        Embeds chunks of a prepared source into insertable rows, one per chunk hash.
+        """
+        texts = [prepared.texts[h] for h in hashes]
+        dense_embeddings, sparse_embeddings = self.embedding_model.encode_texts(texts, persist=True)
+        sparse_embeddings = self.embedding_model.convert_sparse_embeddings(sparse_embeddings)
+        return [
+            {
+                "doc_id": prepared.doc_id,
+                "doc_source": prepared.doc_source,
+                "text": text,
+                "text_dense_embedding": dense,
+                "text_sparse_embedding": sparse,
+                "chunk_hash": hash_,
+            }
+            for hash_, text, dense, sparse in zip(hashes, texts, dense_embeddings, sparse_embeddings)
+        ]
+
+    def _source_lock(self, source_key: str) -> threading.Lock:
+        return self._source_locks[hash(source_key) % len(self._source_locks)]
+
+    def apply(self, prepared: PreparedSource) -> IngestionDelta:
+        """
+        Inserts the embedded rows of a prepared source, deletes its stale chunks and
+        updates the manifest.
+
+        The delta is planned again against the manifest under a per-source lock, since
+        another version of the source may have been applied since `prepare`, e.g. two
+        uploads of the same file in flight. Embedded rows that are no longer needed are
+        dropped, and chunks that became missing meanwhile are embedded here.
+
+        Returns:
+            IngestionDelta: The applied (or planned) delta.
+        """
+        if prepared.dry_run:
+            self.logger.info(f"{prepared.delta}")
+            return prepared.delta
+        if prepared.delta.added and prepared.rows is None:
+            raise ValueError(f"Added chunks of {prepared.source_key} were not embedded")
+
+        with self._source_lock(prepared.source_key):
+            existing = self.vector_db.manifest.source_chunks(prepared.source_key)
+            delta = self._delta(prepared.source_key, list(prepared.texts), existing)
+            if not delta.changed:
+                self.logger.info(f"{delta}")
+                prepared.delta = delta
+                return delta
+            embedded = {row["chunk_hash"]: row for row in prepared.rows or []}
+            missing = [h for h in delta.added if h not in embedded]
+            if missing:
+                embedded.update((row["chunk_hash"], row) for row in self._embed_rows(prepared, missing))
+            rows = [embedded[h] for h in delta.added]
+
+            with self.vector_db.batch_writes():
+                primary_keys = self.vector_db.batch_ingestion(rows) if rows else []
+                # new chunks are inserted before stale ones are deleted, so the source never disappears
+                if delta.removed:
+                    self.vector_db.delete_by_ids([existing[h][0] for h in delta.removed])
+
+            self.vector_db.manifest.apply(
+                prepared.source_key,
+                added=zip(delta.added, primary_keys),
+                removed=delta.removed,
+                doc_id=prepared.doc_id,
+                doc_source=prepared.doc_source,
+                model_version=embedding_model_version(),
+            )
+        prepared.delta = delta
+        delta.dry_run = False
+        self.logger.info(f"{delta}")
+        return delta
+
+    def ingest_chunks(
+        self,
+        source_key: str,
+        doc_source: str,
+        doc_id: str,
+        chunks: List[str],
+        chunk_hashes: Optional[List[str]] = None,
+        dry_run: bool = False,
+    ) -> IngestionDelta:
+        """
+        Syncs a source's chunks into the collection.
+
+        Runs `prepare`, `embed` and `apply` in sequence; the ingestion pipeline runs them
+        as separate stages instead.
+
+        Args:
+            source_key (str): Key of the source in the manifest, e.g. its file path.
+            doc_source (str): Source document name stored with the chunks.
+            doc_id (str): Document type of the chunks, e.g. "FAQ".
+            chunks (List[str]): Texts of the source's current chunks.
+            chunk_hashes (List[str], optional): Hashes identifying the chunks, defaulting to
+                the hashes of their texts. Images pass the hash of the image file instead.
+            dry_run (bool): Only compute the delta.
+
+        Returns:
+            IngestionDelta: The applied (or planned) delta.
+        """
+        prepared = self.prepare(source_key, doc_source, doc_id, chunks, chunk_hashes, dry_run)
+        return self.apply(self.embed(prepared))
+
+    def remove_source(self, source_key: str, dry_run: bool = False) -> IngestionDelta:
+        """
+        Deletes all chunks of a source that no longer exists.
+        """
+        with self._source_lock(source_key):
+            existing = self.vector_db.manifest.source_chunks(source_key)
+            delta = IngestionDelta(source_key, [], list(existing), 0, dry_run=True)
+            if dry_run or not existing:
+                return delta
+            self.vector_db.delete_by_ids([primary_key for primary_key, _ in existing.values()])
+            self.vector_db.manifest.apply(source_key, [], delta.removed, doc_id="", doc_source="", model_version="")
+        delta.dry_run = False
+        self.logger.info(f"{delta}")
+        return delta
+
+    def adopt_existing(
+        self,
+        doc_ids: List[str],
+        source_key_for: Optional[Callable[[str, str], str]] = None,
+        backend: str = EMBEDDING_BACKEND,
+        dry_run: bool = False,
+    ) -> Dict[str, int]:
+        """
+        Records entries that are missing from the manifest, e.g. ingested before it existed.
+
+        Each entry is identified by the hash of its text, which is how text chunks are
+        hashed on ingestion. The first entry of each (source, hash) is recorded and later
+        copies are deleted. Entries whose chunk is already recorded are deleted too,
+        since a later run re-inserted them.
+
+        Images are hashed by file content on ingestion, so their adopted entries count as
+        vanished on the next run: they are replaced once and not duplicated.
+
+        Args:
+            doc_ids (List[str]): Document types to adopt, e.g. ["Images"].
+            source_key_for (Callable[[str, str], str], optional): Maps an entry's doc_source and
+                text hash to its source key. Defaults to the doc_source, which is the source key
+                of uploads.
+            backend (str): Embedding backend that produced the entries.
+            dry_run (bool): Only count the entries that would be adopted and deleted.
+
+        Returns:
+            Dict[str, int]: The number of adopted and deleted entries.
+        """
+        manifest = self.vector_db.manifest
+        version = embedding_model_version(backend)
+        recorded: Dict[str, set] = {}
+        adopted: Dict[tuple, List] = {}
+        duplicates: List[int] = []
+        for rows in self.vector_db.backend.query("doc_id", doc_ids):
+            known = manifest.known_primary_keys(row["auto_id"] for row in rows)
+            for row in rows:
+                if row["auto_id"] in known:
+                    continue
+                hash_ = chunk_hash(row["text"])
+                source_key = source_key_for(row["doc_source"], hash_) if source_key_for else row["doc_source"]
+                if source_key not in recorded:
+                    recorded[source_key] = set(manifest.source_chunks(source_key))
+                group = adopted.setdefault((source_key, row["doc_id"], row["doc_source"]), [])
+                if hash_ in recorded[source_key]:
+                    duplicates.append(row["auto_id"])
+                else:
+                    recorded[source_key].add(hash_)
+                    group.append((hash_, row["auto_id"]))
+
+        counts = {"adopted": sum(len(chunks) for chunks in adopted.values()), "deleted": len(duplicates)}
+        if dry_run:
+            return counts
+        for (source_key, doc_id, doc_source), chunks in adopted.items():
+            manifest.apply(source_key, chunks, [], doc_id=doc_id, doc_source=doc_source, model_version=version)
+        if duplicates:
+            self.vector_db.delete_by_ids(duplicates)
+        self.logger.info(f"Adopted {counts['adopted']} existing entries, deleted {counts['deleted']} duplicates")
+        return counts
+
+
+incremental_ingestor = IncrementalIngestor()
+
+
+def main(args):
+    counts = incremental_ingestor.adopt_existing(args.doc_ids, backend=args.backend, dry_run=args.dry_run)
+    print(f"{'Planned' if args.dry_run else 'Applied'}: {json.dumps(counts)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record entries ingested before the ingestion manifest existed")
+    parser.add_argument("command", choices=["bootstrap"])
+    parser.add_argument(
+        "--doc-ids", nargs="+", default=["Images", "Word Documents / PDF"], choices=list(DOC_TYPE_PARTITIONS),
+        help="document types to adopt; emails and FAQs are adopted by text_ingestion_local --bootstrap",
+    )
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, help="embedding backend that produced the entries")
+    parser.add_argument("--dry-run", action="store_true", help="only count the entries to adopt and delete")
+    main(parser.parse_args())
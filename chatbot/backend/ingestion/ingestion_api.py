@@ -1,67 +1,61 @@
 import logging
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from pydantic import BaseModel
-from chatbot.backend.ingestion.ingestion_service import IngestionService
-from chatbot.backend.document_parser.document_parser import DocumentParser
-import shutil
-import os
+from chatbot.backend.ingestion.jobs import ingestion_jobs, is_supported
 
 """
 This module defines the ingestion API for handling file uploads and processing.
 It includes endpoints for ingesting various file types such as images, PDFs, and Word documents.
+Uploads are ingested by background jobs whose progress is reported by `/ingestion/jobs/{job_id}`.
 """
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 ingestion_router = APIRouter(prefix="/ingestion")
-ingestion_service = IngestionService()
-document_parser = DocumentParser()
 
 class TextIngestionRequest(BaseModel):
     text_chunks: list
     doc_source: str
     doc_type: str
-    
-@ingestion_router.post("/ingest-files/")
-async def ingest_files(files: list[UploadFile] = File(...)):
-    temp_file_paths = []
 
+# Handlers are plain functions, so FastAPI runs them in its threadpool: saving the uploads
+# to disk and the SQLite job store must not block the event loop serving the chat
+@ingestion_router.post("/ingest-files/", status_code=202)
+def ingest_files(files: list[UploadFile] = File(...), dry_run: bool = False):
     for file in files:
-        logger.info(f"Processing file: {file.filename} with content type: {file.content_type}")
-        try:
-            # Images
-            if file.content_type.startswith('image/'):
-                temp_file_path = f"/tmp/{file.filename}"
-                with open(temp_file_path, "wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
-                logger.info(f"Saved image file to {temp_file_path}")
-                ingestion_service.ingest_images([temp_file_path])
-                temp_file_paths.append(temp_file_path)
-            
-            # PDF or DOCX Files
-            elif file.content_type in ['application/pdf', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document']:
-                temp_file_path = f"/tmp/{file.filename}"
-                with open(temp_file_path, "wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
-                logger.info(f"Saved document file to {temp_file_path}")
-                extracted_text = document_parser.process_user_uploads(temp_file_path)
-                ingestion_service.ingest_texts(extracted_text, file.filename, "Word Documents / PDF")
-                temp_file_paths.append(temp_file_path)
-            
-            else:
-                raise HTTPException(status_code=400, detail=f"Invalid file type for {file.filename}.")
-        
-        except Exception as e:
-            logger.error(f"Error processing file {file.filename}: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Failed to process file {file.filename}: {str(e)}")
-    
-    for temp_file_path in temp_file_paths:
-        try:
-            os.remove(temp_file_path)
-            logger.info(f"Removed temporary file {temp_file_path}")
-        except Exception as e:
-            logger.error(f"Failed to remove temporary file {temp_file_path}: {str(e)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Failed to remove temporary file {temp_file_path}: {str(e)}")
-    
-    return {"message": "Files ingested successfully"}
+        if not is_supported(file.content_type):
+            raise HTTPException(status_code=400, detail=f"Invalid file type for {file.filename}.")
+
+    try:
+        job_id = ingestion_jobs.submit(
+            [(file.filename, file.content_type, file.file) for file in files], dry_run=dry_run
+        )
+    except Exception as e:
+        logger.error(f"Error queueing files for ingestion: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to queue files for ingestion: {str(e)}")
+
+    return {
+        "message": "Files queued for ingestion",
+        "job_id": job_id,
+        "status_url": f"/ingestion/jobs/{job_id}",
+    }
+
+
+@ingestion_router.get("/jobs/")
+def list_jobs(limit: int = 20):
+    try:
+        return {"jobs": ingestion_jobs.recent(limit), "stats": ingestion_jobs.stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@ingestion_router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    try:
+        job = ingestion_jobs.get(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job {job_id} not found")
+    return job
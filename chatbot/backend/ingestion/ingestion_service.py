@@ -1,66 +1,75 @@
 import os
 import requests
 from chatbot.backend.services.models.models import vlm
-from chatbot.backend.services.models.embedding_model import embedding_model
-from chatbot.backend.services.vector_db.db import vector_db
+from chatbot.backend.ingestion.incremental import incremental_ingestor
+from chatbot.backend.services.vector_db.manifest import chunk_hash
 
 class IngestionService:
-    def ingest_images(self, image_paths):
+    def ingest_images(self, image_paths, dry_run=False):
         """
         Ingests image data into the vector database.
 
-        Steps:
-        1. Generate image summaries using the VLM model.
-        2. Encode the summaries to generate dense and sparse embeddings.
-        3. Prepare the data for ingestion, including metadata and embeddings.
-        4. Batch ingest the data into the vector database.
-        """
-        # Step 1: Generate image summaries
-        image_summaries = vlm.generate_image_summaries(image_paths)
+        Each image is its own source, identified by the hash of the image file, so
+        unchanged images are skipped without calling the VLM.
 
-        # Step 2: Generate dense and sparse embeddings for the summaries
-        dense_embeddings, sparse_embeddings = embedding_model.encode_texts(image_summaries)
+        Steps:
+        1. Skip images whose content was already ingested.
+        2. Generate image summaries using the VLM model.
+        3. Encode the summaries and ingest them with their metadata.
 
-        # Step 3: Prepare the data for ingestion
-        data = [
-            ["Images"] * len(image_paths),  # Assuming all images are from the same source,
-            image_paths,  # Assuming all images are from the same source
-            image_summaries,
-            dense_embeddings,
-            embedding_model.convert_sparse_embeddings(sparse_embeddings),
+        Returns:
+            List[IngestionDelta]: The delta of each image.
+        """
+        # Step 1: Hash the image files and skip those already ingested
+        image_hashes = []
+        for image_path in image_paths:
+            with open(image_path, "rb") as f:
+                image_hashes.append(chunk_hash(f.read()))
+        deltas = [
+            incremental_ingestor.plan(image_path, [image_hash])
+            for image_path, image_hash in zip(image_paths, image_hashes)
         ]
+        changed = [i for i, delta in enumerate(deltas) if delta.changed]
+        if dry_run or not changed:
+            return deltas
+
+        # Step 2: Generate image summaries
+        image_summaries = vlm.generate_image_summaries([image_paths[i] for i in changed])
 
-        # Step 4: Ingest the data into the vector database
+        # Step 3: Generate embeddings and ingest the summaries
         try:
-            vector_db.batch_ingestion(data)
+            for i, summary in zip(changed, image_summaries):
+                deltas[i] = incremental_ingestor.ingest_chunks(
+                    source_key=image_paths[i],
+                    doc_source=image_paths[i],
+                    doc_id="Images",
+                    chunks=[summary],
+                    chunk_hashes=[image_hashes[i]],
+                )
             print("Data ingested successfully")
         except Exception as e:
             print(f"Failed to ingest data: {str(e)}")
+        return deltas
 
-    def ingest_texts(self, text_chunks, doc_source, doc_type):
+    def ingest_texts(self, text_chunks, doc_source, doc_type, dry_run=False):
         """
         Ingests text data into the vector database.
 
-        Steps:
-        1. Encode the provided text chunks to generate dense and sparse embeddings.
-        2. Prepare the data for ingestion, including metadata and embeddings.
-        3. Batch ingest the data into the vector database.
-        """
-        # Embed the text Chunks
-        print("Encoding Text")
-        dense_embeddings, sparse_embeddings = embedding_model.encode_texts(text_chunks)
-
-        # Prepare the data for ingestion
-        data = [
-            [doc_type] * len(text_chunks),  # doc_name
-            [doc_source] * len(text_chunks),  # doc_source (e.g. "Agreement101", "Contract101")
-            text_chunks,  # text
-            dense_embeddings,  # Dense embeddings
-            embedding_model.convert_sparse_embeddings(sparse_embeddings),  # payload sparse embeddings
-        ]
+        Re-ingesting a source only embeds and inserts new or changed chunks and
+        deletes the chunks that vanished.
 
+        Returns:
+            IngestionDelta: The applied (or, with dry_run, planned) changes.
+        """
         try:
-            vector_db.batch_ingestion(data)
-            print(f"Successfully ingested data from {doc_source}")
+            delta = incremental_ingestor.ingest_chunks(
+                source_key=doc_source,
+                doc_source=doc_source,  # doc_source (e.g. "Agreement101", "Contract101")
+                doc_id=doc_type,
+                chunks=text_chunks,
+                dry_run=dry_run,
+            )
+            print(f"Successfully ingested data from {doc_source}: {delta}")
+            return delta
         except Exception as e:
             print(f"Failed to ingest data from {doc_source}: {str(e)}")
@@ -0,0 +1,407 @@
+"""
+Background ingestion jobs.
+
+An upload is saved to disk and recorded as a job in a local SQLite table, and the
+request returns the job id at once. Files then go through the stages of the ingestion
+pipeline, which run concurrently across files:
+- parse: text extraction of documents, with OCR in a process pool; hashing of images
+- chunk: semantic chunking of documents; VLM summaries of new or changed images
+- embed: embedding of the new or changed chunks
+- insert: Milvus insert of the new chunks and deletion of the vanished ones
+
+Per-file stage, timings, deltas and errors are written back to the table, so
+`/ingestion/jobs/{job_id}` can report progress. Files that did not finish, e.g.
+because the server restarted, are queued again on startup. Re-running a file is
+safe since ingestion is incremental.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import BinaryIO, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from chatbot.backend.ingestion.pipeline import (
+    INGESTION_EMBED_WORKERS,
+    INGESTION_INSERT_WORKERS,
+    PipelineItem,
+    Stage,
+    StagedPipeline,
+)
+from chatbot.backend.services.logger import logger
+from chatbot.backend.services.metrics import Counters
+from chatbot.backend.services.registry import registry
+from chatbot.backend.services.vector_db.manifest import chunk_hash
+
+load_dotenv(override=True)
+
+INGESTION_JOBS_DIR = os.getenv("INGESTION_JOBS_DIR", "chatbot/backend/ingestion_jobs")
+# Threads for text extraction; OCR of each document fans out to the OCR process pool
+INGESTION_PARSE_WORKERS = int(os.getenv("INGESTION_PARSE_WORKERS", 2))
+# Threads for semantic chunking of documents and VLM descriptions of images
+INGESTION_CHUNK_WORKERS = int(os.getenv("INGESTION_CHUNK_WORKERS", 2))
+
+DOCUMENT_CONTENT_TYPES = (
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+)
+DOCUMENT_DOC_ID = "Word Documents / PDF"
+IMAGE_DOC_ID = "Images"
+
+
+def is_supported(content_type: Optional[str]) -> bool:
+    """
+    Checks whether files of a content type can be ingested.
+    """
+    return bool(content_type) and (content_type.startswith("image/") or content_type in DOCUMENT_CONTENT_TYPES)
+
+
+class JobStore:
+    """
+    SQLite table of ingestion jobs and the state of each of their files.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    dry_run INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_files (
+                    job_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    filename TEXT NOT NULL,
+                    content_type TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    timings TEXT NOT NULL DEFAULT '{}',
+                    delta TEXT,
+                    error TEXT,
+                    started_at REAL,
+                    finished_at REAL,
+                    PRIMARY KEY (job_id, position)
+                )
+                """
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS job_files_status ON job_files (status)")
+
+    @contextmanager
+    def _connect(self):
+        with self._lock:
+            db = sqlite3.connect(self.path)
+            db.row_factory = sqlite3.Row
+            try:
+                with db:  # commits, or rolls back on error
+                    yield db
+            finally:
+                db.close()
+
+    def create(self, job_id: str, files: List[Tuple[str, str, str]], dry_run: bool):
+        """
+        Records a job with its files as (filename, content type, path), all queued.
+        """
+        with self._connect() as db:
+            db.execute("INSERT INTO jobs VALUES (?, ?, ?)", (job_id, int(dry_run), time.time()))
+            db.executemany(
+                "INSERT INTO job_files (job_id, position, filename, content_type, path, status) "
+                "VALUES (?, ?, ?, ?, ?, 'queued')",
+                [(job_id, position, *file) for position, file in enumerate(files)],
+            )
+
+    def update_file(self, job_id: str, position: int, **fields):
+        """
+        Updates columns of a job file, serializing `timings` and `delta` to JSON.
+        """
+        for name in ("timings", "delta"):
+            if name in fields and fields[name] is not None:
+                fields[name] = json.dumps(fields[name])
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            db.execute(
+                f"UPDATE job_files SET {assignments} WHERE job_id = ? AND position = ?",
+                (*fields.values(), job_id, position),
+            )
+
+    def file(self, job_id: str, position: int) -> Optional[dict]:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT f.*, j.dry_run FROM job_files f JOIN jobs j USING (job_id) "
+                "WHERE f.job_id = ? AND f.position = ?",
+                (job_id, position),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self) -> List[Tuple[str, int]]:
+        """
+        Returns the (job id, position) of every file that is queued or was interrupted while running.
+        """
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT job_id, position FROM job_files WHERE status IN ('queued', 'running') "
+                "ORDER BY rowid"
+            ).fetchall()
+        return [(row["job_id"], row["position"]) for row in rows]
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Returns a job with the state of each file, or None if it does not exist.
+
+        The job is `queued` until a file starts, `running` until every file finished,
+        then `done`, or `failed` if any file failed.
+        """
+        with self._connect() as db:
+            job = db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            files = db.execute(
+                "SELECT * FROM job_files WHERE job_id = ? ORDER BY position", (job_id,)
+            ).fetchall()
+
+        files = [
+            {
+                "filename": row["filename"],
+                "content_type": row["content_type"],
+                "status": row["status"],
+                "stage": row["stage"],
+                "timings_ms": {name: round(1000 * seconds, 1) for name, seconds in json.loads(row["timings"]).items()},
+                "delta": json.loads(row["delta"]) if row["delta"] else None,
+                "error": row["error"],
+                "started_at": row["started_at"],
+                "finished_at": row["finished_at"],
+            }
+            for row in files
+        ]
+        statuses = {file["status"] for file in files}
+        if statuses <= {"done", "failed"}:
+            status = "failed" if "failed" in statuses else "done"
+        elif statuses == {"queued"}:
+            status = "queued"
+        else:
+            status = "running"
+        finished = [file["finished_at"] for file in files if file["finished_at"]]
+        return {
+            "job_id": job_id,
+            "status": status,
+            "dry_run": bool(job["dry_run"]),
+            "created_at": job["created_at"],
+            "finished_at": max(finished) if status in ("done", "failed") and finished else None,
+            "files_done": sum(file["status"] in ("done", "failed") for file in files),
+            "files_total": len(files),
+            "files": files,
+        }
+
+    def recent(self, limit: int = 20) -> List[dict]:
+        """
+        Returns the most recent jobs, newest first.
+        """
+        with self._connect() as db:
+            rows = db.execute("SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self.get(row["job_id"]) for row in rows]
+
+
+class IngestionJobQueue:
+    """
+    Feeds uploaded files through the staged ingestion pipeline and records their progress.
+    """
+
+    def __init__(
+        self,
+        directory: str = INGESTION_JOBS_DIR,
+        parse_workers: int = INGESTION_PARSE_WORKERS,
+        chunk_workers: int = INGESTION_CHUNK_WORKERS,
+        embed_workers: int = INGESTION_EMBED_WORKERS,
+        insert_workers: int = INGESTION_INSERT_WORKERS,
+    ):
+        self.directory = directory
+        self.store = JobStore(os.path.join(directory, "jobs.sqlite3"))
+        self.counters = Counters()
+        self.logger = logger
+        self.pipeline = StagedPipeline(
+            [
+                Stage("parse", self._parse, parse_workers),
+                Stage("chunk", self._chunk, chunk_workers),
+                Stage("embed", self._embed, embed_workers),
+                Stage("insert", self._insert, insert_workers),
+            ],
+            on_stage=self._on_stage,
+            on_done=self._on_done,
+        )
+        self.pipeline.start()
+
+    def submit(self, uploads: List[Tuple[str, str, BinaryIO]], dry_run: bool = False) -> str:
+        """
+        Saves uploaded files and queues them as a new job.
+
+        Args:
+            uploads (List[Tuple[str, str, BinaryIO]]): (filename, content type, file object) of each file.
+            dry_run (bool): Only compute the ingestion delta of each file.
+
+        Returns:
+            str: The job id.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.directory, "files", job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        files = []
+        for position, (filename, content_type, file) in enumerate(uploads):
+            path = os.path.join(job_dir, f"{position}_{os.path.basename(filename)}")
+            with open(path, "wb") as buffer:
+                shutil.copyfileobj(file, buffer)
+            files.append((filename, content_type, path))
+
+        self.store.create(job_id, files, dry_run)
+        self.counters.increment("jobs")
+        for position in range(len(files)):
+            self._enqueue(job_id, position)
+        self.logger.info(f"Queued ingestion job {job_id} with {len(files)} files")
+        return job_id
+
+    def resume(self) -> int:
+        """
+        Queues the files of unfinished jobs again, e.g. after a restart.
+
+        Returns:
+            int: The number of files queued.
+        """
+        unfinished = self.store.unfinished()
+        for job_id, position in unfinished:
+            self.store.update_file(job_id, position, status="queued", stage=None)
+            self._enqueue(job_id, position)
+        if unfinished:
+            self.logger.info(f"Resumed {len(unfinished)} unfinished ingestion files")
+        return len(unfinished)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.store.get(job_id)
+
+    def recent(self, limit: int = 20) -> List[dict]:
+        return self.store.recent(limit)
+
+    def _enqueue(self, job_id: str, position: int):
+        file = self.store.file(job_id, position)
+        if file is not None and file["status"] not in ("done", "failed"):
+            self.pipeline.submit(f"{job_id}/{position}", file)
+
+    def _on_stage(self, item: PipelineItem, stage: str):
+        file = item.value
+        if stage == "parse":
+            self.store.update_file(file["job_id"], file["position"], status="running", stage=stage, started_at=time.time())
+        else:
+            self.store.update_file(file["job_id"], file["position"], stage=stage, timings=item.timings)
+
+    def _on_done(self, item: PipelineItem):
+        """
+        Records the outcome of a file and removes the uploaded copy.
+        """
+        file = item.value
+        if item.error is None:
+            self.store.update_file(
+                file["job_id"], file["position"], status="done", timings=item.timings,
+                delta=file["delta"].to_dict(), finished_at=time.time(),
+            )
+            self.counters.increment("files_done")
+        else:
+            self.store.update_file(
+                file["job_id"], file["position"], status="failed", timings=item.timings,
+                error=f"{item.failed_stage}: {item.error}", finished_at=time.time(),
+            )
+            self.counters.increment("files_failed")
+        try:
+            os.remove(file["path"])
+            if not os.listdir(os.path.dirname(file["path"])):
+                os.rmdir(os.path.dirname(file["path"]))
+        except OSError as e:
+            self.logger.warning(f"Failed to remove uploaded file {file['path']}: {e}")
+
+    def _parse(self, file: dict) -> dict:
+        """
+        Extracts the text of a document, OCRing PDF pages in the OCR process pool, or hashes an image.
+        """
+        from chatbot.backend.document_parser.document_parser import document_parser
+
+        if file["content_type"].startswith("image/"):
+            with open(file["path"], "rb") as f:
+                file["chunk_hashes"] = [chunk_hash(f.read())]
+        else:
+            file["text"] = document_parser.extract_text_from_user_uploads(file["path"])
+        return file
+
+    def _chunk(self, file: dict) -> dict:
+        """
+        Splits a document into semantic chunks, or describes a changed image with the VLM.
+        """
+        from chatbot.backend.document_parser.document_parser import document_parser
+        from chatbot.backend.ingestion.incremental import incremental_ingestor
+        from chatbot.backend.services.models.models import vlm
+
+        if not file["content_type"].startswith("image/"):
+            file["chunks"] = document_parser.chunk_text(file.pop("text"))
+            file["chunk_hashes"] = None
+            return file
+
+        # unchanged images are skipped without calling the VLM; their chunk text is never used
+        delta = incremental_ingestor.plan(file["filename"], file["chunk_hashes"])
+        if file["dry_run"] or not delta.changed:
+            file["chunks"] = [""]
+            return file
+        summaries = vlm.generate_image_summaries([file["path"]])
+        if not summaries:
+            raise RuntimeError("The VLM returned no summary")
+        file["chunks"] = summaries
+        return file
+
+    def _embed(self, file: dict) -> dict:
+        from chatbot.backend.ingestion.incremental import incremental_ingestor
+
+        prepared = incremental_ingestor.prepare(
+            source_key=file["filename"],
+            doc_source=file["filename"],
+            doc_id=IMAGE_DOC_ID if file["content_type"].startswith("image/") else DOCUMENT_DOC_ID,
+            chunks=file.pop("chunks"),
+            chunk_hashes=file.pop("chunk_hashes"),
+            dry_run=bool(file["dry_run"]),
+        )
+        file["prepared"] = incremental_ingestor.embed(prepared)
+        return file
+
+    def _insert(self, file: dict) -> dict:
+        from chatbot.backend.ingestion.incremental import incremental_ingestor
+
+        file["delta"] = incremental_ingestor.apply(file.pop("prepared"))
+        return file
+
+    def stats(self) -> dict:
+        """
+        Returns job counters and per-stage throughput and latencies since startup.
+        """
+        return {"counters": self.counters.snapshot(), "pipeline": self.pipeline.stats()}
+
+    def shutdown(self):
+        """
+        Stops the OCR processes without waiting. Interrupted files are resumed on the next start.
+        """
+        from chatbot.backend.document_parser.ocr import shutdown_ocr_executor
+
+        shutdown_ocr_executor()
+
+
+ingestion_jobs = registry.register("ingestion_jobs", IngestionJobQueue)
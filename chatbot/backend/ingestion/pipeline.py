@@ -0,0 +1,258 @@
+"""
+Staged ingestion pipeline.
+
+Each stage, e.g. parse, chunk, embed, insert, has its own worker threads and takes
+its input from a bounded queue, so OCR of one document overlaps with embedding of the
+next and the Milvus insert of the one before. A full queue blocks the stage feeding
+it, which keeps a slow stage from piling up parsed text or embeddings in memory.
+
+Items that fail a stage skip the remaining stages and are reported with their error.
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+from chatbot.backend.services.logger import logger
+from chatbot.backend.services.metrics import LatencyRecorder
+
+load_dotenv(override=True)
+
+# Items buffered between two stages
+INGESTION_QUEUE_SIZE = int(os.getenv("INGESTION_QUEUE_SIZE", 4))
+# Embedding is CPU bound and torch already uses every core for one batch
+INGESTION_EMBED_WORKERS = int(os.getenv("INGESTION_EMBED_WORKERS", 1))
+# Inserts mostly wait on the network
+INGESTION_INSERT_WORKERS = int(os.getenv("INGESTION_INSERT_WORKERS", 2))
+
+# Tells a stage worker that no more items will come
+_DONE = object()
+
+
+class Stage:
+    """
+    A pipeline stage.
+
+    Attributes:
+        name (str): Name of the stage, used for timings and stats.
+        func (Callable[[Any], Any]): Transforms an item's value into its input for the next stage.
+        workers (int): Number of threads running the stage.
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+
+class PipelineItem:
+    """
+    An item moving through the pipeline.
+
+    Attributes:
+        key (str): Identifies the item in logs and results, e.g. a file name.
+        value (Any): Output of the last completed stage.
+        timings (Dict[str, float]): Seconds spent in each completed stage.
+        error (Exception): The error that stopped the item, if any.
+        failed_stage (str): The stage that raised `error`.
+    """
+
+    __slots__ = ("key", "value", "timings", "error", "failed_stage")
+
+    def __init__(self, key: str, value: Any):
+        self.key = key
+        self.value = value
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[Exception] = None
+        self.failed_stage: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"PipelineItem({self.key!r}, error={self.error!r})"
+
+
+class StagedPipeline:
+    """
+    Runs items through stages connected by bounded queues.
+
+    Use `run` to process a batch and wait for it, or `start`, `submit` and `close` to
+    feed a long-running pipeline.
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        queue_size: int = INGESTION_QUEUE_SIZE,
+        on_stage: Optional[Callable[[PipelineItem, str], None]] = None,
+        on_done: Optional[Callable[[PipelineItem], None]] = None,
+    ):
+        """
+        Args:
+            stages (List[Stage]): The stages, in order.
+            queue_size (int): Capacity of the queues between stages. The queue in front of
+                the first stage is unbounded, since it only holds submitted items.
+            on_stage (Callable, optional): Called with an item and a stage name before the stage runs.
+            on_done (Callable, optional): Called with each item after its last stage or its error.
+        """
+        self.stages = stages
+        self.on_stage = on_stage
+        self.on_done = on_done
+        self.logger = logger
+        self.latencies = LatencyRecorder()
+        self._queues = [queue.Queue()] + [queue.Queue(maxsize=queue_size) for _ in stages[1:]]
+        self._alive = [stage.workers for stage in stages]
+        self._stats = {
+            stage.name: {"processed": 0, "failed": 0, "busy_seconds": 0.0, "blocked_seconds": 0.0, "max_queued": 0}
+            for stage in stages
+        }
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._started_at: Optional[float] = None
+
+    def start(self):
+        """
+        Starts the stage workers.
+        """
+        if self._threads:
+            return
+        self._started_at = time.monotonic()
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work, args=(index,), name=f"ingestion-{stage.name}-{n}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, key: str, value: Any):
+        """
+        Queues an item for the first stage.
+        """
+        self._queues[0].put(PipelineItem(key, value))
+
+    def close(self):
+        """
+        Lets the workers exit once every submitted item went through the pipeline.
+        """
+        for _ in range(self.stages[0].workers):
+            self._queues[0].put(_DONE)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for the pipeline to drain after `close`.
+
+        Returns:
+            bool: Whether the pipeline drained within the timeout.
+        """
+        return self._finished.wait(timeout)
+
+    def run(self, items: Iterable) -> List[PipelineItem]:
+        """
+        Runs (key, value) pairs through the pipeline and waits for all of them.
+
+        Returns:
+            List[PipelineItem]: The finished items, in completion order.
+        """
+        results = []
+        on_done = self.on_done
+
+        def collect(item: PipelineItem):
+            results.append(item)
+            if on_done is not None:
+                on_done(item)
+
+        self.on_done = collect
+        self.start()
+        for key, value in items:
+            self.submit(key, value)
+        self.close()
+        self.join()
+        self.on_done = on_done
+        return results
+
+    def _put(self, index: int, item):
+        """
+        Hands an item to stage `index`, blocking while its queue is full.
+        """
+        start = time.perf_counter()
+        self._queues[index].put(item)
+        waited = time.perf_counter() - start
+        sender, receiver = self._stats[self.stages[index - 1].name], self._stats[self.stages[index].name]
+        with self._lock:
+            sender["blocked_seconds"] += waited
+            receiver["max_queued"] = max(receiver["max_queued"], self._queues[index].qsize())
+
+    def _work(self, index: int):
+        stage = self.stages[index]
+        stats = self._stats[stage.name]
+        is_last = index == len(self.stages) - 1
+        while True:
+            item = self._queues[index].get()
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            try:
+                if self.on_stage is not None:
+                    self.on_stage(item, stage.name)
+                item.value = stage.func(item.value)
+            except Exception as e:
+                item.error, item.failed_stage = e, stage.name
+                self.logger.error(f"Ingestion of {item.key} failed in stage {stage.name}: {e}", exc_info=True)
+            elapsed = time.perf_counter() - start
+            item.timings[stage.name] = elapsed
+            self.latencies.record(stage.name, elapsed)
+            with self._lock:
+                stats["busy_seconds"] += elapsed
+                stats["failed" if item.error else "processed"] += 1
+
+            if item.error is None and not is_last:
+                self._put(index + 1, item)
+            else:
+                self._finish(item)
+
+        with self._lock:
+            self._alive[index] -= 1
+            last_worker = self._alive[index] == 0
+        if not last_worker:
+            return
+        if is_last:
+            self._finished.set()
+        else:
+            for _ in range(self.stages[index + 1].workers):
+                self._queues[index + 1].put(_DONE)
+
+    def _finish(self, item: PipelineItem):
+        if self.on_done is None:
+            return
+        try:
+            self.on_done(item)
+        except Exception as e:
+            self.logger.error(f"Failed to record ingestion result of {item.key}: {e}", exc_info=True)
+
+    def stats(self) -> dict:
+        """
+        Returns per-stage throughput and latencies.
+
+        `blocked_seconds` is the time a stage waited on the full queue of the next one,
+        so a high value points at the next stage as the bottleneck. `queued` and
+        `max_queued` are the current and highest number of items waiting for a stage.
+        `utilization` is the share of the stage's worker time spent processing items.
+
+        Returns:
+            dict: Counters, throughput and utilization per stage, and per-item latencies.
+        """
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        with self._lock:
+            snapshot = {name: dict(stats) for name, stats in self._stats.items()}
+        for stage, stage_queue in zip(self.stages, self._queues):
+            stats = snapshot[stage.name]
+            stats["queued"] = stage_queue.qsize()
+            stats["items_per_minute"] = round(60 * stats["processed"] / elapsed, 2) if elapsed else 0.0
+            stats["utilization"] = round(stats["busy_seconds"] / (elapsed * stage.workers), 4) if elapsed else 0.0
+            stats["busy_seconds"] = round(stats["busy_seconds"], 3)
+            stats["blocked_seconds"] = round(stats["blocked_seconds"], 3)
+        return {"elapsed_seconds": round(elapsed, 3), "stages": snapshot, "latencies": self.latencies.summary()}
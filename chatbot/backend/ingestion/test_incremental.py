@@ -0,0 +1,168 @@
+import types
+
+import numpy as np
+import pytest
+
+from chatbot.backend.ingestion.incremental import IncrementalIngestor
+from chatbot.backend.services.models.embedding_model import embedding_model_version
+from chatbot.backend.services.vector_db import db
+from chatbot.backend.services.vector_db.backends.local import DENSE_DIM, LocalBackend
+from chatbot.backend.services.vector_db.manifest import IngestionManifest, chunk_hash
+
+
+class FakeEmbeddingModel:
+    """Embeds texts as constant vectors and records what it was asked to embed."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode_texts(self, texts, persist=False):
+        self.encoded.extend(texts)
+        return np.ones((len(texts), DENSE_DIM), dtype=np.float32), [{1: 1.0} for _ in texts]
+
+    def convert_sparse_embeddings(self, sparse_embeddings):
+        return sparse_embeddings
+
+
+@pytest.fixture
+def vector_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "create_backend", lambda name, collection: LocalBackend(collection, str(tmp_path)))
+    monkeypatch.setattr(db, "IngestionManifest", types.SimpleNamespace(
+        for_collection=lambda backend, collection: IngestionManifest(str(tmp_path / "manifest.sqlite3"))
+    ))
+    return db.VectorDB("test", backend="local")
+
+
+@pytest.fixture
+def ingestor(vector_db):
+    return IncrementalIngestor(vector_db, FakeEmbeddingModel())
+
+
+def texts_of(vector_db, doc_id="FAQ"):
+    return sorted(row["text"] for rows in vector_db.backend.query("doc_id", [doc_id]) for row in rows)
+
+
+def test_first_ingestion_adds_every_chunk(ingestor, vector_db):
+    delta = ingestor.ingest_chunks("faq.pkl", "FAQ", "FAQ", ["a", "b"])
+
+    assert (len(delta.added), len(delta.removed), delta.unchanged, delta.dry_run) == (2, 0, 0, False)
+    assert texts_of(vector_db) == ["a", "b"]
+    assert set(vector_db.manifest.source_chunks("faq.pkl")) == {chunk_hash("a"), chunk_hash("b")}
+
+
+def test_reingesting_only_applies_the_delta(ingestor, vector_db):
+    ingestor.ingest_chunks("faq.pkl", "FAQ", "FAQ", ["a", "b"])
+    ingestor.embedding_model.encoded.clear()
+
+    delta = ingestor.ingest_chunks("faq.pkl", "FAQ", "FAQ", ["b", "c"])
+
+    assert (len(delta.added), len(delta.removed), delta.unchanged) == (1, 1, 1)
+    assert ingestor.embedding_model.encoded == ["c"]
+    assert texts_of(vector_db) == ["b", "c"]
+    assert not ingestor.ingest_chunks("faq.pkl", "FAQ", "FAQ", ["b", "c"]).changed
+
+
+def test_dry_run_writes_nothing(ingestor, vector_db):
+    delta = ingestor.ingest_chunks("faq.pkl", "FAQ", "FAQ", ["a"], dry_run=True)
+
+    assert delta.dry_run and delta.added == [chunk_hash("a")]
+    assert texts_of(vector_db) == []
+    assert ingestor.embedding_model.encoded == []
+
+
+def test_chunks_of_another_model_version_are_replaced(ingestor, vector_db):
+    vector_db.manifest.apply("faq.pkl", [(chunk_hash("a"), 99)], [], "FAQ", "FAQ", "old-model")
+
+    delta = ingestor.plan("faq.pkl", [chunk_hash("a")])
+
+    assert delta.added == [chunk_hash("a")] and delta.removed == [chunk_hash("a")]
+
+
+def test_remove_source_deletes_its_chunks(ingestor, vector_db):
+    ingestor.ingest_chunks("faq.pkl", "FAQ", "FAQ", ["a", "b"])
+
+    delta = ingestor.remove_source("faq.pkl")
+
+    assert len(delta.removed) == 2
+    assert texts_of(vector_db) == []
+    assert vector_db.manifest.source_chunks("faq.pkl") == {}
+
+
+def insert_unrecorded(vector_db, texts, doc_id="FAQ", doc_source="faq.pkl"):
+    return vector_db.insert([
+        {
+            "doc_id": doc_id,
+            "doc_source": doc_source,
+            "text": text,
+            "text_dense_embedding": np.ones(DENSE_DIM).tolist(),
+            "text_sparse_embedding": {1: 1.0},
+        }
+        for text in texts
+    ])
+
+
+def test_ingesting_over_unrecorded_entries_is_refused(ingestor, vector_db):
+    insert_unrecorded(vector_db, ["a"])
+
+    with pytest.raises(RuntimeError, match="bootstrap"):
+        ingestor.ingest_chunks("faq.pkl", "FAQ", "FAQ", ["a"])
+    # a dry run only warns
+    assert ingestor.ingest_chunks("faq.pkl", "FAQ", "FAQ", ["a"], dry_run=True).added == [chunk_hash("a")]
+    # other document types are not affected
+    ingestor.ingest_chunks("mail.pkl", "mail.pkl", "Emails", ["x"])
+    assert texts_of(vector_db) == ["a"]
+
+
+def test_adopt_existing_records_entries_and_deletes_duplicates(ingestor, vector_db):
+    insert_unrecorded(vector_db, ["a", "b", "a"])
+
+    assert ingestor.adopt_existing(["FAQ"], dry_run=True) == {"adopted": 2, "deleted": 1}
+    assert len(vector_db.backend) == 3
+
+    assert ingestor.adopt_existing(["FAQ"]) == {"adopted": 2, "deleted": 1}
+    assert texts_of(vector_db) == ["a", "b"]
+    chunks = vector_db.manifest.source_chunks("faq.pkl")
+    assert set(chunks) == {chunk_hash("a"), chunk_hash("b")}
+    assert {version for _, version in chunks.values()} == {embedding_model_version()}
+
+    # adopted chunks are not inserted again, and adopting twice changes nothing
+    assert not ingestor.ingest_chunks("faq.pkl", "FAQ", "FAQ", ["a", "b"]).changed
+    assert ingestor.adopt_existing(["FAQ"]) == {"adopted": 0, "deleted": 0}
+
+
+def test_adopt_existing_maps_entries_to_source_keys(ingestor, vector_db):
+    insert_unrecorded(vector_db, ["a", "b"], doc_source="FAQ")
+    sources = {chunk_hash("a"): "faq/one.pkl", chunk_hash("b"): "faq/two.pkl"}
+
+    ingestor.adopt_existing(["FAQ"], source_key_for=lambda doc_source, hash_: sources[hash_])
+
+    assert sorted(vector_db.manifest.sources()) == ["faq/one.pkl", "faq/two.pkl"]
+    assert vector_db.manifest.has_chunks("FAQ") and not vector_db.manifest.has_chunks("Emails")
+
+
+def test_apply_plans_again_against_versions_applied_since_prepare(ingestor, vector_db):
+    ingestor.ingest_chunks("faq.pkl", "FAQ", "FAQ", ["a"])
+    # two uploads of the same file, both prepared against the manifest holding "a"
+    first = ingestor.embed(ingestor.prepare("faq.pkl", "FAQ", "FAQ", ["a", "b"]))
+    second = ingestor.embed(ingestor.prepare("faq.pkl", "FAQ", "FAQ", ["a", "b", "c"]))
+
+    ingestor.apply(second)
+    delta = ingestor.apply(first)
+
+    # "c" is removed rather than left behind, and "b" is not inserted twice
+    assert (delta.added, delta.removed) == ([], [chunk_hash("c")])
+    assert texts_of(vector_db) == ["a", "b"]
+    assert set(vector_db.manifest.source_chunks("faq.pkl")) == {chunk_hash("a"), chunk_hash("b")}
+
+
+def test_apply_embeds_chunks_removed_since_prepare(ingestor, vector_db):
+    ingestor.ingest_chunks("faq.pkl", "FAQ", "FAQ", ["a"])
+    stale = ingestor.embed(ingestor.prepare("faq.pkl", "FAQ", "FAQ", ["a", "b"]))
+    ingestor.remove_source("faq.pkl")
+    ingestor.embedding_model.encoded.clear()
+
+    delta = ingestor.apply(stale)
+
+    assert sorted(delta.added) == sorted([chunk_hash("a"), chunk_hash("b")])
+    assert ingestor.embedding_model.encoded == ["a"]
+    assert texts_of(vector_db) == ["a", "b"]
@@ -1,64 +1,142 @@
+import argparse
 import os
 import pickle
 import requests
-from chatbot.backend.services.models.embedding_model import embedding_model
+from chatbot.backend.ingestion.incremental import incremental_ingestor
+from chatbot.backend.ingestion.pipeline import (
+    INGESTION_EMBED_WORKERS,
+    INGESTION_INSERT_WORKERS,
+    Stage,
+    StagedPipeline,
+)
 from chatbot.backend.services.vector_db.db import vector_db
+from chatbot.backend.services.vector_db.manifest import chunk_hash
 
 # Ensure that API Service is up and running
 # Set directory where all the data files are located
 data_dir = "chatbot/backend/data_pkl"
+# Pickle files are small, so two loaders keep the embedding stage busy
+INGESTION_LOAD_WORKERS = 2
 
-def ingest_text_documents():
-    # Iterate through all subdirectories in the data_dir
+def load_source(source):
+    """
+    Loads the chunks of a pickle file and plans their ingestion.
+    """
+    file_path, doc_source, dry_run = source
+    with open(file_path, "rb") as f:
+        text_chunks = pickle.load(f)
+    doc_type = "FAQ" if "faq" in os.path.basename(file_path).lower() else "Emails"  # Determine doc_source based on filename
+    return incremental_ingestor.prepare(
+        source_key=file_path,
+        doc_source=doc_source,
+        doc_id=doc_type,
+        chunks=text_chunks,
+        dry_run=dry_run,
+    )
+
+def report(item):
+    if item.error is not None:
+        print(f"Failed to ingest data from {item.key} in stage {item.failed_stage}: {str(item.error)}")
+        return
+    delta = item.value
+    print(f"{'Planned' if delta.dry_run else 'Ingested'} {item.key}: {delta.to_dict()}")
+
+def bootstrap_manifest(dry_run: bool = False):
+    """
+    Records emails and FAQs ingested before the ingestion manifest existed under their pickle files.
+
+    Such entries only carry the subdirectory name as doc_source, so each is matched to the
+    pickle file holding its text. Entries that match no file are recorded under the
+    subdirectory, which is then removed as a vanished source by the ingestion that follows.
+    """
+    sources = {}
     for dir in os.listdir(data_dir):
         sub_dir_path = os.path.join(data_dir, dir)
-        if os.path.isdir(sub_dir_path):  # Check if it's a directory
-            # Walk through each subdirectory to find .pkl files
-            for root, _, files in os.walk(sub_dir_path):
-                print(f"Processing {root}...")
-                for filename in files:
+        if not os.path.isdir(sub_dir_path):
+            continue
+        sources[dir] = {}
+        for root, _, files in os.walk(sub_dir_path):
+            for filename in files:
+                if filename.endswith(".pkl"):
                     file_path = os.path.join(root, filename)
+                    with open(file_path, "rb") as f:
+                        for chunk in pickle.load(f):
+                            sources[dir].setdefault(chunk_hash(chunk), file_path)
+
+    def source_key_for(doc_source, hash_):
+        return sources.get(doc_source, {}).get(hash_, os.path.join(data_dir, doc_source))
+
+    counts = incremental_ingestor.adopt_existing(["Emails", "FAQ"], source_key_for, dry_run=dry_run)
+    print(f"{'Planned' if dry_run else 'Applied'} manifest bootstrap: {counts}")
+
+def ingest_text_documents(replace: bool = False, dry_run: bool = False, bootstrap: bool = False):
+    seen_sources = set()
+    if bootstrap and not replace:
+        bootstrap_manifest(dry_run)
+    if replace and not dry_run:
+        # Emails and FAQs live in their own partitions, so replacing them is a cheap partition drop
+        for partition in ("emails", "faq"):
+            dropped = vector_db.drop_partition(partition)
+            print(f"Dropped {dropped} entries from partition '{partition}'")
+
+    def sources():
+        # Iterate through all subdirectories in the data_dir
+        for dir in os.listdir(data_dir):
+            sub_dir_path = os.path.join(data_dir, dir)
+            if os.path.isdir(sub_dir_path):  # Check if it's a directory
+                # Walk through each subdirectory to find .pkl files
+                for root, _, files in os.walk(sub_dir_path):
+                    print(f"Processing {root}...")
+                    for filename in files:
+                        file_path = os.path.join(root, filename)
+
+                        # 1: Queue Pickle Files with QA-Pairs; the subdirectory name is the doc_source
+                        if filename.endswith(".pkl"):
+                            seen_sources.add(file_path)
+                            yield file_path, (file_path, dir, dry_run)
+
+                        # 2: Upload the mail original documents into the FileStorage
+                        if filename.endswith(".msg") and not dry_run:
+                            try:
+                                with open(file_path, "rb") as f:
+                                    files = {'file': (filename, f)}
+                                    upload_response = requests.post("http://localhost:8000/buckets-api/upload", files=files)
+                                    upload_response.raise_for_status()  # Raise an error for bad responses
+                                    print(f"Uploaded {filename} to file storage: {upload_response.json()}")
+                            except Exception as e:
+                                print(f"Failed to upload {filename} to file storage: {str(e)}")
+
+    # Loading, embedding and inserting overlap across files.
+    # Only new or changed chunks are embedded and inserted, vanished ones are deleted
+    pipeline = StagedPipeline(
+        [
+            Stage("load", load_source, INGESTION_LOAD_WORKERS),
+            Stage("embed", incremental_ingestor.embed, INGESTION_EMBED_WORKERS),
+            Stage("insert", incremental_ingestor.apply, INGESTION_INSERT_WORKERS),
+        ],
+        on_done=report,
+    )
+    pipeline.run(sources())
+    stats = pipeline.stats()
+    for name, stage in stats["stages"].items():
+        print(
+            f"{name}: {stage['processed']} done, {stage['failed']} failed, {stage['items_per_minute']}/min, "
+            f"utilization {stage['utilization']:.0%}, blocked {stage['blocked_seconds']}s"
+        )
 
-                    # 1: Open Pickle Files to access QA-Pairs
-                    if filename.endswith(".pkl"):
-                        # Load the text chunks from the pickle file
-                        with open(file_path, "rb") as f:
-                            text_chunks = pickle.load(f)
-
-                        # Embed the text Chunks
-                        print("Encoding Text")
-                        dense_embeddings, sparse_embeddings = embedding_model.encode_texts(text_chunks)
-
-                        # Prepare the payload for ingestion
-                        doc_type = "FAQ" if "faq" in filename.lower() else "Emails"  # Determine doc_source based on filename
-                        data = [
-                            [doc_type] * len(text_chunks), # doc_name
-                            [dir] * len(text_chunks),  # Use the subdirectory name as doc_source
-                            text_chunks, # text
-                            dense_embeddings,  # Dense embeddings
-                            embedding_model.convert_sparse_embeddings(sparse_embeddings),  # payload sparse embeddings
-                        ]
-                        print("Ingesting Data")
-                        # Ingest the original email attachment into the vector database via API
-                        try:
-                            vector_db.batch_ingestion(data)
-                            print(f"Successfully ingested data from {filename}")
-                        except Exception as e:
-                            print(f"Failed to ingest data from {filename}: {str(e)}")
-
-                    # 2: Upload the mail original documents into the FileStorage
-                    if filename.endswith(".msg"):
-                        try:
-                            with open(file_path, "rb") as f:
-                                files = {'file': (filename, f)}
-                                upload_response = requests.post("http://localhost:8000/buckets-api/upload", files=files)
-                                upload_response.raise_for_status()  # Raise an error for bad responses
-                                print(f"Uploaded {filename} to file storage: {upload_response.json()}")
-                        except Exception as e:
-                            print(f"Failed to upload {filename} to file storage: {str(e)}")
+    # 3: Delete the chunks of pickle files that no longer exist
+    for source_key in set(vector_db.manifest.sources(prefix=data_dir)) - seen_sources:
+        delta = incremental_ingestor.remove_source(source_key, dry_run=dry_run)
+        print(f"{'Planned' if dry_run else 'Applied'} removal of vanished {source_key}: {delta.to_dict()}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the pickled email and FAQ chunks")
+    parser.add_argument("--replace", action="store_true", help="drop the emails and faq partitions first")
+    parser.add_argument("--dry-run", action="store_true", help="only report the chunks that would change")
+    parser.add_argument("--bootstrap", action="store_true",
+                        help="first record entries ingested before the manifest existed, instead of duplicating them")
+    args = parser.parse_args()
     print("Ingesting text documents...")
-    ingest_text_documents()
+    ingest_text_documents(replace=args.replace, dry_run=args.dry_run, bootstrap=args.bootstrap)
 
 
@@ -0,0 +1,91 @@
+"""
+Storage backends for the response caches.
+
+Caches talk to a `CacheBackend` so the in-process store can be swapped for a shared
+one (e.g. Redis) without touching the caching logic.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+
+class CacheBackend(ABC):
+    """Key-value store with bounded size and expiry."""
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns the value stored under `key`, or None if it is missing or expired.
+        """
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any):
+        """
+        Stores `value` under `key`, evicting entries if the store is full.
+        """
+
+    @abstractmethod
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """
+        Returns all live (key, value) pairs without affecting recency.
+        """
+
+    @abstractmethod
+    def clear(self):
+        """
+        Removes all entries.
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """
+        Returns the number of stored entries.
+        """
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Thread-safe in-process store with LRU eviction and a per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        with self._lock:
+            now = time.monotonic()
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at < now]
+            for key in expired:
+                del self._entries[key]
+            return [(key, value) for key, (_, value) in self._entries.items()]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
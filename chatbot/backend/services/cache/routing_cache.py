@@ -0,0 +1,223 @@
+"""
+Memoization of routing decisions for the chat workflow.
+
+Routing costs a full LLM round trip on every turn. Exact repeats are answered from
+a hash-keyed cache, and an optional nearest-neighbour fast path classifies standalone
+queries that closely resemble previously routed ones without calling the LLM.
+"""
+
+import hashlib
+import os
+import threading
+from collections import deque
+from typing import Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from chatbot.backend.services.cache.backends import CacheBackend, InMemoryCacheBackend
+from chatbot.backend.services.cache.semantic_cache import SemanticCache
+from chatbot.backend.services.logger import logger
+from chatbot.backend.services.metrics import Counters, hit_rate
+from chatbot.backend.services.models.embedding_model import embedding_model
+
+load_dotenv(override=True)
+
+ROUTING_CACHE_ENABLED = os.getenv("ROUTING_CACHE_ENABLED", "true").lower() == "true"
+ROUTING_CACHE_TTL = float(os.getenv("ROUTING_CACHE_TTL", 3600))
+ROUTING_CACHE_MAX_ENTRIES = int(os.getenv("ROUTING_CACHE_MAX_ENTRIES", 4096))
+# only the most recent part of the chat history is part of the key
+ROUTING_CACHE_HISTORY_CHARS = int(os.getenv("ROUTING_CACHE_HISTORY_CHARS", 2000))
+ROUTING_FAST_PATH_ENABLED = os.getenv("ROUTING_FAST_PATH_ENABLED", "false").lower() == "true"
+ROUTING_FAST_PATH_SIMILARITY = float(os.getenv("ROUTING_FAST_PATH_SIMILARITY", 0.92))
+ROUTING_FAST_PATH_NEIGHBOURS = int(os.getenv("ROUTING_FAST_PATH_NEIGHBOURS", 3))
+
+# (classification, reasoning, clarifying_question)
+Routing = Tuple[str, str, str]
+
+
+class NearestNeighbourRouter:
+    """
+    Classifies queries by the unanimous label of their nearest previously routed queries.
+
+    A query is classified only if at least `min_neighbours` earlier queries lie within
+    `min_similarity` and all of them received the same label. `vague` is never predicted
+    since it requires a query-specific clarifying question from the LLM.
+    """
+
+    def __init__(
+        self,
+        min_similarity: float = ROUTING_FAST_PATH_SIMILARITY,
+        min_neighbours: int = ROUTING_FAST_PATH_NEIGHBOURS,
+        max_examples: int = ROUTING_CACHE_MAX_ENTRIES,
+    ):
+        self.min_similarity = min_similarity
+        self.min_neighbours = min_neighbours
+        self._examples = deque(maxlen=max_examples)  # (embedding, classification)
+        self._lock = threading.Lock()
+
+    def add(self, embedding: np.ndarray, classification: str):
+        """
+        Records a query routed by the LLM.
+
+        Args:
+            embedding (np.ndarray): Normalized embedding of the query.
+            classification (str): The label assigned by the LLM router.
+        """
+        with self._lock:
+            self._examples.append((embedding, classification))
+
+    def classify(self, embedding: np.ndarray) -> Optional[Tuple[str, float]]:
+        """
+        Classifies a query from its nearest neighbours.
+
+        Args:
+            embedding (np.ndarray): Normalized embedding of the query.
+
+        Returns:
+            Optional[Tuple[str, float]]: The label and mean neighbour similarity, or None
+            if the neighbours are too few, too far or disagree.
+        """
+        with self._lock:
+            examples = list(self._examples)
+        if len(examples) < self.min_neighbours:
+            return None
+
+        similarities = np.stack([example for example, _ in examples]) @ embedding
+        neighbours = np.flatnonzero(similarities >= self.min_similarity)
+        if len(neighbours) < self.min_neighbours:
+            return None
+
+        labels = {examples[i][1] for i in neighbours}
+        if len(labels) != 1 or "vague" in labels:
+            return None
+        return labels.pop(), float(similarities[neighbours].mean())
+
+
+class RoutingCache:
+    """
+    Caches routing results keyed on the query, uploaded content and recent chat history.
+    """
+
+    def __init__(
+        self,
+        embedding_model=embedding_model,
+        backend: Optional[CacheBackend] = None,
+        history_chars: int = ROUTING_CACHE_HISTORY_CHARS,
+        use_fast_path: bool = ROUTING_FAST_PATH_ENABLED,
+    ):
+        self.embedding_model = embedding_model
+        # an empty backend is falsy, since it defines __len__
+        self.backend = backend if backend is not None else InMemoryCacheBackend(
+            max_entries=ROUTING_CACHE_MAX_ENTRIES, ttl_seconds=ROUTING_CACHE_TTL
+        )
+        self.history_chars = history_chars
+        self.fast_path = NearestNeighbourRouter() if use_fast_path else None
+        self.counters = Counters()
+        self.logger = logger
+
+    def key(self, user_query: str, uploaded_content: str = "", chat_history: str = "") -> str:
+        """
+        Builds the cache key for a routing request.
+
+        Args:
+            user_query (str): The user query.
+            uploaded_content (str): Content uploaded by the user.
+            chat_history (str): The chat history.
+
+        Returns:
+            str: A SHA-256 hex digest over the normalized query, a digest of the uploaded
+            content and the most recent `history_chars` characters of the chat history.
+        """
+        uploaded_digest = hashlib.sha256(uploaded_content.encode("utf-8")).hexdigest()
+        recent_history = chat_history[-self.history_chars:] if self.history_chars else ""
+        payload = "\x1f".join(
+            [SemanticCache.normalize(user_query), uploaded_digest, recent_history]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _embed(self, user_query: str, query_embedding: Optional[np.ndarray]) -> np.ndarray:
+        if query_embedding is not None:
+            return query_embedding
+        embedding = self.embedding_model.batch_encode_dense([SemanticCache.normalize(user_query)])[0]
+        return np.asarray(embedding, dtype=np.float32)
+
+    def lookup(
+        self,
+        user_query: str,
+        uploaded_content: str = "",
+        chat_history: str = "",
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> Optional[Routing]:
+        """
+        Looks up a routing result, trying the exact cache before the fast path.
+
+        Args:
+            user_query (str): The user query.
+            uploaded_content (str): Content uploaded by the user.
+            chat_history (str): The chat history.
+            query_embedding (np.ndarray, optional): Normalized query embedding, if already computed.
+
+        Returns:
+            Optional[Routing]: (classification, reasoning, clarifying_question), or None on a miss.
+        """
+        routing = self.backend.get(self.key(user_query, uploaded_content, chat_history))
+        if routing is not None:
+            self.counters.increment("exact_hits")
+            return routing
+
+        # the fast path only learns from and serves standalone queries
+        if self.fast_path is not None and not uploaded_content and not chat_history:
+            prediction = self.fast_path.classify(self._embed(user_query, query_embedding))
+            if prediction is not None:
+                classification, similarity = prediction
+                self.counters.increment("fast_path_hits")
+                self.logger.info(f"fast-path route to `{classification}` ({similarity:.3f})")
+                return (
+                    classification,
+                    f"fast path: nearest routed queries agree (mean similarity {similarity:.3f})",
+                    "",
+                )
+
+        self.counters.increment("misses")
+        return None
+
+    def store(
+        self,
+        user_query: str,
+        routing: Routing,
+        uploaded_content: str = "",
+        chat_history: str = "",
+        query_embedding: Optional[np.ndarray] = None,
+    ):
+        """
+        Caches a routing result produced by the LLM router.
+
+        Args:
+            user_query (str): The user query.
+            routing (Routing): (classification, reasoning, clarifying_question).
+            uploaded_content (str): Content uploaded by the user.
+            chat_history (str): The chat history.
+            query_embedding (np.ndarray, optional): Normalized query embedding, if already computed.
+        """
+        self.backend.set(self.key(user_query, uploaded_content, chat_history), routing)
+        if self.fast_path is not None and not uploaded_content and not chat_history:
+            self.fast_path.add(self._embed(user_query, query_embedding), routing[0])
+
+    def stats(self) -> dict:
+        """
+        Returns cache statistics.
+
+        Returns:
+            dict: Exact and fast-path hit counts, misses, hit rate and number of entries.
+        """
+        counts = self.counters.snapshot()
+        hits = counts.get("exact_hits", 0) + counts.get("fast_path_hits", 0)
+        misses = counts.get("misses", 0)
+        return {
+            "exact_hits": counts.get("exact_hits", 0),
+            "fast_path_hits": counts.get("fast_path_hits", 0),
+            "misses": misses,
+            "hit_rate": hit_rate(hits, misses),
+            "entries": len(self.backend),
+        }
@@ -0,0 +1,162 @@
+"""
+Semantic response cache for the chat workflow.
+
+Answers are cached against the dense BGE embedding of the normalized query, so
+paraphrases of a previously answered question are served without any LLM or
+Milvus calls.
+"""
+
+import hashlib
+import os
+import re
+from typing import Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from chatbot.backend.services.cache.backends import CacheBackend, InMemoryCacheBackend
+from chatbot.backend.services.logger import logger
+from chatbot.backend.services.metrics import Counters, hit_rate
+from chatbot.backend.services.models.embedding_model import embedding_model
+
+load_dotenv(override=True)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", 3600))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 1024))
+
+
+class SemanticCacheEntry:
+    """A cached response together with the embedding of the query it answered."""
+
+    __slots__ = ("query", "embedding", "response")
+
+    def __init__(self, query: str, embedding: np.ndarray, response: str):
+        self.query = query
+        self.embedding = embedding
+        self.response = response
+
+
+class SemanticCache:
+    """
+    Caches responses keyed on the dense embedding of the normalized query.
+
+    A lookup is a hit when the cosine similarity between the query and a cached
+    query reaches `similarity_threshold`. Expiry and eviction are delegated to the
+    backend.
+    """
+
+    def __init__(
+        self,
+        embedding_model=embedding_model,
+        backend: Optional[CacheBackend] = None,
+        similarity_threshold: float = SEMANTIC_CACHE_THRESHOLD,
+    ):
+        self.embedding_model = embedding_model
+        # an empty backend is falsy, since it defines __len__
+        self.backend = backend if backend is not None else InMemoryCacheBackend(
+            max_entries=SEMANTIC_CACHE_MAX_ENTRIES, ttl_seconds=SEMANTIC_CACHE_TTL
+        )
+        self.similarity_threshold = similarity_threshold
+        self.counters = Counters()
+        self.logger = logger
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """
+        Normalizes a query so trivially different phrasings share an embedding.
+
+        Args:
+            query (str): The raw user query.
+
+        Returns:
+            str: The lower-cased query with collapsed whitespace and no trailing punctuation.
+        """
+        query = re.sub(r"\s+", " ", query.lower()).strip()
+        return query.rstrip("?!.。 ")
+
+    def embed(self, query: str) -> np.ndarray:
+        """
+        Embeds the normalized query.
+
+        Args:
+            query (str): The raw user query.
+
+        Returns:
+            np.ndarray: The L2-normalized float32 dense embedding.
+        """
+        embedding = self.embedding_model.batch_encode_dense([self.normalize(query)])[0]
+        return np.asarray(embedding, dtype=np.float32)
+
+    def lookup(self, query: str) -> Tuple[Optional[str], np.ndarray]:
+        """
+        Looks up a cached response for a semantically equivalent query.
+
+        Args:
+            query (str): The raw user query.
+
+        Returns:
+            Tuple[Optional[str], np.ndarray]: The cached response (None on a miss) and the
+            query embedding, which can be passed to `store` to avoid re-encoding.
+        """
+        embedding = self.embed(query)
+        entries = self.backend.items()
+        if entries:
+            # embeddings are normalized, so the dot product is the cosine similarity
+            matrix = np.stack([entry.embedding for _, entry in entries])
+            similarities = matrix @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                key, entry = entries[best]
+                self.backend.get(key)  # refresh LRU recency
+                self.counters.increment("hits")
+                self.logger.info(
+                    f"semantic cache hit ({similarities[best]:.3f}) for cached query: {entry.query}"
+                )
+                return entry.response, embedding
+
+        self.counters.increment("misses")
+        return None, embedding
+
+    def store(self, query: str, response: str, embedding: Optional[np.ndarray] = None):
+        """
+        Caches a response.
+
+        Args:
+            query (str): The raw user query.
+            response (str): The response to cache.
+            embedding (np.ndarray, optional): The query embedding returned by `lookup`.
+        """
+        if embedding is None:
+            embedding = self.embed(query)
+        key = hashlib.sha256(self.normalize(query).encode("utf-8")).hexdigest()
+        self.backend.set(key, SemanticCacheEntry(query, embedding, response))
+
+    def record_bypass(self):
+        """Counts a request that skipped the cache because it had uploads or history."""
+        self.counters.increment("bypasses")
+
+    def invalidate(self):
+        """Drops every cached response, e.g. after the corpus has changed."""
+        self.backend.clear()
+        self.counters.increment("invalidations")
+        self.logger.info("semantic cache invalidated")
+
+    def stats(self) -> dict:
+        """
+        Returns cache statistics.
+
+        Returns:
+            dict: Hit/miss/bypass/invalidation counts, hit rate and number of entries.
+        """
+        counts = self.counters.snapshot()
+        hits, misses = counts.get("hits", 0), counts.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "bypasses": counts.get("bypasses", 0),
+            "invalidations": counts.get("invalidations", 0),
+            "hit_rate": hit_rate(hits, misses),
+            "entries": len(self.backend),
+        }
@@ -0,0 +1,98 @@
+import numpy as np
+
+from chatbot.backend.services.cache import backends
+from chatbot.backend.services.cache.backends import InMemoryCacheBackend
+from chatbot.backend.services.cache.semantic_cache import SemanticCache
+
+
+class FakeEmbeddingModel:
+    """Embeds each normalized query as a fixed unit vector."""
+
+    def __init__(self, vectors):
+        self.vectors = {text: np.asarray(vector, dtype=np.float32) / np.linalg.norm(vector)
+                        for text, vector in vectors.items()}
+        self.calls = 0
+
+    def batch_encode_dense(self, texts):
+        self.calls += 1
+        return [self.vectors[text] for text in texts]
+
+
+VECTORS = {
+    "what is an nda": [1.0, 0.0, 0.0],
+    "what's an nda": [0.99, 0.1, 0.0],
+    "how do i file a patent": [0.0, 1.0, 0.0],
+}
+
+
+def make_cache(threshold=0.95, max_entries=8, ttl_seconds=60):
+    return SemanticCache(
+        embedding_model=FakeEmbeddingModel(VECTORS),
+        backend=InMemoryCacheBackend(max_entries=max_entries, ttl_seconds=ttl_seconds),
+        similarity_threshold=threshold,
+    )
+
+
+def test_normalize_ignores_case_whitespace_and_trailing_punctuation():
+    assert SemanticCache.normalize("  What IS   an NDA?? ") == "what is an nda"
+
+
+def test_lookup_hits_paraphrase_above_threshold():
+    cache = make_cache()
+    cache.store("What is an NDA?", "A non-disclosure agreement.")
+
+    response, _ = cache.lookup("what's an NDA")
+
+    assert response == "A non-disclosure agreement."
+    assert cache.stats()["hits"] == 1
+
+
+def test_lookup_misses_below_threshold():
+    cache = make_cache(threshold=0.999)
+    cache.store("What is an NDA?", "A non-disclosure agreement.")
+
+    assert cache.lookup("what's an NDA")[0] is None
+    assert cache.lookup("How do I file a patent?")[0] is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_store_reuses_lookup_embedding():
+    cache = make_cache()
+    _, embedding = cache.lookup("What is an NDA?")
+    cache.store("What is an NDA?", "answer", embedding)
+
+    assert cache.embedding_model.calls == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(backends.time, "monotonic", lambda: now[0])
+    cache = make_cache(ttl_seconds=10)
+    cache.store("What is an NDA?", "answer")
+
+    now[0] += 5
+    assert cache.lookup("What is an NDA?")[0] == "answer"
+    now[0] += 10
+    assert cache.lookup("What is an NDA?")[0] is None
+    assert len(cache.backend) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = make_cache(max_entries=2)
+    cache.store("What is an NDA?", "nda")
+    cache.store("How do I file a patent?", "patent")
+    # a hit refreshes the recency of the NDA entry
+    assert cache.lookup("What is an NDA?")[0] == "nda"
+    cache.store("what's an NDA", "nda again")
+
+    assert cache.lookup("How do I file a patent?")[0] is None
+    assert len(cache.backend) == 2
+
+
+def test_invalidate_drops_all_entries():
+    cache = make_cache()
+    cache.store("What is an NDA?", "answer")
+    cache.invalidate()
+
+    assert cache.lookup("What is an NDA?")[0] is None
+    assert cache.stats()["invalidations"] == 1
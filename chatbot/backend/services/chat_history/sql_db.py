@@ -1,12 +1,15 @@
 import os
 import logging
-from supabase import create_client, Client
+from supabase import create_client
 from uuid import uuid4
 from datetime import datetime
 
+from chatbot.backend.services.registry import registry
+
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(url, key)
+# the client is created on first use
+supabase = registry.register("supabase_chat_history", lambda: create_client(url, key))
 
 # Checks if  auser exists in the database
 def check_user_exists(uuid: str) -> dict:
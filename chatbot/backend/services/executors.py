@@ -0,0 +1,45 @@
+"""
+Bounded thread pools for offloading blocking work from the FastAPI event loop.
+
+CPU-bound encoder calls (BGE / SPLADE) and blocking Milvus network calls run in
+separate pools so that a burst of slow searches cannot starve query encoding
+and vice versa.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+# Torch already parallelises a single forward pass across cores, so a small pool suffices
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", 2))
+# Milvus calls are network bound and mostly wait on I/O
+MILVUS_WORKERS = int(os.getenv("MILVUS_WORKERS", 8))
+
+embedding_executor = ThreadPoolExecutor(
+    max_workers=EMBEDDING_WORKERS, thread_name_prefix="embedding"
+)
+milvus_executor = ThreadPoolExecutor(
+    max_workers=MILVUS_WORKERS, thread_name_prefix="milvus"
+)
+
+
+async def run_in_executor(executor: ThreadPoolExecutor, func, *args, **kwargs):
+    """
+    Runs a blocking callable in the given executor without blocking the event loop.
+
+    Args:
+        executor (ThreadPoolExecutor): The pool to run the callable in.
+        func (Callable): The blocking callable.
+        *args: Positional arguments for the callable.
+        **kwargs: Keyword arguments for the callable.
+
+    Returns:
+        Any: The return value of the callable.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
@@ -1,14 +1,18 @@
 import os
 import io
 import mimetypes
-from supabase import create_client, Client
+from supabase import create_client
 from dotenv import load_dotenv
 
+from chatbot.backend.services.registry import registry
+
 
 load_dotenv()
 url: str = os.environ.get("SUPABASE_URL")
 service_key: str = os.environ.get("SUPABASE_SERVICE_KEY") # Requires service role key to bypass RLS
-supabase: Client = create_client(url, supabase_key=service_key)
+supabase = registry.register(
+    "supabase_storage", lambda: create_client(url, supabase_key=service_key)
+)
 
 BUCKET_NAME = "rag_files"
 
@@ -0,0 +1,35 @@
+"""
+This module defines liveness and readiness endpoints for the backend.
+Readiness reflects the background warm-up of lazily initialized components.
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from chatbot.backend.services.registry import registry
+
+health_router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@health_router.get("/live")
+async def live():
+    """
+    Reports that the process is up and serving requests.
+
+    Returns:
+        dict: A static status payload.
+    """
+    return {"status": "ok"}
+
+
+@health_router.get("/ready")
+async def ready():
+    """
+    Reports whether all warmed-up components are initialized.
+
+    Returns:
+        JSONResponse: 200 when ready and 503 otherwise, with per-component state,
+        warm-up timings and router import timings.
+    """
+    status = registry.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
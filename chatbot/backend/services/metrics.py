@@ -0,0 +1,164 @@
+"""
+Lightweight in-process metrics for latency and event counting.
+
+Recorders keep a rolling window of samples per named operation so that p50/p99
+can be reported from the API without an external metrics backend.
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Computes a percentile using the nearest-rank method.
+
+    Args:
+        samples (List[float]): The observed values.
+        pct (float): The percentile to compute, between 0 and 100.
+
+    Returns:
+        float: The percentile value, or 0.0 if there are no samples.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class LatencyRecorder:
+    """Thread-safe rolling window of latencies per named operation."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        """
+        Records a single latency sample.
+
+        Args:
+            name (str): Name of the operation.
+            seconds (float): Duration of the operation in seconds.
+        """
+        with self._lock:
+            self._samples[name].append(seconds)
+
+    @contextmanager
+    def time(self, name: str, timings: Optional[Dict[str, float]] = None):
+        """
+        Times the enclosed block and records it under `name`.
+
+        Args:
+            name (str): Name of the operation.
+            timings (Dict[str, float], optional): Per-request dict that also receives the duration.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.record(name, elapsed)
+            if timings is not None:
+                timings[name] = elapsed
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarizes the recorded samples.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Count, mean, p50 and p99 in milliseconds per operation.
+        """
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+        return {
+            name: {
+                "count": len(samples),
+                "mean_ms": round(1000 * sum(samples) / len(samples), 2),
+                "p50_ms": round(1000 * percentile(samples, 50), 2),
+                "p99_ms": round(1000 * percentile(samples, 99), 2),
+            }
+            for name, samples in snapshot.items()
+            if samples
+        }
+
+    def reset(self):
+        """Clears all recorded samples."""
+        with self._lock:
+            self._samples.clear()
+
+
+class Counters:
+    """Thread-safe named event counters."""
+
+    def __init__(self):
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: int = 1):
+        """
+        Increments a counter.
+
+        Args:
+            name (str): Name of the counter.
+            amount (int): Amount to add.
+        """
+        with self._lock:
+            self._counts[name] += amount
+
+    def get(self, name: str) -> int:
+        """
+        Returns the current value of a counter.
+        """
+        with self._lock:
+            return self._counts.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Returns a copy of all counters.
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        """Resets all counters to zero."""
+        with self._lock:
+            self._counts.clear()
+
+
+def hit_rate(hits: int, misses: int) -> float:
+    """
+    Computes a cache hit rate.
+
+    Args:
+        hits (int): Number of hits.
+        misses (int): Number of misses.
+
+    Returns:
+        float: Hits over lookups, or 0.0 if there were no lookups.
+    """
+    lookups = hits + misses
+    return round(hits / lookups, 4) if lookups else 0.0
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """
+    Formats per-request stage timings for logging.
+
+    Args:
+        timings (Dict[str, float]): Stage durations in seconds.
+
+    Returns:
+        str: Stage durations in milliseconds, e.g. "route=812.3ms search=95.1ms".
+    """
+    return " ".join(f"{name}={1000 * seconds:.1f}ms" for name, seconds in timings.items())
+
+
+# Per-stage latencies of the chat query workflow
+stage_latencies = LatencyRecorder()
@@ -0,0 +1,189 @@
+"""
+Dynamic micro-batching of query embeddings.
+
+Concurrent requests each encode a single query, which wastes the batched matrix
+math BGE and SPLADE are built for. The batcher gathers `encode_texts` calls for up
+to `window_ms` milliseconds or `max_batch_size` texts, runs one batched forward pass
+per model on a dedicated thread, and hands each caller back its own rows.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import List
+
+from dotenv import load_dotenv
+
+from chatbot.backend.services.logger import logger
+from chatbot.backend.services.metrics import Counters
+from chatbot.backend.services.models.embedding_model import embedding_model
+
+load_dotenv(override=True)
+
+EMBEDDING_BATCHING_ENABLED = os.getenv("EMBEDDING_BATCHING_ENABLED", "false").lower() == "true"
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 5))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", 32))
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent `encode_texts` calls into batched forward passes.
+
+    Exposes the same `encode_texts` / `aencode_texts` interface as `EmbeddingModel`,
+    so it can be used wherever queries are encoded.
+    """
+
+    def __init__(
+        self,
+        embedding_model=embedding_model,
+        window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+    ):
+        self.embedding_model = embedding_model
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.counters = Counters()
+        self.logger = logger
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Queues texts for the next batch.
+
+        Args:
+            texts (List[str]): A list of text strings to encode.
+
+        Returns:
+            Future: Resolves to (dense_embeddings, sparse_embeddings) for the given texts.
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def encode_texts(self, texts: List[str]):
+        """
+        Generates dense and sparse embeddings for texts as part of a shared batch.
+
+        Args:
+            texts (List[str]): A list of text strings to encode.
+
+        Returns:
+            Tuple[List[List[float]], Any]: A tuple containing dense embeddings and sparse embeddings.
+        """
+        return self.submit(texts).result()
+
+    async def aencode_texts(self, texts: List[str]):
+        """
+        Async version of `encode_texts` that waits on the batch without holding a thread.
+
+        Args:
+            texts (List[str]): A list of text strings to encode.
+
+        Returns:
+            Tuple[List[List[float]], Any]: A tuple containing dense embeddings and sparse embeddings.
+        """
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _next_request(self, timeout=None):
+        """
+        Dequeues the next request that was not cancelled while waiting.
+
+        Marks its future as running, so that it can no longer be cancelled.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            request = self._queue.get(timeout=remaining)
+            if request[1].set_running_or_notify_cancel():
+                return request
+            self.counters.increment("cancelled")
+
+    def _collect_batch(self):
+        """
+        Blocks for the first request, then gathers more until the window closes or the batch is full.
+
+        A single request larger than the remaining room is still taken whole, so a batch
+        may exceed `max_batch_size` by at most one request. Cancelled requests are dropped.
+        """
+        batch = [self._next_request()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.window_ms / 1000
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._next_request(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _resolve(self, future: Future, result=None, error: Exception = None):
+        """
+        Sets the result or error of a request, ignoring futures that are already done.
+        """
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._collect_batch()
+                texts = [text for request_texts, _ in batch for text in request_texts]
+                self.counters.increment("batches")
+                self.counters.increment("requests", len(batch))
+                self.counters.increment("texts", len(texts))
+
+                dense_embeddings, sparse_embeddings = self.embedding_model.encode_texts(texts)
+                offset = 0
+                for request_texts, future in batch:
+                    end = offset + len(request_texts)
+                    self._resolve(future, (dense_embeddings[offset:end], sparse_embeddings[offset:end]))
+                    offset = end
+            except Exception as e:
+                # one failed batch must not stop the worker, or every later request would hang
+                self.logger.error(f"Batched encoding of {len(batch)} requests failed: {e}")
+                for _, future in batch:
+                    self._resolve(future, error=e)
+
+    def stats(self) -> dict:
+        """
+        Returns batching statistics.
+
+        Returns:
+            dict: Number of batches, requests, texts and cancelled requests, and the mean batch size.
+        """
+        counts = self.counters.snapshot()
+        batches = counts.get("batches", 0)
+        return {
+            "batches": batches,
+            "requests": counts.get("requests", 0),
+            "texts": counts.get("texts", 0),
+            "cancelled": counts.get("cancelled", 0),
+            "mean_batch_size": round(counts.get("texts", 0) / batches, 2) if batches else 0.0,
+        }
+
+
+embedding_batcher = EmbeddingBatcher()
@@ -0,0 +1,119 @@
+"""
+Bounded in-memory cache of per-text embeddings.
+
+Entries are keyed by a hash of the text and the cache is capped by the total
+number of bytes held by the cached vectors rather than by entry count, since dense
+and sparse vectors differ widely in size.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+
+from chatbot.backend.services.metrics import Counters, hit_rate
+
+
+def text_key(text: str) -> bytes:
+    """
+    Hashes a text into a compact cache key.
+
+    Args:
+        text (str): The text to hash.
+
+    Returns:
+        bytes: A 16-byte BLAKE2b digest of the text.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of embeddings bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int]):
+        """
+        Args:
+            max_bytes (int): Maximum total size of the cached vectors.
+            sizeof (Callable[[Any], int]): Returns the size in bytes of a cached vector.
+        """
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (vector, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = Counters()
+
+    def get_many(self, texts: List[str]) -> List[Optional[Any]]:
+        """
+        Looks up the cached vectors of several texts.
+
+        Args:
+            texts (List[str]): The texts to look up.
+
+        Returns:
+            List[Optional[Any]]: The cached vector of each text, None where it is missing.
+        """
+        results = []
+        with self._lock:
+            for text in texts:
+                key = text_key(text)
+                entry = self._entries.get(key)
+                if entry is None:
+                    results.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                results.append(entry[0])
+        hits = sum(result is not None for result in results)
+        self.counters.increment("hits", hits)
+        self.counters.increment("misses", len(results) - hits)
+        return results
+
+    def put(self, text: str, vector: Any):
+        """
+        Caches the vector of a text, evicting the least recently used entries if needed.
+
+        Args:
+            text (str): The text the vector was computed from.
+            vector (Any): The vector to cache.
+        """
+        nbytes = self.sizeof(vector)
+        if nbytes > self.max_bytes:
+            return
+        key = text_key(text)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (vector, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.counters.increment("evictions")
+
+    def clear(self):
+        """Removes all cached vectors."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Returns cache statistics.
+
+        Returns:
+            dict: Hits, misses, hit rate, evictions, number of entries and bytes used.
+        """
+        counts = self.counters.snapshot()
+        hits, misses = counts.get("hits", 0), counts.get("misses", 0)
+        with self._lock:
+            entries, used_bytes = len(self._entries), self._bytes
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hit_rate(hits, misses),
+            "evictions": counts.get("evictions", 0),
+            "entries": entries,
+            "bytes": used_bytes,
+            "max_bytes": self.max_bytes,
+        }
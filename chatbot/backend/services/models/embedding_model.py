@@ -1,59 +1,216 @@
+import os
+
 import numpy as np
-import torch
-from sentence_transformers import SentenceTransformer
-from pymilvus import model  # Ensure to import the correct module
+from dotenv import load_dotenv
+from scipy.sparse import csr_matrix, vstack
 
 from typing import List
 
+from chatbot.backend.services.executors import embedding_executor, run_in_executor
+from chatbot.backend.services.models.embedding_cache import EmbeddingCache
+from chatbot.backend.services.models.embedding_store import EMBEDDING_STORE_ENABLED, EmbeddingStore
+from chatbot.backend.services.models.sparse import csr_to_dicts
+from chatbot.backend.services.registry import registry
+
+load_dotenv(override=True)
+
+DENSE_MODEL_NAME = "BAAI/bge-large-en-v1.5"
+SPARSE_MODEL_NAME = "naver/splade-cocondenser-ensembledistil"
+
+# One of "torch", "onnx" or "onnx-int8"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def embedding_model_version(backend: str = EMBEDDING_BACKEND) -> str:
+    """
+    Identifies the models and backend that produce the embeddings.
+
+    Embeddings from different versions are not interchangeable, e.g. int8-quantized
+    ONNX outputs differ slightly from PyTorch ones.
+    """
+    return f"{DENSE_MODEL_NAME}+{SPARSE_MODEL_NAME}@{backend}"
+
+# Total memory budget of the embedding cache, split evenly between dense and sparse vectors
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+
+
+def _sparse_nbytes(row) -> int:
+    return row.data.nbytes + row.indices.nbytes + row.indptr.nbytes
+
+
 class EmbeddingModel:
-    def __init__(self):
-        self.dense_embedding_model = SentenceTransformer('BAAI/bge-large-en-v1.5')
-        self.dense_embedding_model.eval()
-        self.sparse_embedding_model = model.sparse.SpladeEmbeddingFunction(
-            model_name="naver/splade-cocondenser-ensembledistil",
-            device="cpu",
-        )
+    def __init__(self, cache_max_bytes: int = EMBEDDING_CACHE_MAX_BYTES, backend: str = EMBEDDING_BACKEND):
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend `{backend}`, expected one of {EMBEDDING_BACKENDS}")
+        self.backend = backend
+
+        # model libraries are imported here so that importing this module stays cheap
+        if backend == "torch":
+            from sentence_transformers import SentenceTransformer
+            from pymilvus import model  # Ensure to import the correct module
+
+            self.dense_embedding_model = SentenceTransformer(DENSE_MODEL_NAME)
+            self.dense_embedding_model.eval()
+            self.sparse_embedding_model = model.sparse.SpladeEmbeddingFunction(
+                model_name=SPARSE_MODEL_NAME,
+                device="cpu",
+            )
+        else:
+            from chatbot.backend.services.models.onnx_backend import (
+                OnnxDenseEncoder,
+                OnnxSpladeEncoder,
+                load_onnx_model,
+            )
+
+            quantize = backend == "onnx-int8"
+            self.dense_embedding_model = OnnxDenseEncoder(*load_onnx_model(DENSE_MODEL_NAME, "dense", quantize))
+            self.sparse_embedding_model = OnnxSpladeEncoder(*load_onnx_model(SPARSE_MODEL_NAME, "sparse", quantize))
+
+        # Dense vectors are cached as float32 arrays and sparse vectors as 1-row CSR matrices
+        self.dense_cache = EmbeddingCache(cache_max_bytes // 2, sizeof=lambda vector: vector.nbytes)
+        self.sparse_cache = EmbeddingCache(cache_max_bytes // 2, sizeof=_sparse_nbytes)
+        # Document embeddings also persist on disk across runs
+        self.store = EmbeddingStore.for_model(embedding_model_version(backend)) if EMBEDDING_STORE_ENABLED else None
+
+    @staticmethod
+    def _missing_texts(texts, cached):
+        """
+        Returns the distinct texts that are not cached, in order of first appearance.
+        """
+        return list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
 
-    def batch_encode_dense(self, texts):
+    def batch_encode_dense(self, texts, use_cache: bool = True):
         """
         Generates dense embeddings for texts.
 
+        Cached texts are served from the embedding cache; the rest are encoded in one batch.
+
         Args:
             texts (List[str]): A list of text strings to encode.
+            use_cache (bool): Whether to read and fill the in-memory embedding cache.
 
         Returns:
             List[List[float]]: A list of dense embeddings for each text.
         """
-        description_embeddings = self.dense_embedding_model.encode(texts, normalize_embeddings=True).tolist()
+        cached = self.dense_cache.get_many(texts) if use_cache else [None] * len(texts)
+        missing = self._missing_texts(texts, cached)
+        if missing:
+            encoded = self.dense_embedding_model.encode(missing, normalize_embeddings=True)
+            encoded = np.asarray(encoded, dtype=np.float32)
+            # copy rows so cached vectors do not keep the whole batch array alive
+            computed = {text: encoded[i].copy() for i, text in enumerate(missing)}
+            if use_cache:
+                for text, vector in computed.items():
+                    self.dense_cache.put(text, vector)
+            cached = [computed[text] if vector is None else vector for text, vector in zip(texts, cached)]
+
+        if not cached:
+            return []
+        description_embeddings = np.stack(cached).tolist()
         return description_embeddings
 
-    def batch_encode_sparse(self, texts):
+    def batch_encode_sparse(self, texts, use_cache: bool = True):
         """
         Generates sparse embeddings for texts.
 
+        Cached texts are served from the embedding cache; the rest are encoded in one batch.
+
         Args:
             texts (List[str]): A list of text strings to encode.
+            use_cache (bool): Whether to read and fill the in-memory embedding cache.
 
         Returns:
             Any: Sparse embeddings for each text.
         """
-        sparse_embeddings = self.sparse_embedding_model.encode_documents(texts)
+        if not texts:
+            return self.sparse_embedding_model.encode_documents(texts)
+
+        cached = self.sparse_cache.get_many(texts) if use_cache else [None] * len(texts)
+        missing = self._missing_texts(texts, cached)
+        if missing:
+            encoded = self.sparse_embedding_model.encode_documents(missing).tocsr()
+            computed = {text: encoded[i:i + 1] for i, text in enumerate(missing)}
+            if use_cache:
+                for text, row in computed.items():
+                    self.sparse_cache.put(text, row)
+            cached = [computed[text] if row is None else row for text, row in zip(texts, cached)]
+
+        sparse_embeddings = vstack(cached, format="csr")
         return sparse_embeddings
 
-    def encode_texts(self, texts):
+    def encode_texts(self, texts, persist: bool = False):
         """
         Generates both dense and sparse embeddings for texts.
 
         Args:
             texts (List[str]): A list of text strings to encode.
+            persist (bool): Whether the texts are documents rather than queries. Documents
+                are looked up in and added to the on-disk embedding store instead of the
+                in-memory cache, so that ingestion does not evict hot query embeddings.
 
         Returns:
             Tuple[List[List[float]], Any]: A tuple containing dense embeddings and sparse embeddings.
         """
-        dense_embeddings = self.batch_encode_dense(texts)
-        sparse_embeddings = self.batch_encode_sparse(texts)
+        if persist and self.store is not None and texts:
+            return self._encode_with_store(texts)
+        dense_embeddings = self.batch_encode_dense(texts, use_cache=not persist)
+        sparse_embeddings = self.batch_encode_sparse(texts, use_cache=not persist)
+        return dense_embeddings, sparse_embeddings
+
+    def _encode_with_store(self, texts):
+        """
+        Serves texts from the on-disk embedding store, encoding and storing the rest.
+        """
+        stored = self.store.get_many(texts)
+        missing = self._missing_texts(texts, stored)
+        if missing:
+            dense = np.asarray(self.batch_encode_dense(missing, use_cache=False), dtype=np.float32)
+            sparse = self.batch_encode_sparse(missing, use_cache=False).tocsr()
+            self.store.put_many(missing, dense, sparse)
+            computed = {
+                text: (dense[i], sparse.indices[sparse.indptr[i]:sparse.indptr[i + 1]],
+                       sparse.data[sparse.indptr[i]:sparse.indptr[i + 1]])
+                for i, text in enumerate(missing)
+            }
+            stored = [computed[text] if entry is None else entry for text, entry in zip(texts, stored)]
+
+        dense_embeddings = np.stack([entry[0] for entry in stored]).tolist()
+        lengths = [len(entry[1]) for entry in stored]
+        sparse_embeddings = csr_matrix(
+            (
+                np.concatenate([entry[2] for entry in stored]),
+                np.concatenate([entry[1] for entry in stored]),
+                np.concatenate([[0], np.cumsum(lengths)]),
+            ),
+            shape=(len(stored), self.store.sparse_dim),
+        )
         return dense_embeddings, sparse_embeddings
 
+    async def aencode_texts(self, texts):
+        """
+        Async version of `encode_texts` that encodes on the bounded embedding executor.
+
+        Args:
+            texts (List[str]): A list of text strings to encode.
+
+        Returns:
+            Tuple[List[List[float]], Any]: A tuple containing dense embeddings and sparse embeddings.
+        """
+        return await run_in_executor(embedding_executor, self.encode_texts, texts)
+
+    def cache_stats(self) -> dict:
+        """
+        Returns statistics of the dense and sparse query embedding caches and the on-disk document store.
+
+        Returns:
+            dict: Hit rate, entries and bytes used per cache.
+        """
+        stats = {"dense": self.dense_cache.stats(), "sparse": self.sparse_cache.stats()}
+        if self.store is not None:
+            stats["store"] = self.store.stats()
+        return stats
+
     def convert_sparse_embeddings(self, sparse_embeddings):
         """
         Converts sparse embeddings into an ingestable dictionary format.
@@ -64,22 +221,21 @@ class EmbeddingModel:
         Returns:
             List[Dict[int, float]]: A list of dictionaries representing sparse embeddings.
         """
-        return [
-            {j: float(sparse_embeddings[i, j]) for j in sparse_embeddings[[i], :].nonzero()[1].tolist()}
-            for i in range(sparse_embeddings.shape[0])
-        ]
+        return csr_to_dicts(sparse_embeddings)
     
-    def embed_documents(self, texts):
+    def embed_documents(self, texts, use_cache: bool = True):
         """
         Embeds documents using dense embeddings.
 
         Args:
             texts (List[str]): A list of text strings to embed.
+            use_cache (bool): Whether to use the in-memory embedding cache; bulk ingestion
+                callers pass False so one-off chunks do not evict cached queries.
 
         Returns:
             List[List[float]]: A list of dense embeddings for each document.
         """
-        return self.batch_encode_dense(texts)
+        return self.batch_encode_dense(texts, use_cache=use_cache)
 
-# Create an instance of the fused model
-embedding_model = EmbeddingModel()
+# Create an instance of the fused model on first use
+embedding_model = registry.register("embedding_model", EmbeddingModel)
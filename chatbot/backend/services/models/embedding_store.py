@@ -0,0 +1,401 @@
+"""
+Persistent on-disk store of document embeddings.
+
+Entries are keyed by the embedding model version and a hash of the text, so
+re-ingesting unchanged chunks reuses their embeddings instead of re-running the
+models. Each model version has its own directory holding:
+- `dense.f32`: a float32 matrix with one row per entry, read through a memory map
+- `sparse_indices.i32` / `sparse_data.f32`: the concatenated CSR rows of the sparse vectors
+- `index.sqlite3`: the text hash -> dense row / sparse offset index
+
+Vectors are only ever appended; `vacuum` rewrites the files without unused entries.
+Bytes of an append that crashed before its index update are cut off by the next write.
+A vacuum writes the next generation of the vector files, e.g. `dense.1.f32`, and
+switches to it in the same index transaction that remaps the entries, so a crash
+leaves either the old or the new generation in use; files of other generations are
+removed by the next vacuum.
+
+Usage:
+    python -m chatbot.backend.services.models.embedding_store stats
+    python -m chatbot.backend.services.models.embedding_store vacuum --max-age-days 90
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from chatbot.backend.services.metrics import Counters, hit_rate
+from chatbot.backend.services.models.embedding_cache import text_key
+
+load_dotenv(override=True)
+
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "chatbot/backend/embedding_store")
+EMBEDDING_STORE_ENABLED = os.getenv("EMBEDDING_STORE_ENABLED", "true").lower() == "true"
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+# (name, extension) of the dense, sparse indices and sparse data files
+_VECTOR_FILES = (("dense", "f32"), ("sparse_indices", "i32"), ("sparse_data", "f32"))
+_VECTOR_FILE_PATTERN = re.compile(r"^(dense|sparse_indices|sparse_data)(\.\d+)?\.(f32|i32)(\.tmp)?$")
+
+# (dense vector, sparse indices, sparse weights) of one text
+StoredEmbedding = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _read_array(path: str, dtype) -> np.ndarray:
+    """
+    Memory-maps a flat binary array, returning an empty array for a missing or empty file.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class EmbeddingStore:
+    """
+    Append-only embedding store of one model version.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, "index.sqlite3")
+        self.counters = Counters()
+        self._lock = threading.Lock()
+        self._maps = None
+        with self._db() as db:
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    text_hash BLOB PRIMARY KEY,
+                    dense_row INTEGER NOT NULL,
+                    sparse_offset INTEGER NOT NULL,
+                    sparse_length INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    @classmethod
+    def for_model(cls, model_version: str, directory: str = EMBEDDING_STORE_DIR) -> "EmbeddingStore":
+        """
+        Opens the store of an embedding model version.
+        """
+        return cls(os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_version)))
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.index_path)
+        try:
+            with db:  # commits, or rolls back on error
+                yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """
+        Serializes writers across processes, e.g. several ingestion workers. Readers take
+        the lock shared, so a vacuum never removes files they are about to map.
+        """
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _meta(self, db, key: str) -> Optional[int]:
+        row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _paths(self, generation: int) -> Tuple[str, str, str]:
+        """
+        Returns the dense, sparse indices and sparse data paths of a generation of the vector files.
+        """
+        suffix = f".{generation}" if generation else ""
+        return tuple(os.path.join(self.directory, f"{name}{suffix}.{ext}") for name, ext in _VECTOR_FILES)
+
+    def _current_paths(self, db) -> Tuple[str, str, str]:
+        return self._paths(self._meta(db, "generation") or 0)
+
+    def _remove_stale_files(self, paths: Tuple[str, str, str]):
+        """
+        Deletes vector files other than `paths`, left behind by vacuums. Must be called under the file lock.
+        """
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if _VECTOR_FILE_PATTERN.match(name) and path not in paths:
+                os.remove(path)
+
+    @property
+    def dim(self) -> Optional[int]:
+        with self._db() as db:
+            return self._meta(db, "dim")
+
+    @property
+    def sparse_dim(self) -> Optional[int]:
+        with self._db() as db:
+            return self._meta(db, "sparse_dim")
+
+    def _arrays(self, dim: int, paths: Tuple[str, str, str]):
+        """
+        Returns memory maps of the vector files, reopened if the files grew or were
+        replaced by a vacuum since they were mapped.
+        """
+        dense_path, indices_path, data_path = paths
+        key = (paths, tuple(os.path.getsize(path) if os.path.exists(path) else 0 for path in paths))
+        if self._maps is None or self._maps[0] != key:
+            dense = _read_array(dense_path, np.float32)
+            # a concurrent or interrupted append may have left a partial last row
+            dense = dense[:len(dense) // dim * dim].reshape(-1, dim)
+            self._maps = (key, dense, _read_array(indices_path, np.int32), _read_array(data_path, np.float32))
+        return self._maps[1:]
+
+    def _truncate_uncommitted(self, db, dim: int, paths: Tuple[str, str, str]):
+        """
+        Cuts the vector files back to the lengths recorded in the index.
+
+        Bytes past them were written by an append whose index update never committed,
+        e.g. after a crash. Appending after them would misalign the offsets of every
+        later entry. Must be called under the file lock.
+        """
+        rows, nnz = db.execute(
+            "SELECT COALESCE(MAX(dense_row) + 1, 0), COALESCE(MAX(sparse_offset + sparse_length), 0) FROM entries"
+        ).fetchone()
+        truncated = False
+        for path, length in zip(paths, (rows * dim * 4, nnz * 4, nnz * 4)):
+            if os.path.exists(path) and os.path.getsize(path) > length:
+                os.truncate(path, length)
+                truncated = True
+        if truncated:
+            self._maps = None
+            self.counters.increment("truncations")
+        return rows, nnz
+
+    def get_many(self, texts: List[str]) -> List[Optional[StoredEmbedding]]:
+        """
+        Looks up the embeddings of texts.
+
+        Args:
+            texts (List[str]): The texts to look up.
+
+        Returns:
+            List[Optional[StoredEmbedding]]: The (dense, sparse indices, sparse weights) of each
+            text, or None if it is not stored.
+        """
+        keys = [text_key(text) for text in texts]
+        found = {}
+        with self._lock, self._file_lock(shared=True), self._db() as db:
+            dim = self._meta(db, "dim")
+            if dim is None:
+                self.counters.increment("misses", len(texts))
+                return [None] * len(texts)
+            distinct = list(dict.fromkeys(keys))
+            for start in range(0, len(distinct), _SQL_BATCH):
+                batch = distinct[start:start + _SQL_BATCH]
+                placeholders = ", ".join("?" for _ in batch)
+                found.update(
+                    (row[0], row[1:]) for row in db.execute(
+                        "SELECT text_hash, dense_row, sparse_offset, sparse_length "
+                        f"FROM entries WHERE text_hash IN ({placeholders})",
+                        batch,
+                    )
+                )
+                db.execute(
+                    f"UPDATE entries SET last_used = ? WHERE text_hash IN ({placeholders})",
+                    [time.time(), *batch],
+                )
+            dense, indices, data = self._arrays(dim, self._current_paths(db))
+
+        results = []
+        for key in keys:
+            entry = found.get(key)
+            if entry is None:
+                results.append(None)
+                continue
+            row, offset, length = entry
+            results.append((
+                np.array(dense[row]),
+                np.array(indices[offset:offset + length]),
+                np.array(data[offset:offset + length]),
+            ))
+        hits = sum(result is not None for result in results)
+        self.counters.increment("hits", hits)
+        self.counters.increment("misses", len(results) - hits)
+        return results
+
+    def put_many(self, texts: List[str], dense: np.ndarray, sparse):
+        """
+        Stores the embeddings of texts, skipping texts that are already stored.
+
+        Args:
+            texts (List[str]): The embedded texts.
+            dense (np.ndarray): Dense embeddings, one row per text.
+            sparse (Any): Sparse embeddings as a CSR matrix, one row per text.
+        """
+        if not texts:
+            return
+        dense = np.ascontiguousarray(dense, dtype=np.float32)
+        sparse = sparse.tocsr()
+        with self._lock, self._file_lock(), self._db() as db:
+            dim = self._meta(db, "dim")
+            if dim is None:
+                dim = dense.shape[1]
+                db.execute("INSERT INTO meta VALUES ('dim', ?)", (json.dumps(dim),))
+                db.execute("INSERT INTO meta VALUES ('sparse_dim', ?)", (json.dumps(sparse.shape[1]),))
+            elif dense.shape[1] != dim:
+                raise ValueError(f"Expected dense embeddings of dimension {dim}, got {dense.shape[1]}")
+
+            keys = [text_key(text) for text in texts]
+            existing = set()
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ", ".join("?" for _ in batch)
+                existing.update(
+                    row[0] for row in db.execute(f"SELECT text_hash FROM entries WHERE text_hash IN ({placeholders})", batch)
+                )
+            first_index = {}
+            for i, key in enumerate(keys):
+                first_index.setdefault(key, i)
+            new = [i for key, i in first_index.items() if key not in existing]
+            if not new:
+                return
+
+            # appends start where the committed entries end, dropping bytes of interrupted writes
+            paths = self._current_paths(db)
+            first_row, offset = self._truncate_uncommitted(db, dim, paths)
+            entries, now = [], time.time()
+            dense_path, indices_path, data_path = paths
+            with open(dense_path, "ab") as dense_file, open(indices_path, "ab") as indices_file, \
+                    open(data_path, "ab") as data_file:
+                dense[new].tofile(dense_file)
+                for n, i in enumerate(new):
+                    start, end = sparse.indptr[i], sparse.indptr[i + 1]
+                    sparse.indices[start:end].astype(np.int32).tofile(indices_file)
+                    sparse.data[start:end].astype(np.float32).tofile(data_file)
+                    entries.append((keys[i], first_row + n, offset, int(end - start), now))
+                    offset += int(end - start)
+            db.executemany("INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?)", entries)
+            self.counters.increment("writes", len(entries))
+
+    def stats(self) -> dict:
+        """
+        Returns the number of entries, bytes on disk, and the hit rate since startup.
+
+        Returns:
+            dict: Entry count, file sizes, bytes held by deleted or orphaned vectors, and hit rate.
+        """
+        with self._db() as db:
+            entries, nnz = db.execute("SELECT COUNT(*), COALESCE(SUM(sparse_length), 0) FROM entries").fetchone()
+            dim = self._meta(db, "dim") or 0
+            paths = self._current_paths(db)
+        sizes = {
+            name: os.path.getsize(path) if os.path.exists(path) else 0
+            for name, path in zip(("dense", "sparse_indices", "sparse_data", "index"), paths + (self.index_path,))
+        }
+        live_bytes = entries * dim * 4 + nnz * 8
+        counts = self.counters.snapshot()
+        return {
+            "directory": self.directory,
+            "entries": entries,
+            "bytes": sizes,
+            "reclaimable_bytes": max(0, sizes["dense"] + sizes["sparse_indices"] + sizes["sparse_data"] - live_bytes),
+            "hits": counts.get("hits", 0),
+            "misses": counts.get("misses", 0),
+            "hit_rate": hit_rate(counts.get("hits", 0), counts.get("misses", 0)),
+        }
+
+    def vacuum(self, max_age_days: Optional[float] = None) -> dict:
+        """
+        Rewrites the store without entries unused for `max_age_days` and without orphaned vectors.
+
+        Returns:
+            dict: The number of removed entries and the bytes reclaimed.
+        """
+        before = self.stats()
+        with self._lock, self._file_lock():
+            with self._db() as db:
+                dim = self._meta(db, "dim")
+                if dim is None:
+                    return {"removed": 0, "reclaimed_bytes": 0}
+                generation = self._meta(db, "generation") or 0
+                paths = self._paths(generation)
+                self._truncate_uncommitted(db, dim, paths)
+                removed = 0
+                if max_age_days is not None:
+                    cutoff = time.time() - max_age_days * 86400
+                    removed = db.execute("DELETE FROM entries WHERE last_used < ?", (cutoff,)).rowcount
+
+                dense, indices, data = self._arrays(dim, paths)
+                rows = db.execute(
+                    "SELECT text_hash, dense_row, sparse_offset, sparse_length FROM entries ORDER BY dense_row"
+                ).fetchall()
+                # the next generation is written next to the current one, which stays in use
+                # until the transaction below commits
+                paths = self._paths(generation + 1)
+                updates, offset = [], 0
+                with open(paths[0], "wb") as dense_file, open(paths[1], "wb") as indices_file, \
+                        open(paths[2], "wb") as data_file:
+                    for new_row, (key, row, start, length) in enumerate(rows):
+                        dense[row].tofile(dense_file)
+                        indices[start:start + length].tofile(indices_file)
+                        data[start:start + length].tofile(data_file)
+                        updates.append((new_row, offset, key))
+                        offset += length
+                    for f in (dense_file, indices_file, data_file):
+                        f.flush()
+                        os.fsync(f.fileno())
+                db.executemany("UPDATE entries SET dense_row = ?, sparse_offset = ? WHERE text_hash = ?", updates)
+                db.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (json.dumps(generation + 1),))
+            # committed: readers switch to the new files, and the shared lock keeps them from
+            # mapping the old ones while they are removed
+            self._maps = None
+            self._remove_stale_files(paths)
+        db = sqlite3.connect(self.index_path)
+        db.execute("VACUUM")
+        db.close()
+
+        after = self.stats()
+        return {
+            "removed": removed,
+            "reclaimed_bytes": sum(before["bytes"].values()) - sum(after["bytes"].values()),
+        }
+
+
+def main(args):
+    from chatbot.backend.services.models.embedding_model import EMBEDDING_BACKEND, embedding_model_version
+
+    current = re.sub(r"[^A-Za-z0-9_.-]+", "_", embedding_model_version(EMBEDDING_BACKEND))
+    versions = sorted(os.listdir(args.directory)) if os.path.isdir(args.directory) else []
+    for version in versions:
+        path = os.path.join(args.directory, version)
+        if args.command == "vacuum" and version != current and not args.keep_other_versions:
+            shutil.rmtree(path)
+            print(f"Removed store of other model version {version}")
+            continue
+        store = EmbeddingStore(path)
+        if args.command == "vacuum":
+            print(f"{version}: {store.vacuum(args.max_age_days)}")
+        print(f"{version}{' (current)' if version == current else ''}: {json.dumps(store.stats(), indent=2)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or compact the on-disk embedding store")
+    parser.add_argument("command", choices=["stats", "vacuum"])
+    parser.add_argument("--directory", default=EMBEDDING_STORE_DIR)
+    parser.add_argument("--max-age-days", type=float, help="vacuum: also drop entries unused for this long")
+    parser.add_argument("--keep-other-versions", action="store_true",
+                        help="vacuum: keep the stores of model versions other than the current one")
+    main(parser.parse_args())
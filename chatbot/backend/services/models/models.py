@@ -9,6 +9,7 @@ from typing import List
 from PIL import Image
 
 from chatbot.backend.prompts.vlm_prompts import IMAGE_SUMMARY_PROMPT, FILTER_IMAGE_PROMPT, RELEVANCE_CLASSIFICATION_PROMPT
+from chatbot.backend.services.registry import registry
 
 class VLM:
     def __init__(self):
@@ -125,4 +126,4 @@ class VLM:
                 summaries.append(summary)
         return summaries
     
-vlm = VLM()
\ No newline at end of file
+vlm = registry.register("vlm", VLM)
\ No newline at end of file
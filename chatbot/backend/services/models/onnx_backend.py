@@ -0,0 +1,197 @@
+"""
+ONNX Runtime backend for the BGE dense and SPLADE sparse encoders.
+
+Models are exported from their Hugging Face checkpoints on first use and can
+optionally be dynamically quantized to int8, which is considerably faster than the
+fp32 PyTorch forward pass on CPU-only hosts. The encoders mirror the interfaces of
+`SentenceTransformer.encode` and `SpladeEmbeddingFunction.encode_documents` so that
+`EmbeddingModel` can use either backend interchangeably.
+"""
+
+import os
+from typing import List
+
+import numpy as np
+import onnxruntime as ort
+import torch
+from dotenv import load_dotenv
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from scipy.sparse import csr_array, vstack
+from transformers import AutoModel, AutoModelForMaskedLM, AutoTokenizer
+
+from chatbot.backend.services.logger import logger
+
+load_dotenv(override=True)
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "chatbot/backend/models_onnx")
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", 0))  # 0 lets ORT decide
+
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+def export_onnx_model(model_name: str, kind: str, output_dir: str) -> str:
+    """
+    Exports a Hugging Face encoder to ONNX with dynamic batch and sequence axes.
+
+    Args:
+        model_name (str): Hugging Face model id.
+        kind (str): "dense" exports the encoder's last hidden state, "sparse" the masked-LM logits.
+        output_dir (str): Directory for the exported model and its tokenizer.
+
+    Returns:
+        str: Path to the exported fp32 model.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, "model.onnx")
+    output_name = "last_hidden_state" if kind == "dense" else "logits"
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model_class = AutoModel if kind == "dense" else AutoModelForMaskedLM
+    model = model_class.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES + [output_name]}
+
+    logger.info(f"Exporting {model_name} to {output_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in INPUT_NAMES),
+            output_path,
+            input_names=INPUT_NAMES,
+            output_names=[output_name],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    tokenizer.save_pretrained(output_dir)
+    return output_path
+
+
+def quantize_onnx_model(model_path: str) -> str:
+    """
+    Applies dynamic int8 weight quantization to an exported model.
+
+    Args:
+        model_path (str): Path to the fp32 ONNX model.
+
+    Returns:
+        str: Path to the quantized model.
+    """
+    quantized_path = model_path.replace(".onnx", "_int8.onnx")
+    logger.info(f"Quantizing {model_path} to {quantized_path}")
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def load_onnx_model(model_name: str, kind: str, quantize: bool = False):
+    """
+    Loads an ONNX session and tokenizer, exporting and quantizing the model if needed.
+
+    Args:
+        model_name (str): Hugging Face model id.
+        kind (str): "dense" or "sparse".
+        quantize (bool): Whether to use the int8 quantized model.
+
+    Returns:
+        Tuple[ort.InferenceSession, PreTrainedTokenizer]: The session and tokenizer.
+    """
+    model_dir = os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "__"))
+    model_path = os.path.join(model_dir, "model.onnx")
+    if not os.path.exists(model_path):
+        export_onnx_model(model_name, kind, model_dir)
+    if quantize:
+        quantized_path = model_path.replace(".onnx", "_int8.onnx")
+        model_path = quantized_path if os.path.exists(quantized_path) else quantize_onnx_model(model_path)
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if ONNX_INTRA_OP_THREADS:
+        options.intra_op_num_threads = ONNX_INTRA_OP_THREADS
+    session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    return session, tokenizer
+
+
+class OnnxEncoder:
+    """Shared tokenization and batching for the ONNX encoders."""
+
+    def __init__(self, session, tokenizer, batch_size: int, max_length: int = 512):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.input_names = {model_input.name for model_input in session.get_inputs()}
+
+    def _run(self, texts: List[str]):
+        """
+        Tokenizes and runs the model over texts in batches.
+
+        Yields:
+            Tuple[np.ndarray, np.ndarray]: The first model output and attention mask of each batch.
+        """
+        for start in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            feeds = {
+                name: encoded[name].astype(np.int64)
+                for name in INPUT_NAMES
+                if name in self.input_names and name in encoded
+            }
+            yield self.session.run(None, feeds)[0], encoded["attention_mask"]
+
+
+class OnnxDenseEncoder(OnnxEncoder):
+    """BGE encoder using CLS pooling, matching the sentence-transformers configuration."""
+
+    def __init__(self, session, tokenizer, batch_size: int = 32, max_length: int = 512):
+        super().__init__(session, tokenizer, batch_size, max_length)
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True) -> np.ndarray:
+        """
+        Generates dense embeddings for texts.
+
+        Args:
+            texts (List[str]): A non-empty list of text strings to encode.
+            normalize_embeddings (bool): Whether to L2-normalize the embeddings.
+
+        Returns:
+            np.ndarray: A float32 matrix with one embedding per row.
+        """
+        embeddings = np.concatenate(
+            [hidden_state[:, 0] for hidden_state, _ in self._run(texts)]
+        ).astype(np.float32)
+        if normalize_embeddings:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True).clip(min=1e-12)
+        return embeddings
+
+
+class OnnxSpladeEncoder(OnnxEncoder):
+    """SPLADE encoder computing max-pooled log(1 + relu(logits)) term weights."""
+
+    # logits are (batch, sequence, vocabulary), so keep batches small to bound memory
+    def __init__(self, session, tokenizer, batch_size: int = 8, max_length: int = 512):
+        super().__init__(session, tokenizer, batch_size, max_length)
+
+    def encode_documents(self, texts: List[str]) -> csr_array:
+        """
+        Generates sparse embeddings for texts.
+
+        Args:
+            texts (List[str]): A list of text strings to encode.
+
+        Returns:
+            csr_array: Sparse term weights with one row per text.
+        """
+        if not texts:
+            return csr_array((0, len(self.tokenizer)), dtype=np.float32)
+        rows = []
+        for logits, attention_mask in self._run(texts):
+            activations = np.log1p(np.maximum(logits, 0)) * attention_mask[:, :, None]
+            rows.append(csr_array(activations.max(axis=1).astype(np.float32)))
+        return csr_array(vstack(rows, format="csr"))
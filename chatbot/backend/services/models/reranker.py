@@ -0,0 +1,55 @@
+"""
+CPU cross-encoder used to rerank retrieval candidates.
+"""
+
+import os
+from typing import List
+
+from dotenv import load_dotenv
+
+from chatbot.backend.services.registry import registry
+
+load_dotenv(override=True)
+
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANKER_MAX_LENGTH = int(os.getenv("RERANKER_MAX_LENGTH", 512))
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, passage) pairs jointly with a cross-encoder.
+
+    Cross-encoders are far more accurate than the bi-encoder similarity used for the
+    first retrieval stage but cost a forward pass per pair, so they are only applied
+    to the candidate set.
+    """
+
+    def __init__(self, model_name: str = RERANKER_MODEL, max_length: int = RERANKER_MAX_LENGTH):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+
+    def score(self, query: str, passages: List[str], batch_size: int = 16) -> List[float]:
+        """
+        Scores passages against a query.
+
+        Args:
+            query (str): The user query.
+            passages (List[str]): The candidate passages.
+            batch_size (int): Number of pairs per forward pass.
+
+        Returns:
+            List[float]: Relevance score of each passage, higher is more relevant.
+        """
+        if not passages:
+            return []
+        scores = self.model.predict(
+            [(query, passage) for passage in passages],
+            batch_size=batch_size,
+            show_progress_bar=False,
+        )
+        return [float(score) for score in scores]
+
+
+reranker = registry.register("reranker", CrossEncoderReranker)
@@ -0,0 +1,35 @@
+"""
+Conversion of sparse embeddings into the dictionary format accepted by Milvus.
+"""
+
+from typing import Dict, List
+
+
+def csr_to_dicts(sparse_embeddings) -> List[Dict[int, float]]:
+    """
+    Converts a sparse matrix into one {index: weight} dictionary per row.
+
+    Works directly on the CSR `indptr`/`indices`/`data` arrays, converting them to
+    Python lists once and slicing each row out of them, instead of indexing the
+    matrix element by element.
+
+    Args:
+        sparse_embeddings (Any): A scipy sparse matrix or array with one embedding per row.
+
+    Returns:
+        List[Dict[int, float]]: A list of dictionaries representing sparse embeddings.
+    """
+    csr = sparse_embeddings.tocsr()
+    if not csr.has_canonical_format or not csr.data.all():
+        # merge duplicate entries and drop explicitly stored zeros without touching the input
+        csr = csr.copy()
+        csr.sum_duplicates()
+        csr.eliminate_zeros()
+
+    indptr = csr.indptr.tolist()
+    indices = csr.indices.tolist()
+    data = csr.data.tolist()
+    return [
+        dict(zip(indices[start:end], data[start:end]))
+        for start, end in zip(indptr[:-1], indptr[1:])
+    ]
@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+from chatbot.backend.services.models.embedding_batcher import EmbeddingBatcher
+
+
+class FakeEmbeddingModel:
+    """Encodes each text as its length; blocks the first batch until released."""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.fail_on = fail_on
+
+    def encode_texts(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        if self.fail_on in texts:
+            raise RuntimeError("encoding failed")
+        return [[len(text)] for text in texts], [f"sparse:{text}" for text in texts]
+
+
+def test_concurrent_requests_share_a_batch_and_get_their_own_rows():
+    model = FakeEmbeddingModel()
+    batcher = EmbeddingBatcher(model, window_ms=50, max_batch_size=32)
+    first = batcher.submit(["a"])
+    assert model.started.wait(5)
+    # queued while the first batch is running, so they are collected together
+    second = batcher.submit(["bb", "ccc"])
+    third = batcher.submit(["dddd"])
+    model.release.set()
+
+    assert first.result(5) == ([[1]], ["sparse:a"])
+    assert second.result(5) == ([[2], [3]], ["sparse:bb", "sparse:ccc"])
+    assert third.result(5) == ([[4]], ["sparse:dddd"])
+    assert model.batches == [["a"], ["bb", "ccc", "dddd"]]
+    assert batcher.stats()["batches"] == 2
+
+
+def test_batch_is_closed_once_full():
+    model = FakeEmbeddingModel()
+    batcher = EmbeddingBatcher(model, window_ms=50, max_batch_size=2)
+    first = batcher.submit(["a"])
+    assert model.started.wait(5)
+    futures = [batcher.submit([text]) for text in ("b", "c", "d")]
+    model.release.set()
+
+    for future in [first, *futures]:
+        future.result(5)
+    assert model.batches == [["a"], ["b", "c"], ["d"]]
+
+
+def test_cancelled_requests_are_dropped_from_the_batch():
+    model = FakeEmbeddingModel()
+    batcher = EmbeddingBatcher(model, window_ms=50, max_batch_size=32)
+    first = batcher.submit(["a"])
+    assert model.started.wait(5)
+    cancelled = batcher.submit(["dropped"])
+    kept = batcher.submit(["kept"])
+    assert cancelled.cancel()
+    model.release.set()
+
+    assert kept.result(5) == ([[4]], ["sparse:kept"])
+    first.result(5)
+    with pytest.raises(CancelledError):
+        cancelled.result()
+    assert all("dropped" not in batch for batch in model.batches)
+    assert batcher.stats()["cancelled"] == 1
+
+
+def test_failed_batch_fails_its_requests_and_the_worker_keeps_running():
+    model = FakeEmbeddingModel(fail_on="bad")
+    model.release.set()
+    batcher = EmbeddingBatcher(model, window_ms=1, max_batch_size=32)
+
+    with pytest.raises(RuntimeError):
+        batcher.encode_texts(["bad"])
+    assert batcher.encode_texts(["ok"]) == ([[2]], ["sparse:ok"])
@@ -0,0 +1,104 @@
+import os
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from chatbot.backend.services.models.embedding_store import EmbeddingStore
+
+
+def embeddings(texts):
+    """Dense rows filled with the text length and one sparse weight per character."""
+    dense = np.array([[len(text)] * 4 for text in texts], dtype=np.float32)
+    rows, cols, data = [], [], []
+    for row, text in enumerate(texts):
+        for col, char in enumerate(text):
+            rows.append(row)
+            cols.append(col)
+            data.append(float(ord(char)))
+    return dense, csr_matrix((data, (rows, cols)), shape=(len(texts), 16))
+
+
+def put(store, texts):
+    store.put_many(texts, *embeddings(texts))
+
+
+def assert_stored(store, text):
+    dense, indices, data = store.get_many([text])[0]
+    assert dense.tolist() == [len(text)] * 4
+    assert indices.tolist() == list(range(len(text)))
+    assert data.tolist() == [float(ord(char)) for char in text]
+
+
+def test_put_and_get_round_trip(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    put(store, ["ab", "cde"])
+
+    assert_stored(store, "ab")
+    assert_stored(store, "cde")
+    assert store.get_many(["missing"]) == [None]
+    assert (store.dim, store.sparse_dim) == (4, 16)
+    # the store is reopened from disk
+    assert_stored(EmbeddingStore(str(tmp_path)), "cde")
+
+
+def test_stored_texts_are_not_written_again(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    put(store, ["ab", "ab"])
+    size = os.path.getsize(tmp_path / "dense.f32")
+
+    put(store, ["ab"])
+
+    assert os.path.getsize(tmp_path / "dense.f32") == size == 4 * 4
+    assert store.stats()["entries"] == 1
+
+
+def test_bytes_of_an_interrupted_append_are_cut_off(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    put(store, ["ab"])
+    # an append that crashed before its index update
+    for name in ("dense.f32", "sparse_indices.i32", "sparse_data.f32"):
+        with open(tmp_path / name, "ab") as f:
+            f.write(b"\x01\x02\x03\x04\x05")
+
+    put(store, ["xyz"])
+
+    assert_stored(store, "ab")
+    assert_stored(store, "xyz")
+    assert os.path.getsize(tmp_path / "dense.f32") == 2 * 4 * 4
+    assert store.counters.snapshot()["truncations"] == 1
+
+
+def test_vacuum_drops_unused_entries_and_switches_generation(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    put(store, ["old", "kept"])
+    store.get_many(["kept"])
+    # "old" was last used 10 days ago
+    with store._db() as db:
+        db.execute("UPDATE entries SET last_used = ? WHERE dense_row = 0", (time.time() - 10 * 86400,))
+
+    result = store.vacuum(max_age_days=1)
+
+    assert result["removed"] == 1 and result["reclaimed_bytes"] > 0
+    assert store.get_many(["old"]) == [None]
+    assert_stored(store, "kept")
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("dense")) == ["dense.1.f32"]
+
+    # appends go to the new generation, and the next vacuum moves on again
+    put(store, ["new"])
+    store.vacuum()
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("dense")) == ["dense.2.f32"]
+    assert_stored(store, "kept")
+    assert_stored(EmbeddingStore(str(tmp_path)), "new")
+
+
+def test_vacuum_interrupted_before_commit_keeps_the_current_generation(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    put(store, ["ab"])
+    # the next generation was written, but the crash happened before the index switched to it
+    with open(tmp_path / "dense.1.f32", "wb") as f:
+        f.write(b"partial")
+
+    assert_stored(EmbeddingStore(str(tmp_path)), "ab")
+    store.vacuum()
+    assert_stored(store, "ab")
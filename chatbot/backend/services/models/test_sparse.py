@@ -0,0 +1,31 @@
+import numpy as np
+from scipy.sparse import coo_matrix, csr_array, csr_matrix
+
+from chatbot.backend.services.models.sparse import csr_to_dicts
+
+
+def test_rows_become_index_weight_dicts():
+    matrix = csr_matrix(np.array([[0.0, 0.5, 0.0], [0.0, 0.0, 0.0], [1.5, 0.0, 2.0]], dtype=np.float32))
+
+    assert csr_to_dicts(matrix) == [{1: 0.5}, {}, {0: 1.5, 2: 2.0}]
+
+
+def test_accepts_sparse_arrays_and_other_formats():
+    dense = np.array([[0.0, 3.0], [4.0, 0.0]])
+
+    assert csr_to_dicts(csr_array(dense)) == [{1: 3.0}, {0: 4.0}]
+    assert csr_to_dicts(coo_matrix(dense)) == [{1: 3.0}, {0: 4.0}]
+
+
+def test_duplicates_are_summed_and_explicit_zeros_dropped_without_changing_the_input():
+    matrix = csr_matrix((np.array([1.0, 2.0, 0.0]), np.array([1, 1, 2]), np.array([0, 3])), shape=(1, 3))
+
+    assert csr_to_dicts(matrix) == [{1: 3.0}]
+    assert matrix.nnz == 3
+
+
+def test_keys_and_values_are_python_numbers():
+    (row,) = csr_to_dicts(csr_matrix(np.array([[0.0, 0.25]], dtype=np.float32)))
+    (index, weight), = row.items()
+
+    assert type(index) is int and type(weight) is float
@@ -0,0 +1,176 @@
+"""
+Lazily initialized components and their startup lifecycle.
+
+Expensive singletons (models, database clients) are registered as `LazyComponent`
+proxies that build the underlying object on first attribute access, so importing a
+module no longer loads models or opens connections. The registry tracks the state
+and timings of every component and can warm them up in the background at startup.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from chatbot.backend.services.logger import logger
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+class LazyComponent:
+    """
+    Proxy that builds its target with `factory` on first use and forwards attribute access to it.
+
+    Concurrent first accesses block until the single construction finishes. If the
+    factory raises, the error is recorded and the next access retries.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.RLock())
+        object.__setattr__(self, "_state", PENDING)
+        object.__setattr__(self, "_init_seconds", None)
+        object.__setattr__(self, "_error", None)
+
+    def resolve(self) -> Any:
+        """
+        Returns the underlying object, building it if needed.
+        """
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                object.__setattr__(self, "_state", LOADING)
+                start = time.perf_counter()
+                try:
+                    instance = self._factory()
+                except Exception as e:
+                    object.__setattr__(self, "_state", FAILED)
+                    object.__setattr__(self, "_error", str(e))
+                    logger.error(f"Failed to initialize `{self._name}`: {e}")
+                    raise
+                object.__setattr__(self, "_init_seconds", time.perf_counter() - start)
+                object.__setattr__(self, "_instance", instance)
+                object.__setattr__(self, "_state", READY)
+                object.__setattr__(self, "_error", None)
+                logger.info(f"Initialized `{self._name}` in {self._init_seconds:.2f}s")
+            return self._instance
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Returns the state, initialization time and last error of the component.
+        """
+        return {
+            "state": self._state,
+            "init_s": round(self._init_seconds, 3) if self._init_seconds is not None else None,
+            "error": self._error,
+        }
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.resolve(), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self.resolve(), attr, value)
+
+    def __repr__(self) -> str:
+        return f"<LazyComponent {self._name} ({self._state})>"
+
+
+class ComponentRegistry:
+    """Keeps track of lazy components and module import timings."""
+
+    def __init__(self):
+        self._components: Dict[str, LazyComponent] = {}
+        self._import_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._warm_up_thread: Optional[threading.Thread] = None
+        self._warm_up_done = threading.Event()
+        self._warm_up_names: List[str] = []
+
+    def register(self, name: str, factory: Callable[[], Any]) -> LazyComponent:
+        """
+        Registers a component without building it.
+
+        Args:
+            name (str): Unique name of the component.
+            factory (Callable[[], Any]): Builds the component.
+
+        Returns:
+            LazyComponent: A proxy that can be used in place of the component.
+        """
+        component = LazyComponent(name, factory)
+        with self._lock:
+            self._components[name] = component
+        return component
+
+    @contextmanager
+    def time_import(self, name: str):
+        """
+        Records how long the enclosed imports take under `name`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._import_seconds[name] = time.perf_counter() - start
+
+    def warm_up(self, names: Optional[List[str]] = None):
+        """
+        Builds components in registration order, logging failures instead of raising.
+
+        Args:
+            names (List[str], optional): Components to build; all registered components by default.
+        """
+        with self._lock:
+            self._warm_up_names = [
+                name for name in self._components if names is None or name in names
+            ]
+            components = [self._components[name] for name in self._warm_up_names]
+        start = time.perf_counter()
+        for component in components:
+            try:
+                component.resolve()
+            except Exception:
+                continue  # already logged, the component retries on next access
+        logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s")
+        self._warm_up_done.set()
+
+    def warm_up_in_background(self, names: Optional[List[str]] = None):
+        """
+        Starts `warm_up` on a daemon thread so the server can accept requests meanwhile.
+        """
+        self._warm_up_thread = threading.Thread(
+            target=self.warm_up, args=(names,), name="component-warm-up", daemon=True
+        )
+        self._warm_up_thread.start()
+
+    def ready(self) -> bool:
+        """
+        Returns whether warm-up has finished and every warmed component is ready.
+
+        Components left out of warm-up are built on first use and do not affect readiness.
+        """
+        if not self._warm_up_done.is_set():
+            return False
+        with self._lock:
+            components = [self._components[name] for name in self._warm_up_names]
+        return all(component.status()["state"] == READY for component in components)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Returns readiness, per-component state and timings, and module import timings.
+        """
+        with self._lock:
+            components = dict(self._components)
+        return {
+            "ready": self.ready(),
+            "warm_up_done": self._warm_up_done.is_set(),
+            "components": {name: component.status() for name, component in components.items()},
+            "imports_s": {name: round(seconds, 3) for name, seconds in self._import_seconds.items()},
+        }
+
+
+registry = ComponentRegistry()
@@ -0,0 +1,171 @@
+"""
+Storage backend interface behind `VectorDB`.
+
+A backend stores rows of the collection `SCHEMA` and answers hybrid searches with
+dense and sparse query vectors. `VectorDB` handles query encoding, batching and
+corpus listeners, so backends only deal with vectors and rows.
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from chatbot.backend.services.vector_db.partitions import DEFAULT_PARTITION
+from chatbot.backend.services.vector_db.results import RetrievalResult
+from chatbot.backend.services.vector_db.schema import SCHEMA
+
+# Fields supplied on insert, in schema order; the primary key is generated
+INSERT_FIELDS = [field.name for field in SCHEMA.fields if not field.auto_id]
+
+
+def rows_from_data(data) -> List[Dict]:
+    """
+    Converts insert data into one dictionary per row.
+
+    Args:
+        data (Any): Either a list of row dictionaries or a list of columns in `INSERT_FIELDS` order,
+            as accepted by `Collection.insert`.
+
+    Returns:
+        List[Dict]: The rows.
+    """
+    if not data:
+        return []
+    if isinstance(data[0], dict):
+        return list(data)
+    return [dict(zip(INSERT_FIELDS, values)) for values in zip(*data)]
+
+
+class VectorStoreBackend(ABC):
+    """
+    A collection that supports inserts, deletes and hybrid dense + sparse search.
+    """
+
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+
+    @abstractmethod
+    def insert(self, data, partition: str = DEFAULT_PARTITION) -> List[int]:
+        """
+        Inserts rows into a partition of the collection, creating the partition if needed.
+
+        Args:
+            data (Any): Row dictionaries or columns in `INSERT_FIELDS` order.
+            partition (str): Name of the partition.
+
+        Returns:
+            List[int]: Primary keys of the inserted rows, in order.
+        """
+
+    @abstractmethod
+    def search(
+        self,
+        dense_embeddings,
+        sparse_embeddings,
+        limit: int,
+        field_scores: bool = False,
+        partitions: Optional[List[str]] = None,
+    ) -> List[RetrievalResult]:
+        """
+        Runs one hybrid search per query vector, fusing dense and sparse hits with RRF.
+
+        Args:
+            dense_embeddings (List[List[float]]): Dense query vectors.
+            sparse_embeddings (List[Dict[int, float]]): Sparse query vectors in Milvus format.
+            limit (int): Number of hits fetched from each search and kept after fusion.
+            field_scores (bool): Whether to report per-field dense and sparse scores.
+            partitions (List[str], optional): Only search these partitions; all partitions if None.
+
+        Returns:
+            List[RetrievalResult]: One result per query vector.
+        """
+
+    @abstractmethod
+    def query(
+        self,
+        field: str,
+        values: List[str],
+        partitions: Optional[List[str]] = None,
+        with_vectors: bool = False,
+        batch_size: int = 1000,
+    ) -> Iterator[List[Dict]]:
+        """
+        Reads the rows whose `field` matches any of `values`, in batches.
+
+        Rows are read in primary key order, so rows that were already yielded may be
+        deleted while iterating.
+
+        Args:
+            field (str): `doc_id` or `doc_source`.
+            values (List[str]): Values of `field` to match.
+            partitions (List[str], optional): Only read these partitions; all partitions if None.
+            with_vectors (bool): Whether to include the dense and sparse vectors.
+            batch_size (int): Maximum number of rows per yielded batch.
+
+        Yields:
+            List[Dict]: Row dictionaries with `auto_id`, `doc_id`, `doc_source`, `text`
+            and, with `with_vectors`, the vector fields.
+        """
+
+    @abstractmethod
+    def delete(self, field: str, values: List[str]) -> int:
+        """
+        Deletes rows whose `field` matches any of `values`.
+
+        Returns:
+            int: Number of rows deleted.
+        """
+
+    @abstractmethod
+    def delete_ids(self, ids: List[int]) -> int:
+        """
+        Deletes rows by primary key.
+
+        Returns:
+            int: Number of rows deleted.
+        """
+
+    @abstractmethod
+    def drop_partition(self, partition: str) -> int:
+        """
+        Drops a partition with all of its rows.
+
+        Returns:
+            int: Number of rows dropped.
+        """
+
+    @abstractmethod
+    def partitions(self) -> Dict[str, int]:
+        """
+        Returns the number of rows in each partition.
+        """
+
+    @abstractmethod
+    def drop(self):
+        """
+        Drops the collection and everything stored for it.
+        """
+
+    def flush(self):
+        """
+        Makes pending writes durable.
+        """
+
+    @contextmanager
+    def batch_writes(self):
+        """
+        Groups several writes, letting the backend persist them once at the end.
+        """
+        yield
+
+    def health_check(self, force: bool = False) -> bool:
+        """
+        Checks that the store is reachable.
+        """
+        return True
+
+    def stats(self) -> dict:
+        """
+        Returns backend-specific metrics.
+        """
+        return {}
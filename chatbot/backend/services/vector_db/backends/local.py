@@ -0,0 +1,395 @@
+"""
+In-process backend for offline development, tests and benchmarks.
+
+Dense search is exact cosine similarity over a normalized float32 matrix. Sparse
+search walks an inverted index, the CSC form of the document-term matrix, so only
+the postings of the query's terms are touched. Dense and sparse hits are fused
+client-side with the same reciprocal rank fusion as Milvus' `RRFRanker`. The
+collection lives in memory and is written to `LOCAL_VECTOR_DB_DIR` after each write,
+or once at the end of a `batch_writes` block.
+"""
+
+import json
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from scipy.sparse import csr_array
+
+from chatbot.backend.services.metrics import LatencyRecorder
+from chatbot.backend.services.vector_db.backends.base import VectorStoreBackend, rows_from_data
+from chatbot.backend.services.vector_db.partitions import DEFAULT_PARTITION, PARTITION_NAMES
+from chatbot.backend.services.vector_db.results import (
+    DENSE_FIELD,
+    SPARSE_FIELD,
+    RetrievalHit,
+    RetrievalResult,
+)
+from chatbot.backend.services.vector_db.schema import DOC_SOURCE, TEXT, TEXT_DENSE_EMBEDDING
+
+load_dotenv(override=True)
+
+LOCAL_VECTOR_DB_DIR = os.getenv("LOCAL_VECTOR_DB_DIR", "chatbot/backend/vector_store")
+# Smoothing constant of reciprocal rank fusion, the RRFRanker default
+RRF_K = 60
+DENSE_DIM = TEXT_DENSE_EMBEDDING.params["dim"]
+SCALAR_FIELDS = ["doc_id", "doc_source", "text"]
+# Rows store the index of their partition in this list
+PARTITION_CODES = [DEFAULT_PARTITION] + PARTITION_NAMES
+
+
+def top_k(scores: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the `k` candidate rows with the highest scores, highest first.
+    """
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], limit: int, k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Fuses ranked row lists, scoring each row by the sum of 1 / (k + rank) over the lists.
+
+    Returns:
+        List[Tuple[int, float]]: The top `limit` rows with their fused scores, highest first.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, row in enumerate(ranking.tolist(), start=1):
+            scores[row] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+class LocalBackend(VectorStoreBackend):
+    """
+    Stores the collection in process memory, persisted to `<directory>/<collection_name>.npz`.
+
+    Partitions are a per-row code that filters search candidates.
+    """
+
+    def __init__(self, collection_name: str, directory: str = LOCAL_VECTOR_DB_DIR):
+        super().__init__(collection_name)
+        self.directory = directory
+        self.path = os.path.join(directory, f"{collection_name}.npz")
+        self.latencies = LatencyRecorder()
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._batch_depth = 0
+        self._reset()
+        if os.path.exists(self.path):
+            self._load()
+
+    def _reset(self):
+        self._next_id = 0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._partition_codes = np.empty(0, dtype=np.int8)
+        self._dense = np.empty((0, DENSE_DIM), dtype=np.float32)
+        # document-term matrix in CSR components, one row per document
+        self._sparse_indptr = np.zeros(1, dtype=np.int64)
+        self._sparse_indices = np.empty(0, dtype=np.int64)
+        self._sparse_data = np.empty(0, dtype=np.float32)
+        self._scalars: Dict[str, List[str]] = {field: [] for field in SCALAR_FIELDS}
+        self._postings = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _partition_code(self, partition: str) -> int:
+        if partition not in PARTITION_CODES:
+            raise ValueError(f"Unknown partition '{partition}', expected one of {PARTITION_CODES}")
+        return PARTITION_CODES.index(partition)
+
+    def insert(self, data, partition: str = DEFAULT_PARTITION) -> List[int]:
+        rows = rows_from_data(data)
+        if not rows:
+            return []
+        code = self._partition_code(partition)
+        dense = np.asarray([row[DENSE_FIELD] for row in rows], dtype=np.float32)
+        if dense.ndim != 2 or dense.shape[1] != DENSE_DIM:
+            raise ValueError(f"Expected dense embeddings of dimension {DENSE_DIM}, got shape {dense.shape}")
+        norms = np.linalg.norm(dense, axis=1, keepdims=True)
+        dense /= np.where(norms == 0, 1, norms)
+
+        vectors = [row[SPARSE_FIELD] for row in rows]
+        lengths = np.fromiter((len(vector) for vector in vectors), dtype=np.int64, count=len(vectors))
+        indices = np.fromiter(
+            (int(index) for vector in vectors for index in vector), dtype=np.int64, count=int(lengths.sum())
+        )
+        weights = np.fromiter(
+            (weight for vector in vectors for weight in vector.values()), dtype=np.float32, count=len(indices)
+        )
+
+        with self.latencies.time("insert"), self._lock:
+            ids = np.arange(self._next_id, self._next_id + len(rows))
+            self._ids = np.concatenate([self._ids, ids])
+            self._next_id += len(rows)
+            self._partition_codes = np.concatenate(
+                [self._partition_codes, np.full(len(rows), code, dtype=np.int8)]
+            )
+            self._dense = np.concatenate([self._dense, dense])
+            self._sparse_indptr = np.concatenate(
+                [self._sparse_indptr, self._sparse_indptr[-1] + np.cumsum(lengths)]
+            )
+            self._sparse_indices = np.concatenate([self._sparse_indices, indices])
+            self._sparse_data = np.concatenate([self._sparse_data, weights])
+            self._scalars["doc_id"].extend(row["doc_id"] for row in rows)
+            self._scalars["doc_source"].extend(row.get("doc_source", DOC_SOURCE.default_value) for row in rows)
+            self._scalars["text"].extend(row.get("text", TEXT.default_value) for row in rows)
+            self._postings = None
+            self._changed()
+        return ids.tolist()
+
+    def _inverted_index(self) -> csr_array:
+        """
+        Returns the term-major (CSC) form of the document-term matrix, rebuilt after writes.
+
+        Column `t` of the result holds the postings of term `t`: the rows containing it and their weights.
+        """
+        if self._postings is None:
+            n_terms = int(self._sparse_indices.max()) + 1 if len(self._sparse_indices) else 0
+            matrix = csr_array(
+                (self._sparse_data, self._sparse_indices, self._sparse_indptr), shape=(len(self._ids), n_terms)
+            )
+            self._postings = matrix.tocsc()
+        return self._postings
+
+    def _sparse_scores(self, query: Dict[int, float], postings) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Accumulates inner products over the postings of the query's terms.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The score of every row and the rows sharing a term with the query.
+        """
+        scores = np.zeros(len(self._ids), dtype=np.float32)
+        matched = np.zeros(len(self._ids), dtype=bool)
+        n_terms = postings.shape[1]
+        for term, weight in query.items():
+            term = int(term)
+            if term >= n_terms:
+                continue
+            start, end = postings.indptr[term], postings.indptr[term + 1]
+            rows = postings.indices[start:end]
+            scores[rows] += weight * postings.data[start:end]
+            matched[rows] = True
+        return scores, np.flatnonzero(matched)
+
+    def search(
+        self,
+        dense_embeddings,
+        sparse_embeddings,
+        limit: int,
+        field_scores: bool = False,
+        partitions: Optional[List[str]] = None,
+    ) -> List[RetrievalResult]:
+        results = []
+        with self.latencies.time("search"), self._lock:
+            postings = self._inverted_index()
+            if partitions is None:
+                allowed = np.ones(len(self._ids), dtype=bool)
+            else:
+                codes = [PARTITION_CODES.index(name) for name in partitions if name in PARTITION_CODES]
+                allowed = np.isin(self._partition_codes, codes)
+            candidate_rows = np.flatnonzero(allowed)
+            for dense, sparse in zip(dense_embeddings, sparse_embeddings):
+                query = np.asarray(dense, dtype=np.float32)
+                norm = np.linalg.norm(query)
+                dense_scores = self._dense @ (query / norm if norm else query)
+                sparse_scores, sparse_rows = self._sparse_scores(sparse, postings)
+
+                fused = reciprocal_rank_fusion(
+                    [
+                        top_k(dense_scores, candidate_rows, limit),
+                        top_k(sparse_scores, sparse_rows[allowed[sparse_rows]], limit),
+                    ],
+                    limit,
+                )
+                results.append(RetrievalResult(
+                    RetrievalHit(
+                        auto_id=int(self._ids[row]),
+                        doc_id=self._scalars["doc_id"][row],
+                        doc_source=self._scalars["doc_source"][row],
+                        text=self._scalars["text"][row],
+                        score=score,
+                        dense_score=float(dense_scores[row]) if field_scores else None,
+                        sparse_score=float(sparse_scores[row]) if field_scores else None,
+                    )
+                    for row, score in fused
+                ))
+        return results
+
+    def query(
+        self,
+        field: str,
+        values: List[str],
+        partitions: Optional[List[str]] = None,
+        with_vectors: bool = False,
+        batch_size: int = 1000,
+    ) -> Iterator[List[Dict]]:
+        if field not in self._scalars:
+            raise ValueError(f"Cannot query by field '{field}', expected one of {SCALAR_FIELDS}")
+        values = set(values)
+        with self._lock:
+            column = self._scalars[field]
+            matches = np.fromiter((value in values for value in column), dtype=bool, count=len(column))
+            if partitions is not None:
+                matches &= np.isin(self._partition_codes, [self._partition_code(name) for name in partitions])
+            rows = []
+            for row in np.flatnonzero(matches).tolist():
+                entry = {"auto_id": int(self._ids[row]), **{name: self._scalars[name][row] for name in SCALAR_FIELDS}}
+                if with_vectors:
+                    start, end = self._sparse_indptr[row], self._sparse_indptr[row + 1]
+                    entry[DENSE_FIELD] = self._dense[row].tolist()
+                    entry[SPARSE_FIELD] = dict(
+                        zip(self._sparse_indices[start:end].tolist(), self._sparse_data[start:end].tolist())
+                    )
+                rows.append(entry)
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+    def delete(self, field: str, values: List[str]) -> int:
+        if field not in self._scalars:
+            raise ValueError(f"Cannot delete by field '{field}', expected one of {SCALAR_FIELDS}")
+        values = set(values)
+        with self._lock:
+            column = self._scalars[field]
+            keep = np.fromiter((value not in values for value in column), dtype=bool, count=len(column))
+            return self._delete(keep)
+
+    def delete_ids(self, ids: List[int]) -> int:
+        with self._lock:
+            return self._delete(~np.isin(self._ids, np.asarray(ids, dtype=np.int64)))
+
+    def _delete(self, keep: np.ndarray) -> int:
+        """
+        Removes the rows whose `keep` entry is False and persists the change.
+        """
+        with self.latencies.time("delete"), self._lock:
+            deleted = int(len(keep) - keep.sum())
+            if deleted:
+                self._keep_rows(keep)
+                self._changed()
+        return deleted
+
+    def _keep_rows(self, keep: np.ndarray):
+        """
+        Removes every row whose `keep` entry is False.
+        """
+        lengths = np.diff(self._sparse_indptr)
+        nnz_keep = np.repeat(keep, lengths)
+        self._ids = self._ids[keep]
+        self._partition_codes = self._partition_codes[keep]
+        self._dense = self._dense[keep]
+        self._sparse_indices = self._sparse_indices[nnz_keep]
+        self._sparse_data = self._sparse_data[nnz_keep]
+        self._sparse_indptr = np.concatenate([[0], np.cumsum(lengths[keep])])
+        rows = np.flatnonzero(keep).tolist()
+        self._scalars = {field: [column[row] for row in rows] for field, column in self._scalars.items()}
+        self._postings = None
+
+    def drop_partition(self, partition: str) -> int:
+        if partition == DEFAULT_PARTITION:
+            raise ValueError(f"The '{DEFAULT_PARTITION}' partition cannot be dropped")
+        code = self._partition_code(partition)
+        with self.latencies.time("drop_partition"), self._lock:
+            keep = self._partition_codes != code
+            dropped = int(len(keep) - keep.sum())
+            if dropped:
+                self._keep_rows(keep)
+                self._changed()
+        return dropped
+
+    def partitions(self) -> Dict[str, int]:
+        with self._lock:
+            counts = np.bincount(self._partition_codes, minlength=len(PARTITION_CODES))
+        return {name: int(count) for name, count in zip(PARTITION_CODES, counts) if count or name == DEFAULT_PARTITION}
+
+    def drop(self):
+        with self._lock:
+            self._reset()
+            self._dirty = False
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        print(f"Collection '{self.collection_name}' has been dropped")
+
+    def _changed(self):
+        """
+        Marks the collection as modified, writing it to disk unless inside `batch_writes`.
+        """
+        self._dirty = True
+        if self._batch_depth == 0:
+            self.flush()
+
+    @contextmanager
+    def batch_writes(self):
+        """
+        Defers writing the collection to disk until the outermost block exits.
+
+        The whole collection is rewritten on every flush, so flushing after each insert
+        batch would make ingestion quadratic in I/O.
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    self.flush()
+
+    def flush(self):
+        """
+        Writes the collection to disk if it changed, replacing the previous file atomically.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            with self.latencies.time("flush"):
+                os.makedirs(self.directory, exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    np.savez(
+                        f,
+                        ids=self._ids,
+                        partition_codes=self._partition_codes,
+                        dense=self._dense,
+                        sparse_indptr=self._sparse_indptr,
+                        sparse_indices=self._sparse_indices,
+                        sparse_data=self._sparse_data,
+                        meta=np.array(json.dumps({"next_id": self._next_id, "scalars": self._scalars})),
+                    )
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+
+    def _load(self):
+        with np.load(self.path) as store:
+            meta = json.loads(str(store["meta"]))
+            self._ids = store["ids"]
+            # stores written before partitioning keep every row in the default partition
+            self._partition_codes = (
+                store["partition_codes"] if "partition_codes" in store.files
+                else np.zeros(len(self._ids), dtype=np.int8)
+            )
+            self._dense = store["dense"]
+            self._sparse_indptr = store["sparse_indptr"]
+            self._sparse_indices = store["sparse_indices"]
+            self._sparse_data = store["sparse_data"]
+        self._next_id = meta["next_id"]
+        self._scalars = meta["scalars"]
+        print(f"Loaded {len(self._ids)} rows of '{self.collection_name}' from {self.path}")
+
+    def stats(self) -> dict:
+        """
+        Returns the row count, rows per partition, storage path and per-operation latencies.
+        """
+        return {
+            "rows": len(self),
+            "partitions": self.partitions(),
+            "path": self.path,
+            "latencies": self.latencies.summary(),
+        }
@@ -0,0 +1,265 @@
+"""
+Milvus / Zilliz Cloud backend.
+"""
+
+import threading
+from typing import Dict, Iterator, List, Optional
+
+from pymilvus import AnnSearchRequest, Collection, RRFRanker, utility
+
+from chatbot.backend.services.logger import logger
+from chatbot.backend.services.vector_db.backends.base import VectorStoreBackend
+from chatbot.backend.services.vector_db.connection import MilvusConnectionManager, WritePolicy
+from chatbot.backend.services.vector_db.partitions import DEFAULT_PARTITION
+from chatbot.backend.services.vector_db.index import create_all_indexes, load_index_config, search_params
+from chatbot.backend.services.vector_db.results import (
+    DENSE_FIELD,
+    SPARSE_FIELD,
+    RetrievalHit,
+    RetrievalResult,
+)
+from chatbot.backend.services.vector_db.schema import SCHEMA
+
+
+class MilvusBackend(VectorStoreBackend):
+    """
+    Stores the collection in Milvus, connecting through `ZILLIS_ENDPOINT`/`ZILLIS_TOKEN`.
+    """
+
+    def __init__(self, collection_name: str):
+        super().__init__(collection_name)
+        # Connections are managed per worker process and checked before use
+        self.connection = MilvusConnectionManager()
+        self.write_policy = WritePolicy()
+        self.index_config = load_index_config()
+        self.logger = logger
+
+        # Resolve the collection once so that it is created and loaded up front
+        self._partitions = {partition.name for partition in self.collection.partitions}
+        self._partition_lock = threading.Lock()
+
+    @property
+    def collection(self) -> Collection:
+        """
+        The loaded collection handle of the current worker process.
+        """
+        return self.connection.collection(self.collection_name, factory=self._create_collection)
+
+    def _create_collection(self, name: str) -> Collection:
+        """
+        Creates the collection with its indexes.
+        """
+        print("Initialising Collection")
+        collection = Collection(
+            name=name, schema=SCHEMA, using=self.connection.alias, shards_num=2
+        )
+        return create_all_indexes(collection, self.index_config)
+
+    def _ensure_partition(self, collection: Collection, partition: str):
+        """
+        Creates and loads a partition if it does not exist yet.
+        """
+        if partition in self._partitions:
+            return
+        with self._partition_lock:
+            if not collection.has_partition(partition):
+                created = collection.create_partition(partition)
+                self.connection.run("load", created.load)
+                self.logger.info(f"Created partition '{partition}' of '{self.collection_name}'")
+            self._partitions.add(partition)
+
+    def insert(self, data, partition: str = DEFAULT_PARTITION) -> List[int]:
+        """
+        Inserts data, flushing once the write policy's row threshold is reached.
+
+        Inserted rows are searchable on the loaded collection right away, so the
+        collection is never reloaded after writes.
+        """
+        collection = self.collection
+        self._ensure_partition(collection, partition)
+        result = self.connection.run("insert", collection.insert, data, partition_name=partition)
+        if self.write_policy.record_insert(result.insert_count):
+            self.flush(collection)
+        return list(result.primary_keys)
+
+    def search(
+        self,
+        dense_embeddings,
+        sparse_embeddings,
+        limit: int,
+        field_scores: bool = False,
+        partitions: Optional[List[str]] = None,
+    ) -> List[RetrievalResult]:
+        """
+        Sends one hybrid search request with one or more query vectors per field.
+
+        With `field_scores` the chunk vectors are returned as well, so that dense and
+        sparse scores can be computed locally; the fused ranking only exposes the RRF score.
+        Requested partitions that do not exist are skipped, since they hold no rows.
+        """
+        if partitions is not None:
+            if not self._partitions.issuperset(partitions):
+                # another worker may have created them since
+                self._partitions = {partition.name for partition in self.collection.partitions}
+            partitions = [partition for partition in partitions if partition in self._partitions]
+            if not partitions:
+                return [RetrievalResult([]) for _ in dense_embeddings]
+
+        output_fields = ["doc_id", "text", "doc_source"]
+        if field_scores:
+            output_fields += [DENSE_FIELD, SPARSE_FIELD]
+
+        search_results = self.connection.run(
+            "search",
+            self.collection.hybrid_search,
+            retry=True,
+            reqs=[
+                AnnSearchRequest(
+                    data=dense_embeddings,  # content vector embedding
+                    anns_field=DENSE_FIELD,
+                    param=search_params(self.index_config["dense"], limit),
+                    limit=limit,
+                ),
+                AnnSearchRequest(
+                    data=sparse_embeddings,  # keyword vector embedding
+                    anns_field=SPARSE_FIELD,
+                    param=search_params(self.index_config["sparse"], limit),
+                    limit=limit,
+                ),
+            ],
+            output_fields=output_fields,
+            # using RRFRanker here for reranking
+            rerank=RRFRanker(),
+            limit=limit,
+            partition_names=partitions,
+        )
+
+        return [
+            RetrievalResult(RetrievalHit.from_milvus(hit, dense, sparse) for hit in hits)
+            for hits, dense, sparse in zip(search_results, dense_embeddings, sparse_embeddings)
+        ]
+
+    def query(
+        self,
+        field: str,
+        values: List[str],
+        partitions: Optional[List[str]] = None,
+        with_vectors: bool = False,
+        batch_size: int = 1000,
+    ) -> Iterator[List[Dict]]:
+        """
+        Pages through matching rows with a query iterator, which is not bound by Milvus' query limit.
+        """
+        if not values:
+            return
+        collection = self.collection
+        if partitions is not None:
+            partitions = [partition for partition in partitions if collection.has_partition(partition)]
+            if not partitions:
+                return
+        output_fields = ["doc_id", "doc_source", "text"]
+        if with_vectors:
+            output_fields += [DENSE_FIELD, SPARSE_FIELD]
+        match_list = ", ".join(f"'{item}'" for item in values)
+        iterator = self.connection.run(
+            "query",
+            collection.query_iterator,
+            batch_size=batch_size,
+            expr=f"{field} in [{match_list}]",
+            output_fields=output_fields,
+            partition_names=partitions,
+        )
+        try:
+            while True:
+                batch = self.connection.run("query", iterator.next)
+                if not batch:
+                    break
+                yield [dict(row) for row in batch]
+        finally:
+            iterator.close()
+
+    def delete(self, field: str, values: List[str]) -> int:
+        """
+        Deletes matching rows, compacting once the write policy's delete threshold is reached.
+        """
+        # Convert list to Milvus-compatible expression
+        match_list = ", ".join(f"'{item}'" for item in values)
+        return self._delete(f"{field} in [{match_list}]")
+
+    def delete_ids(self, ids: List[int]) -> int:
+        if not ids:
+            return 0
+        return self._delete(f"auto_id in [{', '.join(str(int(pk)) for pk in ids)}]")
+
+    def _delete(self, delete_expr: str) -> int:
+        collection = self.collection
+        result = self.connection.run("delete", collection.delete, delete_expr)
+        if self.write_policy.record_delete(result.delete_count):
+            self.compact(collection)
+        return result.delete_count
+
+    def drop_partition(self, partition: str) -> int:
+        """
+        Releases and drops a partition, which is much cheaper than deleting its rows by expression.
+        """
+        if partition == DEFAULT_PARTITION:
+            raise ValueError(f"The '{DEFAULT_PARTITION}' partition cannot be dropped")
+        collection = self.collection
+        with self._partition_lock:
+            if not collection.has_partition(partition):
+                self._partitions.discard(partition)
+                return 0
+            handle = collection.partition(partition)
+            rows = handle.num_entities
+            self.connection.run("release", handle.release)
+            self.connection.run("drop_partition", collection.drop_partition, partition)
+            self._partitions.discard(partition)
+        print(f"Partition '{partition}' of '{self.collection_name}' has been dropped")
+        return rows
+
+    def partitions(self) -> Dict[str, int]:
+        return {partition.name: partition.num_entities for partition in self.collection.partitions}
+
+    def drop(self):
+        # Check if the collection exists
+        if self.connection.has_collection(self.collection_name):
+            collection = Collection(name=self.collection_name, using=self.connection.alias)
+
+            # Release the collection
+            collection.release()
+
+            # Drop the collection if it exists
+            self.connection.run("drop", utility.drop_collection, self.collection_name, using=self.connection.alias)
+            self.connection.forget(self.collection_name)
+            self._partitions = {DEFAULT_PARTITION}
+            print(f"Collection '{self.collection_name}' has been dropped")
+        else:
+            print(f"Collection '{self.collection_name}' does not exist")
+
+    def flush(self, collection: Collection = None):
+        """
+        Seals the growing segments of the collection.
+        """
+        collection = collection or self.collection
+        self.connection.run("flush", collection.flush)
+        self.write_policy.flushed()
+
+    def compact(self, collection: Collection = None):
+        """
+        Merges segments and purges deleted rows.
+        """
+        collection = collection or self.collection
+        self.connection.run("compact", collection.compact)
+        self.write_policy.compacted()
+
+    def health_check(self, force: bool = False) -> bool:
+        return self.connection.health_check(force=force)
+
+    def stats(self) -> dict:
+        """
+        Returns connection state, per-operation Milvus latencies and pending writes.
+        """
+        return {
+            **self.connection.stats(),
+            "write_policy": self.write_policy.stats(),
+        }
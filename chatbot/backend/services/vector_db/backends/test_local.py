@@ -0,0 +1,124 @@
+import numpy as np
+
+from chatbot.backend.services.vector_db.backends import local
+from chatbot.backend.services.vector_db.backends.local import (
+    DENSE_DIM,
+    RRF_K,
+    LocalBackend,
+    reciprocal_rank_fusion,
+    top_k,
+)
+
+
+def unit(axis: int) -> list:
+    vector = np.zeros(DENSE_DIM, dtype=np.float32)
+    vector[axis] = 1.0
+    return vector.tolist()
+
+
+def make_row(doc_id: str, text: str, axis: int, sparse: dict, doc_source: str = "source.pdf") -> dict:
+    return {
+        "doc_id": doc_id,
+        "doc_source": doc_source,
+        "text": text,
+        "text_dense_embedding": unit(axis),
+        "text_sparse_embedding": sparse,
+    }
+
+
+def test_top_k_returns_highest_scores_first():
+    scores = np.array([0.1, 0.9, 0.5, 0.7])
+
+    assert top_k(scores, np.arange(4), 2).tolist() == [1, 3]
+    assert top_k(scores, np.array([0, 2]), 5).tolist() == [2, 0]
+
+
+def test_reciprocal_rank_fusion_sums_reciprocal_ranks():
+    fused = reciprocal_rank_fusion([np.array([1, 2]), np.array([2, 3])], limit=2)
+
+    assert [row for row, _ in fused] == [2, 1]
+    assert fused[0][1] == 1 / (RRF_K + 2) + 1 / (RRF_K + 1)
+
+
+def test_search_fuses_dense_and_sparse_hits(tmp_path):
+    backend = LocalBackend("test", str(tmp_path))
+    ids = backend.insert([
+        make_row("FAQ", "dense match", 0, {7: 0.1}),
+        make_row("FAQ", "sparse match", 1, {3: 2.0}),
+        make_row("FAQ", "both", 2, {3: 1.0}),
+    ])
+    query_dense = (np.array(unit(0)) + np.array(unit(2)) * 0.9).tolist()
+
+    (result,) = backend.search([query_dense], [{3: 1.0}], limit=2, field_scores=True)
+
+    # "both" is ranked second by each search, which beats ranking first in only one
+    assert result[0].text == "both"
+    assert result[0].auto_id == ids[2]
+    assert result[0].sparse_score == 1.0
+    assert result[1].text in ("dense match", "sparse match")
+
+
+def test_search_without_field_scores_leaves_them_unset(tmp_path):
+    backend = LocalBackend("test", str(tmp_path))
+    backend.insert([make_row("FAQ", "only", 0, {1: 1.0})])
+
+    (result,) = backend.search([unit(0)], [{1: 1.0}], limit=1)
+
+    assert result[0].dense_score is None and result[0].sparse_score is None
+
+
+def test_search_is_restricted_to_partitions(tmp_path):
+    backend = LocalBackend("test", str(tmp_path))
+    backend.insert([make_row("FAQ", "faq", 0, {1: 1.0})], partition="faq")
+    backend.insert([make_row("Emails", "email", 0, {1: 1.0})], partition="emails")
+
+    (result,) = backend.search([unit(0)], [{1: 1.0}], limit=5, partitions=["emails"])
+
+    assert [hit.text for hit in result] == ["email"]
+    assert backend.partitions() == {"_default": 0, "emails": 1, "faq": 1}
+
+
+def test_query_and_delete_by_field(tmp_path):
+    backend = LocalBackend("test", str(tmp_path))
+    backend.insert([make_row("FAQ", "a", 0, {1: 1.0}), make_row("Emails", "b", 1, {2: 1.0})])
+
+    (page,) = backend.query("doc_id", ["Emails"], with_vectors=True)
+    assert [row["text"] for row in page] == ["b"]
+    assert page[0]["text_sparse_embedding"] == {2: 1.0}
+
+    assert backend.delete("doc_id", ["FAQ"]) == 1
+    assert len(backend) == 1
+
+
+def test_writes_are_persisted_and_reloaded(tmp_path):
+    backend = LocalBackend("test", str(tmp_path))
+    ids = backend.insert([make_row("FAQ", "a", 0, {1: 1.0}), make_row("FAQ", "b", 1, {2: 1.0})])
+    backend.delete_ids([ids[0]])
+
+    reloaded = LocalBackend("test", str(tmp_path))
+
+    assert len(reloaded) == 1
+    (result,) = reloaded.search([unit(1)], [{2: 1.0}], limit=1)
+    assert result[0].text == "b"
+    # new ids continue after the deleted one
+    assert reloaded.insert([make_row("FAQ", "c", 2, {3: 1.0})]) == [2]
+
+
+def test_batch_writes_flushes_once_at_the_end(tmp_path, monkeypatch):
+    backend = LocalBackend("test", str(tmp_path))
+    saves = []
+    savez = np.savez
+    monkeypatch.setattr(local.np, "savez", lambda *args, **kwargs: (saves.append(1), savez(*args, **kwargs)))
+
+    with backend.batch_writes():
+        with backend.batch_writes():
+            backend.insert([make_row("FAQ", "a", 0, {1: 1.0})])
+        backend.insert([make_row("FAQ", "b", 1, {2: 1.0})])
+        assert saves == []
+    assert len(saves) == 1
+    assert len(LocalBackend("test", str(tmp_path))) == 2
+
+    # nothing changed, so nothing is written
+    with backend.batch_writes():
+        pass
+    assert len(saves) == 1
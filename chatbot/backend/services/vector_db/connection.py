@@ -0,0 +1,285 @@
+"""
+Managed Milvus connections and collection handles.
+
+Each worker process gets its own connection alias, since gRPC channels cannot be
+shared across forks. The manager checks the connection periodically, reconnects with
+exponential backoff, loads each collection once per connection and records the
+latency of every operation. Writes go through a flush/compaction policy instead of
+reloading the collection after each insert.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from pymilvus import Collection, connections, utility
+from pymilvus.exceptions import MilvusException
+
+from chatbot.backend.services.logger import logger
+from chatbot.backend.services.metrics import Counters, LatencyRecorder
+
+load_dotenv(override=True)
+
+MILVUS_CONNECT_RETRIES = int(os.getenv("MILVUS_CONNECT_RETRIES", 5))
+MILVUS_BACKOFF_BASE = float(os.getenv("MILVUS_BACKOFF_BASE", 0.5))  # seconds
+MILVUS_BACKOFF_MAX = float(os.getenv("MILVUS_BACKOFF_MAX", 10))  # seconds
+MILVUS_HEALTH_CHECK_INTERVAL = float(os.getenv("MILVUS_HEALTH_CHECK_INTERVAL", 30))  # seconds
+# Seal growing segments once this many rows were inserted since the last flush
+MILVUS_FLUSH_ROWS = int(os.getenv("MILVUS_FLUSH_ROWS", 10000))
+# Compact once this many rows were deleted since the last compaction
+MILVUS_COMPACT_DELETES = int(os.getenv("MILVUS_COMPACT_DELETES", 10000))
+
+# Latency of each Milvus operation, e.g. search, insert, flush, connect
+milvus_latencies = LatencyRecorder()
+
+
+class MilvusConnectionManager:
+    """
+    Owns the Milvus connection of the current process and its collection handles.
+    """
+
+    def __init__(
+        self,
+        uri: Optional[str] = None,
+        token: Optional[str] = None,
+        retries: int = MILVUS_CONNECT_RETRIES,
+        health_check_interval: float = MILVUS_HEALTH_CHECK_INTERVAL,
+    ):
+        self.uri = uri or os.getenv("ZILLIS_ENDPOINT")
+        self.token = token or os.getenv("ZILLIS_TOKEN")
+        self.retries = retries
+        self.health_check_interval = health_check_interval
+        self.counters = Counters()
+        self.logger = logger
+        self._lock = threading.RLock()
+        self._pid = None
+        self._collections: Dict[str, Collection] = {}
+        self._last_health_check = 0.0
+
+    @property
+    def alias(self) -> str:
+        """
+        Connection alias of the current process.
+        """
+        return f"odprt-{os.getpid()}"
+
+    def connect(self):
+        """
+        Opens the connection of the current process, retrying with exponential backoff.
+
+        Raises:
+            MilvusException: If every attempt fails.
+        """
+        with self._lock:
+            for attempt in range(self.retries):
+                try:
+                    with milvus_latencies.time("connect"):
+                        connections.connect(alias=self.alias, uri=self.uri, token=self.token)
+                    break
+                except MilvusException as e:
+                    self.counters.increment("connect_failures")
+                    if attempt == self.retries - 1:
+                        raise
+                    delay = min(MILVUS_BACKOFF_MAX, MILVUS_BACKOFF_BASE * 2 ** attempt)
+                    self.logger.warning(
+                        f"Milvus connection attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s"
+                    )
+                    time.sleep(delay)
+
+            self.counters.increment("connects")
+            self._pid = os.getpid()
+            # handles are bound to the previous connection
+            self._collections.clear()
+            self._last_health_check = time.monotonic()
+            self.logger.info(f"Connected to Milvus as `{self.alias}`")
+
+    def ensure_connected(self):
+        """
+        Connects if this process has no connection yet, e.g. after a fork.
+        """
+        if self._pid != os.getpid() or not connections.has_connection(self.alias):
+            self.connect()
+
+    def reconnect(self):
+        """
+        Drops the current connection and connects again.
+        """
+        with self._lock:
+            self.counters.increment("reconnects")
+            try:
+                connections.disconnect(self.alias)
+            except MilvusException as e:
+                self.logger.warning(f"Failed to disconnect `{self.alias}`: {e}")
+            self._pid = None
+            self.connect()
+
+    def health_check(self, force: bool = False) -> bool:
+        """
+        Checks that the server responds, reconnecting once if it does not.
+
+        Checks are rate-limited to one per `health_check_interval` seconds unless forced.
+
+        Returns:
+            bool: Whether the server responded.
+        """
+        if not force and time.monotonic() - self._last_health_check < self.health_check_interval:
+            return True
+        try:
+            self.ensure_connected()
+            with milvus_latencies.time("health_check"):
+                utility.get_server_version(using=self.alias)
+            self._last_health_check = time.monotonic()
+            return True
+        except MilvusException as e:
+            self.counters.increment("health_check_failures")
+            self.logger.warning(f"Milvus health check failed: {e}")
+        try:
+            self.reconnect()
+            return True
+        except MilvusException as e:
+            self.logger.error(f"Milvus reconnect failed: {e}")
+            return False
+
+    def has_collection(self, name: str) -> bool:
+        """
+        Checks whether a collection exists.
+        """
+        self.ensure_connected()
+        return utility.has_collection(name, using=self.alias)
+
+    def collection(self, name: str, factory: Optional[Callable[[str], Collection]] = None) -> Collection:
+        """
+        Returns the loaded handle of a collection, creating and loading it once per connection.
+
+        Args:
+            name (str): Name of the collection.
+            factory (Callable[[str], Collection], optional): Creates the collection if it does not exist.
+
+        Returns:
+            Collection: The collection bound to this process' connection.
+        """
+        self.health_check()
+        handle = self._collections.get(name)
+        if handle is not None:
+            return handle
+        with self._lock:
+            handle = self._collections.get(name)
+            if handle is not None:
+                return handle
+            if self.has_collection(name):
+                handle = Collection(name=name, using=self.alias)
+            elif factory is not None:
+                handle = factory(name)
+            else:
+                raise MilvusException(message=f"Collection '{name}' does not exist")
+            with milvus_latencies.time("load"):
+                handle.load()
+            self._collections[name] = handle
+            return handle
+
+    def forget(self, name: str):
+        """
+        Discards the cached handle of a collection, e.g. after it was dropped.
+        """
+        with self._lock:
+            self._collections.pop(name, None)
+
+    def run(self, operation: str, func: Callable[..., Any], *args, retry: bool = False, **kwargs) -> Any:
+        """
+        Runs a Milvus call, recording its latency under `operation`.
+
+        Args:
+            operation (str): Name of the operation for metrics.
+            func (Callable): The call to run.
+            retry (bool): Whether to reconnect and retry once on failure. Only safe
+                for idempotent operations such as searches.
+
+        Returns:
+            Any: The result of the call.
+        """
+        try:
+            with milvus_latencies.time(operation):
+                return func(*args, **kwargs)
+        except MilvusException as e:
+            self.counters.increment(f"{operation}_failures")
+            if not retry:
+                raise
+            self.logger.warning(f"Milvus {operation} failed ({e}), reconnecting and retrying")
+            self.reconnect()
+            with milvus_latencies.time(operation):
+                return func(*args, **kwargs)
+
+    def stats(self) -> dict:
+        """
+        Returns connection counters and per-operation latencies.
+        """
+        return {
+            "alias": self.alias,
+            "connected": self._pid == os.getpid(),
+            "counters": self.counters.snapshot(),
+            "latencies": milvus_latencies.summary(),
+        }
+
+
+class WritePolicy:
+    """
+    Decides when to flush and compact a collection after writes.
+
+    Inserted rows are searchable on a loaded collection without reloading it, so the
+    collection is only flushed once enough rows accumulated and compacted once enough
+    rows were deleted.
+    """
+
+    def __init__(self, flush_rows: int = MILVUS_FLUSH_ROWS, compact_deletes: int = MILVUS_COMPACT_DELETES):
+        self.flush_rows = flush_rows
+        self.compact_deletes = compact_deletes
+        self.counters = Counters()
+        self._pending_rows = 0
+        self._pending_deletes = 0
+        self._lock = threading.Lock()
+
+    def record_insert(self, rows: int) -> bool:
+        """
+        Records inserted rows.
+
+        Returns:
+            bool: Whether the collection should be flushed now.
+        """
+        with self._lock:
+            self._pending_rows += rows
+            return self._pending_rows >= self.flush_rows
+
+    def record_delete(self, rows: int) -> bool:
+        """
+        Records deleted rows.
+
+        Returns:
+            bool: Whether the collection should be compacted now.
+        """
+        with self._lock:
+            self._pending_deletes += rows
+            return self._pending_deletes >= self.compact_deletes
+
+    def flushed(self):
+        with self._lock:
+            self._pending_rows = 0
+        self.counters.increment("flushes")
+
+    def compacted(self):
+        with self._lock:
+            self._pending_deletes = 0
+        self.counters.increment("compactions")
+
+    def stats(self) -> dict:
+        """
+        Returns pending writes and the number of flushes and compactions.
+        """
+        with self._lock:
+            pending_rows, pending_deletes = self._pending_rows, self._pending_deletes
+        return {
+            "pending_rows": pending_rows,
+            "pending_deletes": pending_deletes,
+            **self.counters.snapshot(),
+        }
@@ -1,106 +1,271 @@
 import os
+from contextlib import closing
+from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
-from pymilvus import utility, connections, Collection, AnnSearchRequest, RRFRanker
 from tqdm import tqdm
 
-from chatbot.backend.services.vector_db.schema import SCHEMA
-from chatbot.backend.services.vector_db.index import create_all_indexes
+from chatbot.backend.services.vector_db.backends.base import VectorStoreBackend
 from chatbot.backend.services.models.embedding_model import embedding_model
+from chatbot.backend.services.models.embedding_batcher import (
+    EMBEDDING_BATCHING_ENABLED,
+    embedding_batcher,
+)
 from chatbot.backend.services.logger import logger
+from chatbot.backend.services.registry import registry
+from chatbot.backend.services.vector_db.manifest import IngestionManifest
+from chatbot.backend.services.vector_db.partitions import DEFAULT_PARTITION, DOC_TYPE_PARTITIONS, split_by_partition
+from chatbot.backend.services.vector_db.results import RetrievalResult
 
 load_dotenv(override=True)
 
+# Maximum number of queries sent to Milvus in one hybrid search request
+BATCH_SEARCH_MAX_QUERIES = int(os.getenv("BATCH_SEARCH_MAX_QUERIES", 64))
+# Return chunk vectors with search hits to compute per-field dense and sparse scores;
+# off by default since it ships every hit's vectors back from Milvus
+RETRIEVAL_FIELD_SCORES = os.getenv("RETRIEVAL_FIELD_SCORES", "false").lower() == "true"
+# Storage backend: milvus (Zilliz Cloud) or local (in-process, persisted to LOCAL_VECTOR_DB_DIR)
+VECTOR_DB_BACKEND = os.getenv("VECTOR_DB_BACKEND", "milvus")
+VECTOR_DB_BACKENDS = ("milvus", "local")
 
-class VectorDB:
-    def __init__(self, collection_name):
-        # Establish a connection to Zillis
-        self.endpoint = os.getenv("ZILLIS_ENDPOINT")
-        self.token = os.getenv("ZILLIS_TOKEN")
-        self.logger = logger
-        connections.connect(uri=self.endpoint, token=self.token)
 
-        # Checking if collection was already created
-        if utility.has_collection(collection_name):
-            print(f"Collection '{collection_name}' already exists")
-            self.collection = Collection(name=collection_name)
-        else:
-            print("Initialising Collection")
-            # Create the collection
-            self.collection = Collection(
-                name=collection_name, schema=SCHEMA, using="default", shards_num=2
-            )
+def create_backend(name: str, collection_name: str) -> VectorStoreBackend:
+    """
+    Creates a storage backend by name, importing only the one that is used.
+
+    Args:
+        name (str): One of `VECTOR_DB_BACKENDS`.
+        collection_name (str): Name of the collection.
+
+    Returns:
+        VectorStoreBackend: The backend.
+    """
+    if name == "milvus":
+        from chatbot.backend.services.vector_db.backends.milvus import MilvusBackend
+
+        return MilvusBackend(collection_name)
+    if name == "local":
+        from chatbot.backend.services.vector_db.backends.local import LocalBackend
+
+        return LocalBackend(collection_name)
+    raise ValueError(f"Unknown vector DB backend '{name}', expected one of {VECTOR_DB_BACKENDS}")
+
+
+def _num_rows(data) -> int:
+    """
+    Returns the number of rows of insert data given as row dictionaries or as columns.
+    """
+    if not data:
+        return 0
+    return len(data) if isinstance(data[0], dict) else len(data[0])
+
+
+def _slice_rows(data, start: int, end: int):
+    """
+    Returns rows `start` to `end` of insert data, keeping its format.
+    """
+    if isinstance(data[0], dict):
+        return data[start:end]
+    return [column[start:end] for column in data]
 
-            # Creating index for the collection
-            self.collection = create_all_indexes(self.collection)
+
+class VectorDB:
+    def __init__(self, collection_name, backend: str = VECTOR_DB_BACKEND):
+        self.logger = logger
+        self.collection_name = collection_name
+        self.backend = create_backend(backend, collection_name)
+        # Chunks ingested from this machine, kept in sync with deletes and drops
+        self.manifest = IngestionManifest.for_collection(backend, collection_name)
 
         # Load embedding model
         self.embedding_model = embedding_model
+        # Queries are encoded through the micro-batcher when enabled so concurrent
+        # searches share forward passes
+        self.query_encoder = embedding_batcher if EMBEDDING_BATCHING_ENABLED else embedding_model
 
-        self.collection_name = collection_name
+        # Callbacks fired whenever the indexed corpus changes, e.g. to invalidate caches
+        self.corpus_listeners = []
+
+    def add_corpus_listener(self, callback):
+        """
+        Registers a callback to be invoked whenever the corpus is modified.
+
+        Args:
+            callback (Callable[[], None]): The callback to invoke.
+
+        Returns:
+            None
+        """
+        self.corpus_listeners.append(callback)
+
+    def _notify_corpus_changed(self):
+        """
+        Invokes all corpus listeners, logging rather than raising on failure.
+        """
+        for callback in self.corpus_listeners:
+            try:
+                callback()
+            except Exception as e:
+                self.logger.error(f"Corpus listener failed: {e}")
 
     def insert(self, data):
         """
-        Inserts data into the collection.
+        Inserts data into the collection, routing each row to the partition of its `doc_id`.
 
         Args:
             data (Any): The data to be inserted into the collection.
 
         Returns:
-            None
+            List[int]: The primary keys of the inserted entries, in order.
+        """
+        primary_keys = [None] * _num_rows(data)
+        with self.backend.batch_writes():
+            for partition, (positions, partition_data) in split_by_partition(data).items():
+                for position, primary_key in zip(positions, self.backend.insert(partition_data, partition=partition)):
+                    primary_keys[position] = primary_key
+        self._notify_corpus_changed()
+        return primary_keys
+
+    def stats(self) -> dict:
         """
-        self.collection.insert(data)
-        self.collection.load()
+        Returns the backend name and its metrics, e.g. per-operation latencies.
+        """
+        return {
+            "collection": self.collection_name,
+            "backend": type(self.backend).__name__,
+            **self.backend.stats(),
+        }
 
-    def hybrid_search(self, query: str) -> str:
+    def hybrid_search(self, query: str, limit: int = 3, partitions: Optional[List[str]] = None) -> RetrievalResult:
         """
         Performs a hybrid search on the collection using dense and sparse embeddings.
 
         Args:
             query (str): The query string to search for.
+            limit (int): Number of hits to return.
+            partitions (List[str], optional): Only search these document type partitions.
 
         Returns:
-            str: A formatted string containing the search results.
+            RetrievalResult: The hits with their ids and scores, formattable into prompt context.
         """
         # Get query embedding
-        dense_embedding, sparse_embedding = self.embedding_model.encode_texts([query])
-
-        # New hybrid search implementation
-        search_results = self.collection.hybrid_search(
-            reqs=[
-                AnnSearchRequest(
-                    data=dense_embedding,  # content vector embedding
-                    anns_field="text_dense_embedding",
-                    param={"metric_type": "COSINE"},
-                    limit=3,
-                ),
-                AnnSearchRequest(
-                    data=self.embedding_model.convert_sparse_embeddings(
-                        sparse_embedding
-                    ),  # keyword vector embedding
-                    anns_field="text_sparse_embedding",
-                    param={"metric_type": "IP"},
-                    limit=3,
-                ),
-            ],
-            output_fields=["doc_id", "text", "doc_source"],
-            # using RRFRanker here for reranking
-            rerank=RRFRanker(),
-            limit=3,
-        )
+        dense_embedding, sparse_embedding = self.query_encoder.encode_texts([query])
+
+        result = self.search_hits(dense_embedding, sparse_embedding, limit, partitions)
+        result.query = query
+        return result
+
+    def batch_hybrid_search(
+        self, queries: List[str], limit: int = 3, partitions: Optional[List[str]] = None
+    ) -> List[RetrievalResult]:
+        """
+        Performs hybrid searches for many queries with one encoding pass and batched Milvus requests.
+
+        Args:
+            queries (List[str]): The query strings to search for.
+            limit (int): Number of hits per query.
+            partitions (List[str], optional): Only search these document type partitions.
+
+        Returns:
+            List[RetrievalResult]: The result of each query, in query order.
+        """
+        if not queries:
+            return []
+        # one batched forward pass for all queries
+        dense_embeddings, sparse_embeddings = self.embedding_model.encode_texts(queries)
+        results = self.batch_search_hits(dense_embeddings, sparse_embeddings, limit, partitions)
+        for query, result in zip(queries, results):
+            result.query = query
+        return results
+
+    def batch_search_hits(
+        self,
+        dense_embeddings,
+        sparse_embeddings,
+        limit: int = 3,
+        partitions: Optional[List[str]] = None,
+        field_scores: bool = RETRIEVAL_FIELD_SCORES,
+    ) -> List[RetrievalResult]:
+        """
+        Runs multi-vector hybrid searches, at most `BATCH_SEARCH_MAX_QUERIES` queries per request.
 
-        hits = search_results[0]
+        Args:
+            dense_embeddings (List[List[float]]): Dense embeddings, one per query.
+            sparse_embeddings (Any): Sparse embeddings, one row per query.
+            limit (int): Number of hits fetched from each search and kept after fusion.
+            partitions (List[str], optional): Only search these document type partitions.
+            field_scores (bool): Whether hits carry their dense and sparse scores.
 
-        context = []
-        # TODO: Modify the context
-        for res in hits:
-            doc_source = res.doc_source
-            text = res.text
-            context.append(f"Source Document: {doc_source} \n Text: {text}")
-            # self.logger.info(f"Doc_source: {res.doc_source}")
-            # self.logger.info(f"Context: {text}")
+        Returns:
+            List[RetrievalResult]: The fused hits of each query, in query order.
+        """
+        sparse_embeddings = self.embedding_model.convert_sparse_embeddings(sparse_embeddings)
+        results = []
+        for start in range(0, len(dense_embeddings), BATCH_SEARCH_MAX_QUERIES):
+            end = start + BATCH_SEARCH_MAX_QUERIES
+            results.extend(
+                self._hybrid_search_request(
+                    dense_embeddings[start:end], sparse_embeddings[start:end], limit, partitions, field_scores
+                )
+            )
+        return results
+
+    def search_hits(
+        self,
+        dense_embedding,
+        sparse_embedding,
+        limit: int = 3,
+        partitions: Optional[List[str]] = None,
+        field_scores: bool = RETRIEVAL_FIELD_SCORES,
+    ) -> RetrievalResult:
+        """
+        Runs the hybrid search and returns the hits of the first query.
 
-        return "\n\n".join(context), context
+        Args:
+            dense_embedding (List[List[float]]): Dense embedding of the query.
+            sparse_embedding (Any): Sparse embedding of the query.
+            limit (int): Number of hits fetched from each search and kept after fusion.
+            partitions (List[str], optional): Only search these document type partitions.
+            field_scores (bool): Whether hits carry their dense and sparse scores.
+
+        Returns:
+            RetrievalResult: The fused hits, each carrying ids, scores, doc_id, text and doc_source.
+        """
+        return self._hybrid_search_request(
+            dense_embedding,
+            self.embedding_model.convert_sparse_embeddings(sparse_embedding),
+            limit,
+            partitions,
+            field_scores,
+        )[0]
+
+    def _hybrid_search_request(
+        self,
+        dense_embeddings,
+        sparse_embeddings,
+        limit: int,
+        partitions: Optional[List[str]] = None,
+        field_scores: bool = RETRIEVAL_FIELD_SCORES,
+    ) -> List[RetrievalResult]:
+        """
+        Sends one hybrid search request with one or more query vectors per field.
+
+        With `field_scores` each hit also carries its dense and sparse scores, at the
+        cost of returning the chunk vectors; the fused ranking only exposes the RRF score.
+
+        Args:
+            dense_embeddings (List[List[float]]): Dense query vectors.
+            sparse_embeddings (List[Dict[int, float]]): Sparse query vectors in Milvus format.
+            limit (int): Number of hits fetched from each search and kept after fusion.
+            partitions (List[str], optional): Only search these document type partitions.
+            field_scores (bool): Whether hits carry their dense and sparse scores.
+
+        Returns:
+            List[RetrievalResult]: One result per query vector.
+        """
+        return self.backend.search(
+            dense_embeddings, sparse_embeddings, limit, field_scores=field_scores, partitions=partitions
+        )
 
     def drop_collection(self):
         """
@@ -109,44 +274,152 @@ class VectorDB:
         Returns:
             None
         """
-        # Check if the collection exists
-        if utility.has_collection(self.collection_name):
-            collection = Collection(name=self.collection_name)
+        self.backend.drop()
+        self.manifest.forget()
+        self.collection_name = None
+        self._notify_corpus_changed()
 
-            # Release the collection
-            collection.release()
+    def drop_partition(self, partition: str) -> int:
+        """
+        Drops all documents of one type, e.g. before re-ingesting them.
 
-            # Drop the collection if it exists
-            utility.drop_collection(self.collection_name)
-            print(f"Collection '{self.collection_name}' has been dropped")
-            self.collection_name = None
-        else:
-            print(f"Collection '{self.collection_name}' does not exist")
+        Entries of the type ingested before partitioning, which are still in the default
+        partition until `migrate_default_partition` has run, are deleted as well.
+
+        Args:
+            partition (str): Name of the partition, one of `PARTITION_NAMES`.
+
+        Returns:
+            int: The number of dropped entries.
+        """
+        doc_ids = [doc_id for doc_id, name in DOC_TYPE_PARTITIONS.items() if name == partition]
+        with self.backend.batch_writes():
+            dropped = self.backend.drop_partition(partition)
+            # checked first, since the delete by expression scans the whole collection
+            if doc_ids and self.has_entries(doc_ids, [DEFAULT_PARTITION]):
+                # the partition is gone, so only legacy entries in the default partition match
+                dropped += self.backend.delete("doc_id", doc_ids)
+        self.manifest.forget("doc_id", doc_ids)
+        self._notify_corpus_changed()
+        return dropped
+
+    def has_entries(self, doc_ids: List[str], partitions: Optional[List[str]] = None) -> bool:
+        """
+        Checks whether the collection holds any entry of these document types.
+
+        Args:
+            doc_ids (List[str]): Document types to look for.
+            partitions (List[str], optional): Only look in these partitions.
+
+        Returns:
+            bool: True if at least one entry matches.
+        """
+        with closing(self.backend.query("doc_id", doc_ids, partitions, batch_size=1)) as pages:
+            return next(pages, None) is not None
+
+    def migrate_default_partition(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Moves entries ingested before partitioning from the default partition into the
+        partition of their `doc_id`.
+
+        Each batch is inserted into its partition before it is deleted from the default
+        one, so entries never disappear from unfiltered searches. Moved entries get new
+        primary keys, which are updated in the ingestion manifest. Running it again only
+        moves what is left.
+
+        Args:
+            batch_size (int): Number of entries read, inserted and deleted at a time.
+
+        Returns:
+            Dict[str, int]: The number of moved entries per partition.
+        """
+        by_partition: Dict[str, List[str]] = {}
+        for doc_id, partition in DOC_TYPE_PARTITIONS.items():
+            by_partition.setdefault(partition, []).append(doc_id)
+
+        moved = {}
+        for partition, doc_ids in by_partition.items():
+            moved[partition] = 0
+            # rows already read can be deleted while paging, as the query pages by primary key
+            for rows in self.backend.query(
+                "doc_id", doc_ids, [DEFAULT_PARTITION], with_vectors=True, batch_size=batch_size
+            ):
+                old_keys = [row.pop("auto_id") for row in rows]
+                with self.backend.batch_writes():
+                    new_keys = self.backend.insert(rows, partition=partition)
+                    self.backend.delete_ids(old_keys)
+                self.manifest.replace_primary_keys(dict(zip(old_keys, new_keys)))
+                moved[partition] += len(rows)
+            if moved[partition]:
+                self.logger.info(f"Moved {moved[partition]} entries from '{DEFAULT_PARTITION}' to '{partition}'")
+        self._notify_corpus_changed()
+        return moved
+
+    def partitions(self) -> dict:
+        """
+        Returns the number of entries in each partition.
+        """
+        return self.backend.partitions()
 
     def batch_ingestion(self, data):
         """
         Performs batch ingestion of data into the collection.
 
         Args:
-            data (Any): The data to be ingested.
+            data (Any): The data to be ingested, as row dictionaries or as columns.
 
         Returns:
-            None
+            List[int]: The primary keys of the ingested entries, in order.
         """
         batch_size = 100
-        total_elements = len(data)  # Ensure batching considers the number of records
-        total_batches = (total_elements + batch_size - 1) // batch_size
+        primary_keys = [None] * _num_rows(data)
+        # Rows are routed to the partition of their doc_id; the backend may persist
+        # all batches at once instead of after each of them
+        with self.backend.batch_writes():
+            for partition, (positions, partition_data) in split_by_partition(data).items():
+                total_elements = _num_rows(partition_data)  # Ensure batching considers the number of records
+                total_batches = (total_elements + batch_size - 1) // batch_size
+
+                # Using tqdm to create a progress bar
+                for start in tqdm(
+                    range(0, total_elements, batch_size),
+                    total=total_batches,
+                    desc=f"Ingesting batches into '{partition}'",
+                ):
+                    end = min(start + batch_size, total_elements)
+                    batch = _slice_rows(partition_data, start, end)  # Slice batch correctly
+
+                    # Insert batch into collection
+                    inserted = self.backend.insert(batch, partition=partition)
+                    for position, primary_key in zip(positions[start:end], inserted):
+                        primary_keys[position] = primary_key
+
+        self._notify_corpus_changed()
+        return primary_keys
+
+    def batch_writes(self):
+        """
+        Groups several inserts and deletes, e.g. the delta of one document, so that the
+        backend persists them once.
 
-        # Using tqdm to create a progress bar
-        for start in tqdm(
-            range(0, total_elements, batch_size),
-            total=total_batches,
-            desc="Ingesting batches",
-        ):
-            end = min(start + batch_size, total_elements)
-            batch = data[start:end]  # Slice batch correctly
+        Returns:
+            ContextManager: Exits once the writes are persisted.
+        """
+        return self.backend.batch_writes()
+
+    def delete_by_ids(self, primary_keys: List[int]) -> int:
+        """
+        Deletes entries by primary key.
 
-            self.collection.insert(batch)  # Insert batch into collection
+        Args:
+            primary_keys (List[int]): The primary keys to delete.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        deleted = self.backend.delete_ids(primary_keys)
+        self._notify_corpus_changed()
+        return deleted
 
     def delete_data(self, field: str, match_results: list[str]):
         """
@@ -157,19 +430,15 @@ class VectorDB:
             match_results (list[str]): A list of values to match for deletion.
 
         Returns:
-            Any: The result of the delete operation.
-        """
-        """
-        Delete entries from Milvus where 'field' matches any value in 'match_results'.
+            int: The number of deleted entries.
         """
+        delete_result = self.backend.delete(field, match_results)
+        if field in ("doc_id", "doc_source"):
+            self.manifest.forget(field, match_results)
+        else:
+            self.logger.warning(f"Deleted by `{field}`; the ingestion manifest may still list these entries")
+        self._notify_corpus_changed()
 
-        # Convert list to Milvus-compatible expression
-        match_list = ", ".join(f"'{item}'" for item in match_results)
-        delete_expr = f"{field} in [{match_list}]"  
-
-        # Execute delete operation
-        delete_result = self.collection.delete(delete_expr)
-        
         return delete_result
 
-vector_db = VectorDB(collection_name="odprt_index")
+vector_db = registry.register("vector_db", lambda: VectorDB(collection_name="odprt_index"))
@@ -1,6 +1,8 @@
 from fastapi import FastAPI, HTTPException, APIRouter
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from chatbot.backend.services.vector_db.db import vector_db
+from chatbot.backend.services.vector_db.partitions import PartitionName
 import logging
 
 # ==========================
@@ -12,6 +14,12 @@ class InsertData(BaseModel):
 
 class SearchQuery(BaseModel):
     query: str
+    partitions: Optional[List[PartitionName]] = Field(None, min_length=1)
+
+class BatchSearchQuery(BaseModel):
+    queries: List[str]
+    limit: int = Field(3, ge=1, le=100)
+    partitions: Optional[List[PartitionName]] = Field(None, min_length=1)
 
 class DropCollection(BaseModel):
     collection_name: str
@@ -24,16 +32,27 @@ vector_db_router = APIRouter(prefix="/vector-db")
 @vector_db_router.post("/insert-documents/")
 async def insert_documents(insert_data: InsertData):
     try:
-        vector_db.batch_ingestion(insert_data.data)
-        return {"message": "Data inserted successfully"}
+        primary_keys = vector_db.batch_ingestion(insert_data.data)
+        return {"message": "Data inserted successfully", "primary_keys": primary_keys}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @vector_db_router.post("/hybrid-search/")
 async def hybrid_search(search_query: SearchQuery) -> dict:
     try:
-        context = vector_db.hybrid_search(search_query.query)
-        return {"context": context}
+        result = vector_db.hybrid_search(search_query.query, partitions=search_query.partitions)
+        return result.to_dict()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Defined without async so that FastAPI runs the batched encoding and search in its threadpool
+@vector_db_router.post("/batch-hybrid-search/")
+def batch_hybrid_search(search_query: BatchSearchQuery) -> dict:
+    try:
+        results = vector_db.batch_hybrid_search(
+            search_query.queries, limit=search_query.limit, partitions=search_query.partitions
+        )
+        return {"results": [result.to_dict() for result in results]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -45,10 +64,41 @@ async def drop_collection(drop_collection: DropCollection):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+@vector_db_router.delete("/drop-partition/")
+async def drop_partition(partition: PartitionName):
+    try:
+        dropped = vector_db.drop_partition(partition)
+        return {"message": f"Partition '{partition}' dropped successfully", "dropped": dropped}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@vector_db_router.get("/partitions/")
+def list_partitions() -> dict:
+    try:
+        return {"partitions": vector_db.partitions()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @vector_db_router.delete("/delete-data/")
 async def delete_data(field: str, match_results: list[str]):
     try:
         vector_db.delete_data(field, match_results)
         return {"message": f"Data files matching '{field}' in {match_results} deleted successfully"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+@vector_db_router.get("/metrics/")  # Endpoint for inspecting vector DB operation latencies
+def vector_db_metrics() -> dict:
+    """
+    Returns the storage backend, p50/p99 latency per operation and backend state,
+    e.g. the Milvus connection and pending writes.
+    """
+    return vector_db.stats()
+
+@vector_db_router.get("/health/")
+def vector_db_health():
+    """
+    Checks that the vector DB responds; Milvus reconnects with backoff if it does not.
+    """
+    if not vector_db.backend.health_check(force=True):
+        raise HTTPException(status_code=503, detail="Vector DB is unreachable")
+    return {"status": "ok", "backend": type(vector_db.backend).__name__}
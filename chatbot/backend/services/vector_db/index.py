@@ -1,39 +1,79 @@
+import os
+from typing import Dict, Optional
+
+import yaml
+from dotenv import load_dotenv
 from pymilvus import Collection
 
-def create_all_indexes(collection: Collection) -> Collection:
-    # dense embeddings index
+load_dotenv(override=True)
+
+VECTOR_INDEX_CONFIG = os.getenv("VECTOR_INDEX_CONFIG", "chatbot/backend/configs/vector_index.yml")
+
+
+def load_index_config(path: str = VECTOR_INDEX_CONFIG) -> Dict[str, dict]:
+    """
+    Loads the index and search parameters of the dense and sparse vector fields.
+
+    Args:
+        path (str): Path to the YAML config, see `configs/vector_index.yml`.
+
+    Returns:
+        Dict[str, dict]: The `dense` and `sparse` field configs.
+    """
+    with open(path, "r") as file:
+        config = yaml.safe_load(file)
+    for name in ("dense", "sparse"):
+        if name not in config:
+            raise ValueError(f"no `{name}` section found in {path}")
+        config[name].setdefault("params", {})
+        config[name].setdefault("search_params", {})
+    return config
+
+
+def index_params(field_config: dict) -> dict:
+    """
+    Returns the `create_index` parameters of a field.
+    """
+    return {
+        "metric_type": field_config["metric_type"],
+        "index_type": field_config["index_type"],
+        "params": dict(field_config["params"]),
+    }
+
+
+def search_params(field_config: dict, limit: int) -> dict:
+    """
+    Returns the search parameters of a field for a search returning `limit` hits.
+
+    HNSW requires `ef` to be at least the number of hits, so a lower configured `ef`
+    is raised to `limit`.
+    """
+    params = dict(field_config["search_params"])
+    if "ef" in params:
+        params["ef"] = max(params["ef"], limit)
+    return {"metric_type": field_config["metric_type"], "params": params}
+
+
+def create_index(collection: Collection, field_config: dict):
+    """
+    Creates the index of one vector field.
+    """
     collection.create_index(
-        field_name="text_dense_embedding",
-        index_params={
-            "metric_type": "COSINE",
-            "index_type": "HNSW",
-            "params": {
-                "M": 5,
-                "efConstruction": 512
-            }
-        },
-        index_name="dense_embeddings_index"
+        field_name=field_config["field"],
+        index_params=index_params(field_config),
+        index_name=field_config["index_name"],
     )
-    
+
+
+def create_all_indexes(collection: Collection, config: Optional[Dict[str, dict]] = None) -> Collection:
+    config = config or load_index_config()
+
+    # dense embeddings index
+    create_index(collection, config["dense"])
     print("Dense embeddings index created")
 
     # sparse embeddings index
-    collection.create_index(
-        field_name="text_sparse_embedding",
-        index_params={
-            "metric_type": "IP",
-            "index_type": "SPARSE_INVERTED_INDEX",
-            "params": {
-                "drop_ratio_build": 0.2
-            }
-        },
-        index_name="sparse_embeddings_index"
-    )
-
+    create_index(collection, config["sparse"])
     print("Sparse embeddings index created")
 
-    # load
-    collection.load()
-    print("Collection loaded")
-
-    return collection
\ No newline at end of file
+    return collection
@@ -0,0 +1,217 @@
+"""
+Local manifest of the chunks ingested into a collection.
+
+Each chunk is identified by the hash of its content within its source, e.g. a file,
+and mapped to its primary key in the collection and the embedding model version
+that produced its vectors. Re-ingesting a source then only embeds and inserts the
+new or changed chunks and deletes the ones that vanished.
+
+The manifest is a SQLite file per backend and collection. It only tracks ingestion
+done from this machine, so ingest each source from one place.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+INGESTION_MANIFEST_DIR = os.getenv("INGESTION_MANIFEST_DIR", "chatbot/backend/manifests")
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+
+def chunk_hash(content) -> str:
+    """
+    Returns the content hash identifying a chunk within its source.
+
+    Args:
+        content (Union[str, bytes]): The chunk text, or raw bytes such as an image file.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class IngestionManifest:
+    """
+    SQLite-backed record of (source, chunk hash) -> primary key and embedding model version.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    source_key TEXT NOT NULL,
+                    chunk_hash TEXT NOT NULL,
+                    primary_key INTEGER NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    doc_source TEXT NOT NULL,
+                    model_version TEXT NOT NULL,
+                    ingested_at REAL NOT NULL,
+                    PRIMARY KEY (source_key, chunk_hash)
+                )
+                """
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS chunks_doc_id ON chunks (doc_id)")
+            db.execute("CREATE INDEX IF NOT EXISTS chunks_doc_source ON chunks (doc_source)")
+
+    @classmethod
+    def for_collection(cls, backend: str, collection_name: str, directory: str = INGESTION_MANIFEST_DIR):
+        """
+        Opens the manifest of a collection in a backend.
+        """
+        return cls(os.path.join(directory, f"{backend}_{collection_name}.sqlite3"))
+
+    @contextmanager
+    def _connect(self):
+        with self._lock:
+            db = sqlite3.connect(self.path)
+            try:
+                with db:  # commits, or rolls back on error
+                    yield db
+            finally:
+                db.close()
+
+    def source_chunks(self, source_key: str) -> Dict[str, Tuple[int, str]]:
+        """
+        Returns the chunks of a source.
+
+        Returns:
+            Dict[str, Tuple[int, str]]: Primary key and model version by chunk hash.
+        """
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT chunk_hash, primary_key, model_version FROM chunks WHERE source_key = ?",
+                (source_key,),
+            ).fetchall()
+        return {hash_: (primary_key, version) for hash_, primary_key, version in rows}
+
+    def has_chunks(self, doc_id: str) -> bool:
+        """
+        Checks whether any chunk of a document type is recorded.
+        """
+        with self._connect() as db:
+            return db.execute("SELECT 1 FROM chunks WHERE doc_id = ? LIMIT 1", (doc_id,)).fetchone() is not None
+
+    def sources(self, prefix: Optional[str] = None) -> List[str]:
+        """
+        Returns the keys of all recorded sources, optionally only those starting with `prefix`.
+        """
+        with self._connect() as db:
+            if prefix is None:
+                rows = db.execute("SELECT DISTINCT source_key FROM chunks").fetchall()
+            else:
+                rows = db.execute(
+                    "SELECT DISTINCT source_key FROM chunks WHERE substr(source_key, 1, ?) = ?",
+                    (len(prefix), prefix),
+                ).fetchall()
+        return [row[0] for row in rows]
+
+    def apply(
+        self,
+        source_key: str,
+        added: Iterable[Tuple[str, int]],
+        removed: Iterable[str],
+        doc_id: str,
+        doc_source: str,
+        model_version: str,
+    ):
+        """
+        Records the chunks added to and removed from a source in one transaction.
+
+        Args:
+            source_key (str): Key of the source.
+            added (Iterable[Tuple[str, int]]): (chunk hash, primary key) of each inserted chunk.
+            removed (Iterable[str]): Hashes of the deleted chunks.
+            doc_id (str): Document type of the source.
+            doc_source (str): Source document name stored with the chunks.
+            model_version (str): Embedding model version of the inserted chunks.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.executemany(
+                "DELETE FROM chunks WHERE source_key = ? AND chunk_hash = ?",
+                [(source_key, hash_) for hash_ in removed],
+            )
+            db.executemany(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (source_key, hash_, primary_key, doc_id, doc_source, model_version, now)
+                    for hash_, primary_key in added
+                ],
+            )
+
+    def known_primary_keys(self, primary_keys: Iterable[int]) -> Set[int]:
+        """
+        Returns the primary keys that some recorded chunk points at.
+        """
+        primary_keys = list(primary_keys)
+        known = set()
+        with self._connect() as db:
+            for start in range(0, len(primary_keys), _SQL_BATCH):
+                batch = primary_keys[start:start + _SQL_BATCH]
+                placeholders = ", ".join("?" for _ in batch)
+                known.update(
+                    row[0] for row in db.execute(
+                        f"SELECT primary_key FROM chunks WHERE primary_key IN ({placeholders})", batch
+                    )
+                )
+        return known
+
+    def replace_primary_keys(self, primary_keys: Dict[int, int]) -> int:
+        """
+        Points chunks at new primary keys, e.g. after their rows were moved to another partition.
+
+        Args:
+            primary_keys (Dict[int, int]): New primary key by old primary key.
+
+        Returns:
+            int: Number of updated chunks.
+        """
+        with self._connect() as db:
+            return sum(
+                db.execute("UPDATE chunks SET primary_key = ? WHERE primary_key = ?", (new, old)).rowcount
+                for old, new in primary_keys.items()
+            )
+
+    def forget(self, field: Optional[str] = None, values: Optional[List[str]] = None) -> int:
+        """
+        Removes chunks from the manifest after they were deleted from the collection.
+
+        Args:
+            field (str, optional): `doc_id` or `doc_source`; everything is removed if None.
+            values (List[str], optional): Values of `field` to remove.
+
+        Returns:
+            int: Number of removed chunks.
+        """
+        with self._connect() as db:
+            if field is None:
+                return db.execute("DELETE FROM chunks").rowcount
+            if field not in ("doc_id", "doc_source"):
+                raise ValueError(f"Cannot forget chunks by field '{field}'")
+            if not values:
+                return 0
+            placeholders = ", ".join("?" for _ in values)
+            return db.execute(f"DELETE FROM chunks WHERE {field} IN ({placeholders})", list(values)).rowcount
+
+    def stats(self) -> dict:
+        """
+        Returns the number of recorded sources and chunks.
+        """
+        with self._connect() as db:
+            sources, chunks = db.execute("SELECT COUNT(DISTINCT source_key), COUNT(*) FROM chunks").fetchone()
+        return {"path": self.path, "sources": sources, "chunks": chunks}
@@ -0,0 +1,30 @@
+"""
+One-off migrations of a collection created by an earlier version of the chatbot.
+
+- `partitions`: moves entries ingested before partitioning from `_default` into the
+  partition of their document type, so partition-filtered searches find them and
+  dropping a partition removes them.
+
+Usage:
+    python -m chatbot.backend.services.vector_db.migrate partitions
+"""
+
+import argparse
+import json
+
+from chatbot.backend.services.vector_db.db import vector_db
+
+
+def main(args):
+    if args.command == "partitions":
+        print(f"Before: {json.dumps(vector_db.partitions())}")
+        moved = vector_db.migrate_default_partition(batch_size=args.batch_size)
+        print(f"Moved entries per partition: {json.dumps(moved)}")
+        print(f"After: {json.dumps(vector_db.partitions())}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate a collection created by an earlier version")
+    parser.add_argument("command", choices=["partitions"])
+    parser.add_argument("--batch-size", type=int, default=1000, help="entries moved at a time")
+    main(parser.parse_args())
@@ -0,0 +1,60 @@
+"""
+Partitions of the collection by document type.
+
+Rows are routed to a partition by their `doc_id`, so searches can be restricted to
+some document types and one type can be dropped and re-ingested without an
+expression delete over the whole collection.
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, List, Literal, Tuple, get_args
+
+PartitionName = Literal["emails", "faq", "images", "user_uploads"]
+PARTITION_NAMES = list(get_args(PartitionName))
+# Rows of unknown document types, and rows ingested before partitioning, live here
+DEFAULT_PARTITION = "_default"
+
+# doc_id values written by the ingestion paths
+DOC_TYPE_PARTITIONS = {
+    "Emails": "emails",
+    "FAQ": "faq",
+    "Images": "images",
+    "Word Documents / PDF": "user_uploads",
+}
+
+
+def partition_for(doc_id: str) -> str:
+    """
+    Returns the partition of a document type.
+    """
+    return DOC_TYPE_PARTITIONS.get(doc_id, DEFAULT_PARTITION)
+
+
+def split_by_partition(data) -> Dict[str, Tuple[List[int], Any]]:
+    """
+    Splits insert data into one chunk per partition, keeping its format.
+
+    Args:
+        data (Any): Either a list of row dictionaries or a list of columns starting
+            with the `doc_id` column, as accepted by `Collection.insert`.
+
+    Returns:
+        Dict[str, Tuple[List[int], Any]]: The positions of each partition's rows in `data`,
+        and its data in the same format as `data`.
+    """
+    if not data:
+        return {}
+    rows_format = isinstance(data[0], dict)
+    doc_ids = [row["doc_id"] for row in data] if rows_format else data[0]
+    positions: Dict[str, List[int]] = defaultdict(list)
+    for i, doc_id in enumerate(doc_ids):
+        positions[partition_for(doc_id)].append(i)
+    if len(positions) == 1:
+        partition, indices = next(iter(positions.items()))
+        return {partition: (indices, data)}
+    if rows_format:
+        return {partition: (indices, [data[i] for i in indices]) for partition, indices in positions.items()}
+    return {
+        partition: (indices, [[column[i] for i in indices] for column in data])
+        for partition, indices in positions.items()
+    }
@@ -0,0 +1,198 @@
+"""
+Typed retrieval results.
+
+Hits keep their ids and scores so callers can dedupe, cache, threshold and cite
+without re-parsing prompt text. Formatting into prompt context happens lazily, only
+when the context is actually needed.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+DENSE_FIELD = "text_dense_embedding"
+SPARSE_FIELD = "text_sparse_embedding"
+
+
+def _round(score: Optional[float]) -> Optional[float]:
+    return round(score, 6) if score is not None else None
+
+
+def sparse_dot(query: Dict[int, float], document: Dict[int, float]) -> float:
+    """
+    Computes the inner product of two sparse vectors in Milvus dictionary format.
+    """
+    if len(document) < len(query):
+        query, document = document, query
+    return float(sum(weight * document.get(index, 0.0) for index, weight in query.items()))
+
+
+class RetrievalHit:
+    """
+    A single retrieved chunk.
+
+    Attributes:
+        auto_id (int): Primary key of the chunk in the collection.
+        doc_id (str): Document type of the chunk, e.g. "FAQ" or "Emails".
+        doc_source (str): Source document of the chunk.
+        text (str): Text of the chunk.
+        score (float): Fused (RRF) score of the hybrid search.
+        dense_score (float): Cosine similarity between the query and chunk dense embeddings.
+        sparse_score (float): Inner product between the query and chunk sparse embeddings.
+        rerank_score (float): Cross-encoder score, if the hit was reranked.
+    """
+
+    __slots__ = (
+        "auto_id", "doc_id", "doc_source", "text",
+        "score", "dense_score", "sparse_score", "rerank_score",
+    )
+
+    def __init__(
+        self,
+        auto_id: int,
+        doc_id: str,
+        doc_source: str,
+        text: str,
+        score: float,
+        dense_score: Optional[float] = None,
+        sparse_score: Optional[float] = None,
+        rerank_score: Optional[float] = None,
+    ):
+        self.auto_id = auto_id
+        self.doc_id = doc_id
+        self.doc_source = doc_source
+        self.text = text
+        self.score = score
+        self.dense_score = dense_score
+        self.sparse_score = sparse_score
+        self.rerank_score = rerank_score
+
+    @classmethod
+    def from_milvus(cls, hit, dense_query=None, sparse_query: Optional[Dict[int, float]] = None):
+        """
+        Builds a hit from a Milvus hybrid search hit, scoring it against the query vectors.
+
+        Per-field scores are only available when the vector fields were requested as
+        output fields, since the fused ranking does not expose them.
+
+        Args:
+            hit (Hit): A Milvus hit.
+            dense_query (List[float], optional): Dense embedding of the query.
+            sparse_query (Dict[int, float], optional): Sparse embedding of the query.
+
+        Returns:
+            RetrievalHit: The hit, without its vectors.
+        """
+        dense_score, sparse_score = None, None
+        dense_vector = getattr(hit, DENSE_FIELD, None)
+        if dense_query is not None and dense_vector is not None:
+            dense_query, dense_vector = np.asarray(dense_query), np.asarray(dense_vector)
+            norm = np.linalg.norm(dense_query) * np.linalg.norm(dense_vector)
+            dense_score = float(dense_query @ dense_vector / norm) if norm else 0.0
+        sparse_vector = getattr(hit, SPARSE_FIELD, None)
+        if sparse_query is not None and sparse_vector is not None:
+            sparse_score = sparse_dot(sparse_query, {int(i): w for i, w in sparse_vector.items()})
+
+        return cls(
+            auto_id=hit.id,
+            doc_id=hit.doc_id,
+            doc_source=hit.doc_source,
+            text=hit.text,
+            score=float(hit.distance),
+            dense_score=dense_score,
+            sparse_score=sparse_score,
+        )
+
+    def format(self) -> str:
+        """
+        Formats the hit as a prompt context entry.
+        """
+        return f"Source Document: {self.doc_source} \n Text: {self.text}"
+
+    def to_dict(self, include_text: bool = True) -> dict:
+        """
+        Returns the hit as a JSON-serialisable dictionary.
+
+        Args:
+            include_text (bool): Whether to include the chunk text.
+        """
+        data = {
+            "auto_id": self.auto_id,
+            "doc_id": self.doc_id,
+            "doc_source": self.doc_source,
+            "score": _round(self.score),
+            "dense_score": _round(self.dense_score),
+            "sparse_score": _round(self.sparse_score),
+            "rerank_score": _round(self.rerank_score),
+        }
+        if include_text:
+            data["text"] = self.text
+        return data
+
+    def __repr__(self) -> str:
+        return f"RetrievalHit(auto_id={self.auto_id}, doc_source={self.doc_source!r}, score={self.score:.4f})"
+
+
+class RetrievalResult:
+    """
+    The ordered hits of one query, with lazily formatted prompt context.
+
+    Iterating, indexing and `len` operate on the hits.
+    """
+
+    __slots__ = ("query", "hits", "_context_list")
+
+    def __init__(self, hits: Iterable[RetrievalHit], query: Optional[str] = None):
+        self.query = query
+        self.hits: List[RetrievalHit] = list(hits)
+        self._context_list = None
+
+    @property
+    def context_list(self) -> List[str]:
+        """
+        The formatted context entry of each hit.
+        """
+        if self._context_list is None:
+            self._context_list = [hit.format() for hit in self.hits]
+        return self._context_list
+
+    @property
+    def context(self) -> str:
+        """
+        The joined prompt context.
+        """
+        return "\n\n".join(self.context_list)
+
+    def with_hits(self, hits: Iterable[RetrievalHit]) -> "RetrievalResult":
+        """
+        Returns a result for the same query with different hits, e.g. after reranking.
+        """
+        return RetrievalResult(hits, query=self.query)
+
+    def max_score(self, field: str) -> Optional[float]:
+        """
+        Returns the highest `score`, `dense_score`, `sparse_score` or `rerank_score` over the hits.
+        """
+        scores = [getattr(hit, field) for hit in self.hits if getattr(hit, field) is not None]
+        return max(scores) if scores else None
+
+    def to_dict(self, include_text: bool = True) -> dict:
+        """
+        Returns the result as a JSON-serialisable dictionary.
+        """
+        return {
+            "query": self.query,
+            "hits": [hit.to_dict(include_text) for hit in self.hits],
+        }
+
+    def __iter__(self):
+        return iter(self.hits)
+
+    def __len__(self) -> int:
+        return len(self.hits)
+
+    def __getitem__(self, index):
+        return self.hits[index]
+
+    def __repr__(self) -> str:
+        return f"RetrievalResult(query={self.query!r}, hits={len(self.hits)})"
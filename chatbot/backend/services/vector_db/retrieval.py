@@ -0,0 +1,267 @@
+"""
+Multi-stage retrieval: hybrid search over a wide candidate set, cross-encoder
+reranking down to the final top-k, and a token budget on the resulting context.
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+import tiktoken
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+
+from chatbot.backend.services.logger import logger
+from chatbot.backend.services.metrics import Counters
+from chatbot.backend.services.models.reranker import reranker
+from chatbot.backend.services.registry import registry
+from chatbot.backend.services.vector_db.db import RETRIEVAL_FIELD_SCORES, vector_db
+from chatbot.backend.services.vector_db.partitions import PartitionName
+from chatbot.backend.services.vector_db.results import RetrievalResult
+
+load_dotenv(override=True)
+
+RETRIEVAL_CANDIDATE_K = int(os.getenv("RETRIEVAL_CANDIDATE_K", 20))
+RETRIEVAL_FINAL_K = int(os.getenv("RETRIEVAL_FINAL_K", 3))
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 16))
+# 0 disables the budget
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 0))
+# a partially fitting chunk is only kept if at least this many of its tokens fit
+CONTEXT_MIN_PARTIAL_TOKENS = 64
+# Retrieval counts as finding nothing relevant when the best candidate is below both
+# thresholds; 0 disables a threshold
+RETRIEVAL_MIN_DENSE_SCORE = float(os.getenv("RETRIEVAL_MIN_DENSE_SCORE", 0))
+RETRIEVAL_MIN_SPARSE_SCORE = float(os.getenv("RETRIEVAL_MIN_SPARSE_SCORE", 0))
+
+
+class RetrievalParams(BaseModel):
+    """
+    Per-request retrieval settings, defaulting to the configured values.
+
+    Attributes:
+        candidate_k (int): Number of candidates fetched from each search and kept after fusion
+            when reranking; without reranking only `final_k` candidates are fetched.
+        final_k (int): Number of documents passed to the answer chain.
+        rerank (bool): Whether to rerank candidates with the cross-encoder.
+        rerank_batch_size (int): Number of (query, passage) pairs per cross-encoder forward pass.
+        max_context_tokens (int): Token budget of the context, 0 for no limit.
+        min_dense_score (float): Minimum dense cosine score of the best candidate, 0 to disable.
+        min_sparse_score (float): Minimum sparse inner product of the best candidate, 0 to disable.
+        partitions (List[str]): Document type partitions to search, all if None.
+    """
+    candidate_k: int = Field(RETRIEVAL_CANDIDATE_K, ge=1, le=200)
+    final_k: int = Field(RETRIEVAL_FINAL_K, ge=1, le=50)
+    rerank: bool = RERANK_ENABLED
+    rerank_batch_size: int = Field(RERANK_BATCH_SIZE, ge=1, le=256)
+    max_context_tokens: int = Field(CONTEXT_MAX_TOKENS, ge=0)
+    min_dense_score: float = Field(RETRIEVAL_MIN_DENSE_SCORE, ge=0)
+    min_sparse_score: float = Field(RETRIEVAL_MIN_SPARSE_SCORE, ge=0)
+    partitions: Optional[List[PartitionName]] = None
+
+    @classmethod
+    def with_overrides(cls, **overrides) -> "RetrievalParams":
+        """
+        Builds params from the defaults, applying only the overrides that are not None.
+        """
+        return cls(**{name: value for name, value in overrides.items() if value is not None})
+
+    @property
+    def search_limit(self) -> int:
+        """
+        Number of candidates to fetch, only widened beyond `final_k` when they are reranked.
+        """
+        return max(self.candidate_k, self.final_k) if self.rerank else self.final_k
+
+    @property
+    def field_scores(self) -> bool:
+        """
+        Whether hits need their dense and sparse scores, always the case with a score threshold.
+        """
+        return RETRIEVAL_FIELD_SCORES or self.min_dense_score > 0 or self.min_sparse_score > 0
+
+
+class RetrievalPipeline:
+    """Runs the search, rerank and context budgeting stages of retrieval."""
+
+    def __init__(self, vector_db=vector_db, reranker=reranker):
+        self.vector_db = vector_db
+        self.reranker = reranker
+        self.counters = Counters()
+        self.logger = logger
+        try:
+            self.encoding = tiktoken.encoding_for_model(os.getenv("OPENAI_MODEL", ""))
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("o200k_base")
+
+    def search(
+        self, dense_embedding, sparse_embedding, params: Optional[RetrievalParams] = None
+    ) -> RetrievalResult:
+        """
+        Runs the first-stage hybrid search over `candidate_k` candidates, or `final_k` without reranking.
+
+        Returns:
+            RetrievalResult: The fused candidates, empty if none of them is relevant enough.
+        """
+        params = params or RetrievalParams()
+        result = self.vector_db.search_hits(
+            dense_embedding,
+            sparse_embedding,
+            limit=params.search_limit,
+            partitions=params.partitions,
+            field_scores=params.field_scores,
+        )
+        if not self.is_relevant(result, params):
+            self.counters.increment("below_threshold")
+            return result.with_hits([])
+        self.counters.increment("above_threshold")
+        return result
+
+    def batch_search(self, queries: List[str], params: Optional[RetrievalParams] = None) -> List[RetrievalResult]:
+        """
+        Runs `search` for many queries with one encoding pass and batched hybrid searches.
+
+        Args:
+            queries (List[str]): The user queries.
+            params (RetrievalParams, optional): Retrieval settings shared by all queries.
+
+        Returns:
+            List[RetrievalResult]: The candidates of each query, in query order, empty for
+            queries whose candidates are not relevant enough.
+        """
+        params = params or RetrievalParams()
+        if not queries:
+            return []
+        dense_embeddings, sparse_embeddings = self.vector_db.embedding_model.encode_texts(queries)
+        results = self.vector_db.batch_search_hits(
+            dense_embeddings,
+            sparse_embeddings,
+            limit=params.search_limit,
+            partitions=params.partitions,
+            field_scores=params.field_scores,
+        )
+        for index, (query, result) in enumerate(zip(queries, results)):
+            result.query = query
+            if self.is_relevant(result, params):
+                self.counters.increment("above_threshold")
+            else:
+                self.counters.increment("below_threshold")
+                results[index] = result.with_hits([])
+        return results
+
+    def is_relevant(self, result: RetrievalResult, params: Optional[RetrievalParams] = None) -> bool:
+        """
+        Checks whether the best candidate clears the dense or the sparse score threshold.
+
+        A result without hits is never relevant. Scores are fetched whenever a threshold
+        is set; scores that were not computed do not count as below the threshold.
+
+        Returns:
+            bool: False if every enabled threshold is missed.
+        """
+        params = params or RetrievalParams()
+        if not result:
+            return False
+        checks = [
+            (result.max_score("dense_score"), params.min_dense_score),
+            (result.max_score("sparse_score"), params.min_sparse_score),
+        ]
+        checks = [(score, threshold) for score, threshold in checks if threshold > 0]
+        if not checks or any(score is None or score >= threshold for score, threshold in checks):
+            return True
+        self.logger.info(
+            f"best retrieval scores below thresholds (dense={result.max_score('dense_score')}, "
+            f"sparse={result.max_score('sparse_score')})"
+        )
+        return False
+
+    def rerank(
+        self, query: str, result: RetrievalResult, params: Optional[RetrievalParams] = None
+    ) -> RetrievalResult:
+        """
+        Reorders candidates by cross-encoder score, if enabled, and keeps the top `final_k`.
+
+        Args:
+            query (str): The user query.
+            result (RetrievalResult): Candidates from `search`.
+            params (RetrievalParams, optional): Retrieval settings.
+
+        Returns:
+            RetrievalResult: The final hits, most relevant first, with `rerank_score` set if reranked.
+        """
+        params = params or RetrievalParams()
+        hits = list(result)
+        if params.rerank and len(hits) > 1:
+            scores = self.reranker.score(
+                query, [hit.text for hit in hits], batch_size=params.rerank_batch_size
+            )
+            for hit, score in zip(hits, scores):
+                hit.rerank_score = score
+            hits.sort(key=lambda hit: hit.rerank_score, reverse=True)
+        return result.with_hits(hits[:params.final_k])
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Counts the tokens of a text with the answer model's tokenizer.
+        """
+        return len(self.encoding.encode(text))
+
+    def trim_to_budget(self, entries: List[str], max_tokens: int) -> List[str]:
+        """
+        Keeps context entries in order until the token budget is spent.
+
+        The first entry that does not fit is truncated if enough of it fits, and
+        everything after it is dropped. The separators between entries are not counted.
+
+        Args:
+            entries (List[str]): Formatted context entries, most relevant first.
+            max_tokens (int): The token budget.
+
+        Returns:
+            List[str]: The entries that fit the budget.
+        """
+        trimmed = []
+        remaining = max_tokens
+        for entry in entries:
+            tokens = self.encoding.encode(entry)
+            if len(tokens) <= remaining:
+                trimmed.append(entry)
+                remaining -= len(tokens)
+                continue
+            if remaining >= CONTEXT_MIN_PARTIAL_TOKENS or not trimmed:
+                trimmed.append(self.encoding.decode(tokens[:remaining]))
+            break
+        return trimmed
+
+    def build_context(
+        self, result: RetrievalResult, params: Optional[RetrievalParams] = None
+    ) -> Tuple[str, List[str]]:
+        """
+        Formats the final hits into prompt context within the token budget.
+
+        Returns:
+            Tuple[str, List[str]]: The joined context and the individual context strings.
+        """
+        params = params or RetrievalParams()
+        context = result.context_list
+        if params.max_context_tokens:
+            context = self.trim_to_budget(context, params.max_context_tokens)
+        return "\n\n".join(context), context
+
+    def stats(self) -> dict:
+        """
+        Returns how often retrieval cleared the score thresholds.
+
+        Returns:
+            dict: Searches above and below the thresholds and the share below.
+        """
+        counts = self.counters.snapshot()
+        above, below = counts.get("above_threshold", 0), counts.get("below_threshold", 0)
+        searches = above + below
+        return {
+            "above_threshold": above,
+            "below_threshold": below,
+            "below_threshold_rate": round(below / searches, 4) if searches else 0.0,
+        }
+
+
+retrieval_pipeline = registry.register("retrieval_pipeline", RetrievalPipeline)
@@ -5,6 +5,7 @@ from sklearn.metrics.pairwise import cosine_similarity
 
 from chatbot.backend.services.logger import logger
 from chatbot.backend.services.models.embedding_model import embedding_model
+from chatbot.backend.services.registry import registry
 
 
 class SimpleTopicModel:
@@ -105,4 +106,4 @@ class SimpleTopicModel:
             return None
 
 
-simple_tm = SimpleTopicModel()
+simple_tm = registry.register("simple_tm", SimpleTopicModel)
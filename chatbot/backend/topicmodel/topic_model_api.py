@@ -2,7 +2,7 @@ from fastapi import FastAPI, HTTPException, APIRouter
 from pydantic import BaseModel
 from typing import List
 
-from chatbot.backend.topicmodel import simple_tm
+from chatbot.backend.topicmodel.simple_tm import simple_tm
 
 # router
 app = FastAPI()